@@ -1,6 +1,10 @@
-from typing import Dict, Any
+from typing import Dict, List, Sequence
+
 import numpy as np
 
+from feature_record import FeatureRecord
+from rolling_statistics import RollingStatistics
+
 
 class Audio:
     """
@@ -16,7 +20,6 @@ class Audio:
         self.audio_calculator = audio_calculator
 
         # fields
-        self._audio_data: np.ndarray = np.array([])  # overall audio data
         self.current_audio_data = None
         self._total_voiced_region_num: int = 0
         self._total_voiced_time_ms: float = 0.0
@@ -29,23 +32,45 @@ class Audio:
         self._average_f0: np.float64 = np.float64()
         self._std_f0: np.float64 = np.float64()
 
-        # dict for send
-        self.message_data: Dict[str, float] = {
-            "t": .0,
-            "total_voiced_region_num": self._total_voiced_region_num,
-            "total_voiced_time_ms": self._total_voiced_time_ms,
-            "average_rms": self._average_rms,
-            "average_rms_db": self._average_rms_db,
-            "average_rms_db_total": self._average_rms_db_total,
-            "std_rms_db": self._std_rms_db,
-            "std_rms_db_total": self._std_rms_db_total,
-            "average_f0": self._average_f0,
-            "std_f0": self._std_f0,
-        }
-
-    @property
-    def audio_data(self):
-        return self._audio_data
+        # record for send
+        self.feature_record: FeatureRecord = FeatureRecord()
+        # statistics over rolling windows for each feature (e.g., "rms_db" -> RollingStatistics)
+        self.rolling_statistics: Dict[str, RollingStatistics] = {}
+
+    def init_rolling_statistics(self, windows_sec: Sequence[float], values_per_sec: Dict[str, float]) -> None:
+        """
+        Prepare rolling statistics of each feature, and add their fields into the record.
+        Args:
+            windows_sec: Durations of windows (e.g., 10s, 60s and 5min).
+            values_per_sec: The number of values per second of each feature, which decides size of ring buffers.
+        Notes:
+            Field names are like `average_rms_db_10s`, `std_f0_1min` and `max_voiced_ratio_5min`.
+        """
+        fields = []
+        for name, rate in values_per_sec.items():
+            self.rolling_statistics[name] = RollingStatistics(windows_sec=windows_sec,
+                                                              capacity=int(max(windows_sec) * rate) + 1)
+            fields += [(key, "<f8") for key in self.get_rolling_keys(name=name, windows_sec=windows_sec)]
+        self.feature_record.add_fields(fields)
+
+    @staticmethod
+    def get_rolling_keys(name: str, windows_sec: Sequence[float]) -> List[str]:
+        """
+        Fields of rolling statistics of a feature, e.g., `average_rms_db_10s`.
+        """
+        return ["{}_{}_{}".format(stat, name, RollingStatistics.window_suffix(window_sec))
+                for window_sec in windows_sec for stat in ("average", "std", "min", "max")]
+
+    def update_rolling_statistics(self, now: float) -> None:
+        """
+        Evict old values of all windows at `now` (in seconds), then store statistics into the record.
+        """
+        for name, rolling_statistics in self.rolling_statistics.items():
+            rolling_statistics.evict(now=now)
+            for w, window_sec in enumerate(rolling_statistics.windows_sec):
+                suffix = RollingStatistics.window_suffix(window_sec)
+                for stat, value in rolling_statistics.get(w).items():
+                    self.feature_record["{}_{}_{}".format(stat, name, suffix)] = value
 
     @property
     def total_voiced_region_num(self):
@@ -87,20 +112,16 @@ class Audio:
     def std_f0(self):
         return self._std_f0
 
-    @audio_data.setter
-    def audio_data(self, data):
-        self._audio_data = data
-
     @total_voiced_region_num.setter
     def total_voiced_region_num(self, data):
         # set data into message simultaneously
-        self.message_data["total_voiced_region_num"] = data
+        self.feature_record["total_voiced_region_num"] = data
         self._total_voiced_region_num = data
 
     @total_voiced_time_ms.setter
     def total_voiced_time_ms(self, data):
         # set data into message simultaneously
-        self.message_data["total_voiced_time_ms"] = data
+        self.feature_record["total_voiced_time_ms"] = data
         self._total_voiced_time_ms = data
 
     @f0.setter
@@ -110,41 +131,41 @@ class Audio:
     @average_rms.setter
     def average_rms(self, data):
         # set data into message simultaneously
-        self.message_data["average_rms"] = data
+        self.feature_record["average_rms"] = data
         self._average_rms = data
 
     @average_rms_db.setter
     def average_rms_db(self, data):
         # set data into message simultaneously
-        self.message_data["average_rms_db"] = data
+        self.feature_record["average_rms_db"] = data
         self._average_rms_db = data
 
     @average_rms_db_total.setter
     def average_rms_db_total(self, data):
         # set data into message simultaneously
-        self.message_data["average_rms_db_total"] = data
+        self.feature_record["average_rms_db_total"] = data
         self._average_rms_db_total = data
 
     @std_rms_db.setter
     def std_rms_db(self, data):
         # set data into message simultaneously
-        self.message_data["std_rms_db"] = data
+        self.feature_record["std_rms_db"] = data
         self._std_rms_db = data
 
     @std_rms_db_total.setter
     def std_rms_db_total(self, data):
         # set data into message simultaneously
-        self.message_data["std_rms_db_total"] = data
+        self.feature_record["std_rms_db_total"] = data
         self._std_rms_db_total = data
 
     @average_f0.setter
     def average_f0(self, data):
         # set data into message simultaneously
-        self.message_data["average_f0"] = data
+        self.feature_record["average_f0"] = data
         self._average_f0 = data
 
     @std_f0.setter
     def std_f0(self, data):
         # set data into message simultaneously
-        self.message_data["std_f0"] = data
+        self.feature_record["std_f0"] = data
         self._std_f0 = data
@@ -0,0 +1,227 @@
+import os
+from multiprocessing import shared_memory
+from typing import List, Tuple
+
+import numpy as np
+
+from util.exception import SharedMemoryInUseException
+from util.logger import Logger
+from util.shared_memory import attach_shared_memory
+
+
+class AudioBus:
+    """
+    Single-producer, multi-consumer ring of PCM blocks on `multiprocessing.shared_memory`.
+    `AudioStream` publishes every captured block once, and any number of consumers (plotter, recorder,
+    third-party analysers in other processes) attach by name with `AudioBusReader`.
+    Attributes:
+        self.num_slots (int): The number of blocks which can be kept.
+        self.block_size (int): The maximum number of samples per block.
+    Notes:
+        The memory layout is following:
+        `[header (int64 x 8)][sequence of each slot (int64 x num_slots)][length of each slot (int64 x num_slots)]
+        [blocks (int16 x num_slots x block_size x channels)]`
+        The header is `[write sequence, num_slots, block_size, channels, sample_rate, writer pid, 0, 0]`.
+        The writer never waits for consumers; a consumer which falls behind more than `num_slots` blocks
+        detects the overrun by comparing sequences.
+        A bus left by a crashed writer is recreated, while the one of a running writer (e.g., another instance
+        with the same `--bus_name`) raises `SharedMemoryInUseException`.
+    """
+    HEADER_SIZE: int = 8
+    WRITING: int = -1  # sequence of the slot being written
+
+    def __init__(self, name: str = None, num_slots: int = 16, block_size: int = 1024, channels: int = 1,
+                 sample_rate: int = 16000, create: bool = True):
+        self.logger = Logger(name=__name__)
+        if create:
+            size = AudioBus.calc_size(num_slots=num_slots, block_size=block_size, channels=channels)
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                self.unlink_stale(name=name)
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            header = np.ndarray((AudioBus.HEADER_SIZE,), dtype=np.int64, buffer=self._shm.buf)
+            header[:] = [0, num_slots, block_size, channels, sample_rate, os.getpid(), 0, 0]
+        else:
+            self._shm = attach_shared_memory(name=name)
+        self._header = np.ndarray((AudioBus.HEADER_SIZE,), dtype=np.int64, buffer=self._shm.buf)
+        self.num_slots: int = int(self._header[1])
+        self.block_size: int = int(self._header[2])
+        self.channels: int = int(self._header[3])
+        self.sample_rate: int = int(self._header[4])
+        offset = AudioBus.HEADER_SIZE * 8
+        self._slot_seq = np.ndarray((self.num_slots,), dtype=np.int64, buffer=self._shm.buf, offset=offset)
+        offset += self.num_slots * 8
+        self._slot_len = np.ndarray((self.num_slots,), dtype=np.int64, buffer=self._shm.buf, offset=offset)
+        offset += self.num_slots * 8
+        self._blocks = np.ndarray((self.num_slots, self.block_size, self.channels), dtype=np.int16,
+                                  buffer=self._shm.buf, offset=offset)
+        if create:
+            self._slot_seq[:] = AudioBus.WRITING
+            self._slot_len[:] = 0
+
+    def unlink_stale(self, name: str) -> None:
+        """
+        Unlink the existing bus of `name` if its writer is gone (i.e., left by a crashed session).
+        """
+        existing = attach_shared_memory(name=name)
+        try:
+            pid = 0
+            if existing.size >= AudioBus.HEADER_SIZE * 8:
+                pid = int(np.ndarray((AudioBus.HEADER_SIZE,), dtype=np.int64, buffer=existing.buf)[5])
+            if is_process_alive(pid=pid):
+                raise SharedMemoryInUseException("Error when creating audio bus")
+        except SharedMemoryInUseException:
+            self.logger.logger.exception("Audio bus {} is used by the running process {}, so choose another name "
+                                         "with --bus_name.".format(name, pid))
+            raise
+        finally:
+            existing.close()
+        self.logger.logger.warning("Shared memory {} is left by a crashed session (pid {}), so it will be "
+                                   "recreated.".format(name, pid))
+        existing.unlink()
+
+    @staticmethod
+    def calc_size(num_slots: int, block_size: int, channels: int) -> int:
+        return (AudioBus.HEADER_SIZE + 2 * num_slots) * 8 + num_slots * block_size * channels * 2
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def write_seq(self) -> int:
+        """
+        Sequence number of the next block, i.e., the number of published blocks.
+        """
+        return int(self._header[0])
+
+    def publish(self, block: np.ndarray) -> int:
+        """
+        Publish a block of int16 PCM. This should be called only by one producer.
+        Args:
+            block (np.ndarray): Samples whose shape is (n, channels) or (n,), where n <= `block_size`.
+        Returns:
+            seq (int): Sequence number of the published block.
+        """
+        block = np.asarray(block).reshape(-1, self.channels)
+        n = min(len(block), self.block_size)
+        seq = self.write_seq
+        slot = seq % self.num_slots
+        self._slot_seq[slot] = AudioBus.WRITING  # consumers will detect the block being overwritten
+        self._blocks[slot, :n] = block[:n]
+        self._slot_len[slot] = n
+        self._slot_seq[slot] = seq
+        self._header[0] = seq + 1
+        return seq
+
+    def slot_view(self, seq: int) -> Tuple[bool, np.ndarray]:
+        """
+        View of the block without copying, which is valid only until it is overwritten.
+        Returns:
+            is_valid (bool): The block of `seq` is still kept or not.
+            view (np.ndarray): View of the block.
+        """
+        slot = seq % self.num_slots
+        view = self._blocks[slot, :int(self._slot_len[slot])]
+        return int(self._slot_seq[slot]) == seq, view
+
+    def is_valid(self, seq: int) -> bool:
+        return int(self._slot_seq[seq % self.num_slots]) == seq
+
+    def close(self) -> None:
+        # views should be released before closing the shared memory
+        self._header = None
+        self._slot_seq = None
+        self._slot_len = None
+        self._blocks = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """
+        Release the shared memory. This should be called only by the producer.
+        """
+        self._shm.unlink()
+
+
+def is_process_alive(pid: int) -> bool:
+    """
+    Whether the process is running, where 0 (i.e., unknown) is regarded as gone.
+    Notes:
+        Shared memory on Windows is released with its last handle, so that an existing one is always alive.
+    """
+    if os.name == "nt":
+        return True
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)  # no signal is sent, but the existence is checked
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # owned by another user
+        return True
+    return True
+
+
+class AudioBusReader:
+    """
+    Consumer of `AudioBus`, which has its own read cursor.
+    Examples:
+        reader = AudioBusReader(name="vocal_analysis")
+        for seq, block in reader.read():
+            ...  # block is np.ndarray of int16 whose shape is (n, channels)
+    Attributes:
+        self.cursor (int): Sequence number of the next block to read.
+        self.overrun_count (int): The number of blocks lost because this consumer fell behind.
+    """
+
+    def __init__(self, name: str, from_oldest: bool = False):
+        self.logger = Logger(name=__name__)
+        self.bus = AudioBus(name=name, create=False)
+        write_seq = self.bus.write_seq
+        # start from the latest block, or the oldest one still kept
+        self.cursor: int = max(0, write_seq - self.bus.num_slots) if from_oldest else write_seq
+        self.overrun_count: int = 0
+
+    @property
+    def lag(self) -> int:
+        """
+        The number of published blocks which haven't been read yet.
+        """
+        return self.bus.write_seq - self.cursor
+
+    def _skip_overrun(self) -> None:
+        # the oldest block may be overwritten soon, so skip to the next one
+        oldest = self.bus.write_seq - self.bus.num_slots + 1
+        if self.cursor < oldest:
+            lost = oldest - self.cursor
+            self.overrun_count += lost
+            self.logger.logger.warning("Overrun on audio bus: {} blocks were lost.".format(lost))
+            self.cursor = oldest
+
+    def read(self, max_blocks: int = None) -> List[Tuple[int, np.ndarray]]:
+        """
+        Read blocks published after the last read.
+        Args:
+            max_blocks: The maximum number of blocks to read (all of them when `None`).
+        Returns:
+            res (List[Tuple[int, np.ndarray]]): Pairs of sequence number and copied block.
+        """
+        res = []
+        self._skip_overrun()
+        while self.cursor < self.bus.write_seq and (max_blocks is None or len(res) < max_blocks):
+            seq = self.cursor
+            is_valid, view = self.bus.slot_view(seq)
+            block = view.copy()
+            # the block might be overwritten while copying
+            if not (is_valid and self.bus.is_valid(seq)):
+                self._skip_overrun()
+                if self.cursor == seq:  # still being written, try again on next read
+                    break
+                continue
+            res.append((seq, block))
+            self.cursor = seq + 1
+        return res
+
+    def close(self) -> None:
+        self.bus.close()
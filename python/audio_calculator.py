@@ -1,15 +1,18 @@
 from numpy import float_, ndarray
 
+from audio_kernels import calc_f0_moments_kernel, calc_rms_db_kernel
 from util.logger import Logger
+from util.time_measure import TimeMeasure
 from util.exception import GotNanException
 from util.exception import IncorrectChannelNumberException
 
-from typing import Union
+from typing import Sequence, Union
 
 import numpy as np
 import auditok
 import librosa
 import pyworld as pw
+import scipy.signal
 
 
 class AudioCalculator:
@@ -22,6 +25,7 @@ class AudioCalculator:
         To do above, we can calculate features based on each sentence and word.
     Notes:
         This class has audio dependencies such as `auditok` and `librosa`.
+        Pause and speed are accumulated from voiced regions and the envelope by `SpeechTimeline`.
     """
 
     def __init__(self):
@@ -78,6 +82,60 @@ class AudioCalculator:
             res = (audio_data.size / float(sample_rate)) * 10 ** 3  # in milli sec
             return res
 
+    def calc_frame_times(self, num_frames: int, start_sec: float = 0.0, frame_period_sec: float = 512 / 4 / 16000
+                         ) -> np.ndarray:
+        """
+        Calculate times of frames in seconds, e.g., for rolling statistics.
+        Args:
+            num_frames: The number of frames.
+            start_sec: Time of the first frame.
+            frame_period_sec: Period of frames (e.g., `hop_length / sample_rate`).
+        Returns:
+        """
+        return start_sec + np.arange(num_frames) * frame_period_sec
+
+    def calc_frame_segments(self, num_frames: int, hop_length: int, starts: np.ndarray, ends: np.ndarray
+                            ) -> np.ndarray:
+        """
+        Assign frames of a block to voiced regions, i.e., segment IDs for `calc_segment_moments()`.
+        Args:
+            num_frames: The number of STFT frames of the block (centered, i.e., frame `j` is at `j * hop_length`).
+            hop_length: Hop length of STFT.
+            starts: Start samples of regions in the block, in ascending order.
+            ends: End samples (exclusive) of regions.
+        Returns:
+            segment_ids (np.ndarray): Index of the region for each frame, or `-1` for frames outside regions.
+        """
+        centers = np.arange(num_frames) * hop_length
+        if len(starts) == 0:
+            return np.full(num_frames, -1, dtype=np.int64)
+        segment_ids = np.searchsorted(starts, centers, side="right") - 1
+        is_outside = (segment_ids < 0) | (centers >= np.asarray(ends)[np.maximum(segment_ids, 0)])
+        segment_ids[is_outside] = -1
+        return segment_ids
+
+    def calc_segment_moments(self, values: np.ndarray, segment_ids: np.ndarray, num_segments: int
+                             ) -> [np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Count, mean and standard deviation of values for each segment (e.g., voiced region) in one vectorised pass.
+        Args:
+            values: One-dimensional values.
+            segment_ids: Segment of each value, where negative ones are excluded (e.g., unvoiced).
+            num_segments: The number of segments.
+        Returns:
+            counts, means, stds (np.ndarray): `means` and `stds` are `NaN` for empty segments.
+        """
+        is_valid = segment_ids >= 0
+        ids = segment_ids[is_valid]
+        values = np.asarray(values, dtype=np.float64)[is_valid]
+        counts = np.bincount(ids, minlength=num_segments)
+        sums = np.bincount(ids, weights=values, minlength=num_segments)
+        sums_sq = np.bincount(ids, weights=values * values, minlength=num_segments)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+            stds = np.sqrt(np.maximum(sums_sq / counts - means * means, 0.0))
+        return counts, means, stds
+
     def calc_short_time_fourier_transform(self, voiced_audio_data: np.ndarray = None, n_fft=512,
                                           hop_length: int = 512 // 4):
         """
@@ -125,24 +183,50 @@ class AudioCalculator:
             res = librosa.feature.rms(y=voiced_audio_data, frame_length=frame_length, hop_length=hop_length)
         return res
 
-    def calc_mean(self, audio_data: np.ndarray = None) -> np.float64:
+    def get_accumulator_dtype(self, audio_data: np.ndarray, dtype=None):
+        """
+        Decide dtype to accumulate; the one of float data is kept (e.g., float32), otherwise float64.
+        """
+        if dtype is not None:
+            return dtype
+        if np.issubdtype(audio_data.dtype, np.floating):
+            return audio_data.dtype
+        return np.float64
+
+    def calc_energy_rms_db(self, magnitude: np.ndarray = None, frame_length: int = 512) -> [np.ndarray, np.ndarray]:
+        """
+        Calc root-mean-square of energy and its decibel from magnitude at once.
+        Args:
+            magnitude (np.ndarray): Magnitude spectrogram of the region.
+            frame_length (int): The length to calculate.
+        Returns:
+            rms (np.ndarray): Same as `calc_energy_rms(is_freq=True)`.
+            rms_db (np.ndarray): Same as `calc_amplitude_to_db(rms)`.
+        Notes:
+            This uses the fused kernel (numba if available), which doesn't make temporary arrays.
+        """
+        rms, rms_db = calc_rms_db_kernel(magnitude, frame_length)
+        return rms, rms_db
+
+    def calc_mean(self, audio_data: np.ndarray = None, dtype=None) -> np.float64:
         """
         Calc mean, given as np.ndarray
         Args:
             audio_data:
+            dtype: dtype to accumulate (the one of `audio_data` if it is float, otherwise float64)
         Returns:
         """
-        res = np.mean(audio_data, dtype=np.float64)
+        res = np.mean(audio_data, dtype=self.get_accumulator_dtype(audio_data=audio_data, dtype=dtype))
         return res
 
-    def calc_standard_deviation(self, audio_data: np.ndarray) -> Union[np.float64 | np.ndarray]:
+    def calc_standard_deviation(self, audio_data: np.ndarray, dtype=None) -> Union[np.float64 | np.ndarray]:
         """
         Calc standard deviation, given as np.ndarray.
         Notes:
             This function should be called for each voiced region.
             i.e., SD for each sentence
         """
-        res = np.std(a=audio_data, dtype=np.float64)
+        res = np.std(a=audio_data, dtype=self.get_accumulator_dtype(audio_data=audio_data, dtype=dtype))
         return res
 
     def calc_amplitude_to_db(self, audio_amplitude: np.ndarray) -> np.ndarray:
@@ -157,10 +241,8 @@ class AudioCalculator:
     def calc_f0_pyin(self, voiced_audio_data: np.ndarray = None, sample_rate: int = 16000,
                      frame_length: int = 512,
                      hop_length: int = 512 // 4,
-                     min_freq: int = librosa.note_to_hz("C2"), max_freq: int = librosa.note_to_hz("C7")) -> [np.ndarray,
-                                                                                                             np.ndarray,
-                                                                                                             np.ndarray,
-                                                                                                             np.ndarray]:
+                     min_freq: int = librosa.note_to_hz("C2"), max_freq: int = librosa.note_to_hz("C7"),
+                     decimation: int = 1) -> [np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
         """
         References:
             https://librosa.org/doc/main/generated/librosa.pyin.html
@@ -174,6 +256,8 @@ class AudioCalculator:
             min_freq:
             voiced_audio_data:
             sample_rate:
+            decimation: Decimate the signal by this factor before estimation, which is safe when `max_freq` is
+                far below the Nyquist frequency (see `F0RangeTracker.get_decimation()`).
         Returns:
             f0: time series of fundamental frequencies in Hertz.
             voiced_flag: time series containing boolean flags indicating whether a frame is voiced or not.
@@ -182,12 +266,19 @@ class AudioCalculator:
         Notes:
             `f0` contains `np.nan` if `librosa.pyin()` detects unvoiced region.
         """
+        if decimation > 1:
+            # frames are kept at the same times, since both of lengths are divided by the factor
+            voiced_audio_data = scipy.signal.resample_poly(voiced_audio_data, up=1, down=decimation)
+            sample_rate, frame_length, hop_length = (sample_rate // decimation, frame_length // decimation,
+                                                     hop_length // decimation)
         f0, voiced_flag, voiced_probs = librosa.pyin(y=voiced_audio_data, fmin=min_freq, fmax=max_freq, sr=sample_rate,
                                                      frame_length=frame_length, hop_length=hop_length)
         times = librosa.times_like(f0, hop_length=hop_length, sr=sample_rate)
         return f0, voiced_flag, voiced_probs, times
 
-    def calc_f0_dio(self, voiced_audio_data: np.ndarray = None, sample_rate: int = 16000):
+    def calc_f0_dio(self, voiced_audio_data: np.ndarray = None, sample_rate: int = 16000,
+                    min_freq: int = librosa.note_to_hz("C2"), max_freq: int = librosa.note_to_hz("C7"),
+                    hop_length_ms: float = 5.0):
         """
         Calculate f0 contour based on DIO algorithm.
         In this algorithm, there are three steps.
@@ -196,8 +287,14 @@ class AudioCalculator:
         3. select the highest reliability of that.
         References:
             https://scholar.archive.org/work/us4hwprcqbealjydiwyeakkky4/access/wayback/http://www.isca-speech.org:80/archive/Interspeech_2017/pdfs/0068.PDF
+        Notes:
+            This is much cheaper than Harvest, though less robust. The result is refined with stonemask as Harvest.
         """
-        pass
+        voiced_audio_data = np.ascontiguousarray(voiced_audio_data, dtype=np.float64)
+        _f0, temporal_positions = pw.dio(x=voiced_audio_data, fs=sample_rate, f0_floor=min_freq, f0_ceil=max_freq,
+                                         frame_period=hop_length_ms)
+        f0 = pw.stonemask(x=voiced_audio_data, temporal_positions=temporal_positions, f0=_f0, fs=sample_rate)
+        return f0
 
     def calc_f0_harvest(self, voiced_audio_data: np.ndarray = None, sample_rate: int = 16000,
                         min_freq: int = librosa.note_to_hz("C2"), max_freq: int = librosa.note_to_hz("C7"),
@@ -206,29 +303,38 @@ class AudioCalculator:
         Calculate f0 contour based on Harvest algorithm with stonemask which is f0 refinement method.
         References:
             https://web.archive.org/web/20180206035
+        Notes:
+            pyworld accepts only float64, so float32 data will be converted here.
         """
+        voiced_audio_data = np.ascontiguousarray(voiced_audio_data, dtype=np.float64)
         _f0, temporal_positions = pw.harvest(x=voiced_audio_data, fs=sample_rate, f0_floor=min_freq, f0_ceil=max_freq,
                                              frame_period=hop_length_ms)
         f0 = pw.stonemask(x=voiced_audio_data, temporal_positions=temporal_positions, f0=_f0, fs=sample_rate)
         return f0
 
-    def calc_average_f0(self, f0: np.ndarray = np.array([])) -> float_ | ndarray:
+    def calc_f0_moments(self, f0: np.ndarray = np.array([])) -> [np.float64, np.float64]:
         """
-        Calculate average of f0 for given array of f0 values.
+        Calculate average and standard deviation of f0 at once for given array of f0 values.
         Notes:
-            In this function, `np.nan` will be ignored when calculating mean.
+            In this function, `np.nan` and `0.0` (i.e., unvoiced) will be ignored, and `f0` won't be modified.
+            When all of them are unvoiced, `np.float64(0.0)` will be returned for both.
         """
-        # convert 0.0 into NaN
-        f0[f0 == 0.0] = np.nan
-        # avoid NaN when calculating
-        f0_avg = np.nanmean(f0, dtype=np.float64)
+        count, f0_avg, f0_std = calc_f0_moments_kernel(np.ascontiguousarray(f0).reshape(-1))
         try:
-            if np.isnan(f0_avg):
+            if count == 0:
                 raise GotNanException("Error when calculating average of f0")
         except GotNanException:
-            self.logger.logger.warn("Got value of `nan` when calculating average of f0.")
-            return np.float64(0.0)
-        return f0_avg
+            self.logger.logger.warning("Got value of `nan` when calculating average of f0.")
+            return np.float64(0.0), np.float64(0.0)
+        return np.float64(f0_avg), np.float64(f0_std)
+
+    def calc_average_f0(self, f0: np.ndarray = np.array([])) -> float_ | ndarray:
+        """
+        Calculate average of f0 for given array of f0 values.
+        Notes:
+            In this function, `np.nan` will be ignored when calculating mean.
+        """
+        return self.calc_f0_moments(f0=f0)[0]
 
     def calc_standard_deviation_f0(self, f0: np.ndarray = np.array([])) -> float_ | ndarray:
         """
@@ -236,14 +342,54 @@ class AudioCalculator:
         Notes:
             In this function, `np.nan` will be ignored when calculating mean.
         """
-        # convert 0.0 into NaN
-        f0[f0 == 0.0] = np.nan
-        # avoid NaN when calculating
-        f0_std = np.nanstd(f0, dtype=np.float64)
-        try:
-            if np.isnan(f0_std):
-                raise GotNanException("Error when calculating average of f0")
-        except GotNanException:
-            self.logger.logger.warn("Got value of `nan` when calculating average of f0.")
-            return np.float64(0.0)
-        return f0_std
+        return self.calc_f0_moments(f0=f0)[1]
+
+    def warm_up(self, sample_rate: int = 16000, f0_methods: Sequence[str] = ("Harvest",), n_fft: int = 512,
+                hop_length: int = 512 // 4, dtype="float64") -> float:
+        """
+        Run every estimator once on synthetic audio, so that the first real region won't pay first-call costs.
+        Args:
+            sample_rate: Sample rate used in the analysis.
+            f0_methods: The f0 estimators to be warmed up, e.g., ones of every level of `QualityGovernor`.
+            n_fft: Window length of STFT.
+            hop_length: Hop length of STFT.
+            dtype: Precision of the analysis, since numba compiles functions for each dtype.
+        Returns:
+            elapsed_sec (float): Time taken to warm up.
+        Notes:
+            librosa's numba-compiled functions (pYIN, STFT helpers) are compiled on the first call,
+            and they will be loaded from `NUMBA_CACHE_DIR` after the first run.
+        """
+        start = TimeMeasure.get_perf_counter()
+        # synthetic voice: harmonic tone of 150Hz surrounded by silence
+        t = np.arange(sample_rate) / sample_rate
+        tone = sum(np.sin(2 * np.pi * 150.0 * k * t) / k for k in range(1, 6))
+        voiced = (0.3 * tone / np.max(np.abs(tone)) * 2 ** 15).astype(np.int16)
+        silence = np.zeros(sample_rate // 2, dtype=np.int16)
+        synthetic = np.concatenate([silence, voiced, silence])
+
+        # vad (auditok)
+        for _ in self.vad_generator(audio_data=synthetic, sample_rate=sample_rate):
+            pass
+        # stft, magphase, rms and db
+        voiced_audio_data = (voiced / 2 ** 15).astype(dtype)
+        is_freq, magnitude = self.calc_short_time_fourier_transform(voiced_audio_data=voiced_audio_data, n_fft=n_fft,
+                                                                    hop_length=hop_length)
+        _, rms_db = self.calc_energy_rms_db(magnitude=magnitude, frame_length=n_fft)
+        self.calc_mean(audio_data=rms_db)
+        self.calc_standard_deviation(audio_data=rms_db)
+        # f0 estimators
+        for f0_method in f0_methods:
+            f0 = np.array([])
+            if f0_method == "pYIN":
+                f0 = self.calc_f0_pyin(voiced_audio_data=voiced_audio_data, sample_rate=sample_rate,
+                                       frame_length=n_fft, hop_length=hop_length)[0]
+            elif f0_method == "DIO":
+                f0 = self.calc_f0_dio(voiced_audio_data=voiced_audio_data, sample_rate=sample_rate)
+            elif f0_method == "Harvest":
+                f0 = self.calc_f0_harvest(voiced_audio_data=voiced_audio_data, sample_rate=sample_rate)
+            self.calc_f0_moments(f0=f0)
+        elapsed_sec = TimeMeasure.get_perf_counter() - start
+        self.logger.logger.info("Warm-up of estimators ({}) took {:.3f}sec.".format(", ".join(f0_methods),
+                                                                                   elapsed_sec))
+        return elapsed_sec
@@ -1,11 +1,12 @@
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
-import numpy as np
-
-import queue
+import asyncio
 from typing import List
 
+from audio_runtime import AudioRuntime
+from file_input_stream import FileInputStream
+from plot_process import PlotProcess
+from shared_ring_buffer import SharedRingBuffer
 from util.logger import Logger
+from util.profile import Profile
 from util import sd
 
 
@@ -24,8 +25,8 @@ class AudioHandler:
         self.interval: float = 30.0
         self.samplerate: int = sd.default.samplerate
         self.channels: List[int] = [1]  # input channels to plot
-        self.lines = None
-        self.plot_data = None
+        self.f0_max: float = 600.0  # upper limit of f0 plot
+        self.plot_processes: List[PlotProcess] = []
 
         # Logger.setting
         self.logger = Logger(name=__name__)
@@ -39,65 +40,85 @@ class AudioHandler:
         This method just input and does not plot anything.
         Returns:
         """
+        # warm up estimators while the device is opening
+        warm_up_thread = self.audio_stream.start_warm_up() if Profile.args.warm_up else None
         if is_buffer:  # i.e., input is type of `byte`
             self.audio_stream.stream = self.audio_stream.get_input_stream_raw()
             self.logger.logger.info("Streaming with buffer mode.")
         else:  # i.e., input is type of `np.ndarray`
             self.audio_stream.stream = self.audio_stream.get_input_stream_numpy()
             self.logger.logger.info("Streaming with numpy mode.")
-        # start streaming
-        with self.audio_stream.stream:
-            self.logger.logger.info("Steaming...")
-            self.logger.logger.info("Starting voice activity detection.")
-            # callback start
-            self.audio_stream.zeromq_sender.handle_message()
-
-            input("If you want to exit, please put any.")  # wait for keyboard
+        if warm_up_thread is not None:
+            warm_up_thread.join()  # the first block should be processed as fast as later ones
+        if self.audio_stream.f0_worker_pool is not None:
+            self.audio_stream.f0_worker_pool.wait_for_workers(count=Profile.args.f0_workers)
+        # start streaming, until SIGINT, SIGTERM or enter key
+        self.logger.logger.info("Starting voice activity detection.")
+        asyncio.run(AudioRuntime(audio_stream=self.audio_stream).run())
 
-    def start_plot_amplitude(self):
-        # plot setting
-        length = int(self.window * self.samplerate / (1000 * self.audio_stream.DOWN_SAMPLE))
-        self.plot_data = np.zeros((length, len(self.channels)))
-        fig, ax = plt.subplots()
-        self.lines = ax.plot(self.plot_data)
-        if len(self.channels) > 1:
-            ax.legend(['channel {}'.format(c) for c in self.channels],
-                      loc='lower left', ncol=len(self.channels))
-        ax.axis((0, len(self.plot_data), -1, 1))
-        ax.set_yticks([0])
-        ax.yaxis.grid(True)
-        ax.tick_params(bottom='off', top='off', labelbottom='off',
-                       right='off', left='off', labelleft='off')
-        fig.tight_layout(pad=0)
-
-        # stream setting
-        self.audio_stream.stream = self.audio_stream.get_input_stream_numpy()
-        ani = FuncAnimation(fig, self.update_plot, interval=self.interval, blit=True)
-        with self.audio_stream.stream:
-            plt.show()
+    def start_file(self, filename: str):
+        """
+        Replay an audio file through the same pipeline as `start_input()`, e.g., to reproduce and profile latency.
+        It stops after the last block (or by SIGINT, SIGTERM or enter key).
+        Args:
+            filename (str): Audio file, whose sample rate is set as the input one by `AudioManipulator`.
+        """
+        warm_up_thread = self.audio_stream.start_warm_up() if Profile.args.warm_up else None
+        runtime = AudioRuntime(audio_stream=self.audio_stream)
+        self.audio_stream.stream = FileInputStream(filename=filename, callback=self.audio_stream.audio_callback_numpy,
+                                                   blocksize=self.audio_stream.FRAME_LENGTH,
+                                                   speed=Profile.args.replay_speed,
+                                                   finished_callback=runtime.request_stop_threadsafe)
+        self.logger.logger.info("Replaying {} (speed: {}).".format(filename, Profile.args.replay_speed))
+        if warm_up_thread is not None:
+            warm_up_thread.join()
+        if self.audio_stream.f0_worker_pool is not None:
+            self.audio_stream.f0_worker_pool.wait_for_workers(count=Profile.args.f0_workers)
+        asyncio.run(runtime.run())
 
-    def update_plot(self, frame):
+    def start_plot_amplitude(self, with_f0: bool = False):
         """
-        This is called for each plot update.
+        Plot amplitude in another process while analysing the input.
         Args:
-            frame:
-        Returns:
+            with_f0 (bool): Plot f0 contour in addition to amplitude.
+        Notes:
+            The plot process consumes `AudioBus` of `AudioStream`, so that plotting won't compete
+            with the analysis for the GIL.
         """
-        while True:
-            try:
-                data = self.audio_stream.buffer.get_nowait()
-            except queue.Empty:
-                break
-            shift = len(data)
-            self.plot_data = np.roll(self.plot_data, -shift, axis=0)
-            self.plot_data[-shift:, :] = data
-        for column, line in enumerate(self.lines):
-            line.set_ydata(self.plot_data[:, column])
-        return self.lines
+        length = int(self.window * self.samplerate / (1000 * self.audio_stream.DOWN_SAMPLE))
+        self.plot_processes.append(PlotProcess(name=self.audio_stream.audio_bus.name, capacity=length,
+                                               channels=len(self.channels), kind="amplitude",
+                                               interval=self.interval, down_sample=self.audio_stream.DOWN_SAMPLE))
+        if with_f0:
+            self.start_plot_f0()
+            return
+        self.start_plot_processes()
 
     def start_plot_f0(self):
         """
-        Todo: Implement
+        Plot f0 contour in another process while analysing the input.
         Returns:
         """
-        pass
+        frame_period_ms = self.audio_stream.get_f0_frame_period_ms()
+        self.audio_stream.f0_ring = SharedRingBuffer(capacity=int(self.window / frame_period_ms))
+        self.plot_processes.append(PlotProcess(name=self.audio_stream.f0_ring.name,
+                                               capacity=self.audio_stream.f0_ring.capacity, kind="f0",
+                                               interval=self.interval, y_range=(0.0, self.f0_max)))
+        self.start_plot_processes()
+
+    def start_plot_processes(self):
+        """
+        Start plot processes, then start input. Plot processes and shared memory will be released after input.
+        """
+        for plot_process in self.plot_processes:
+            plot_process.start()
+        try:
+            self.start_input(is_buffer=Profile.args.raw_buffer)
+        finally:
+            for plot_process in self.plot_processes:
+                plot_process.stop()
+            self.plot_processes = []
+            if self.audio_stream.f0_ring is not None:
+                self.audio_stream.f0_ring.close()
+                self.audio_stream.f0_ring.unlink()
+                self.audio_stream.f0_ring = None
@@ -0,0 +1,141 @@
+# Fused kernels for hot helpers of `AudioCalculator`.
+# They are compiled by numba (cached on disk, and `nogil` so that they can run in parallel threads)
+# if numba is available, otherwise the pure numpy versions with the same results are used.
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+    IS_NUMBA_AVAILABLE = True
+except ImportError:
+    njit = None
+    IS_NUMBA_AVAILABLE = False
+
+
+def _rms_db_loop(magnitude, frame_length):
+    """
+    Framewise rms and its decibel from magnitude spectrogram, whose shape is (1 + n_fft // 2, frames).
+    This is the same as `librosa.feature.rms(S=magnitude)` followed by `20 * log10(rms)`, without temporaries.
+    """
+    num_bins, num_frames = magnitude.shape
+    rms = np.empty((1, num_frames), dtype=magnitude.dtype)
+    rms_db = np.empty((1, num_frames), dtype=magnitude.dtype)
+    is_even = frame_length % 2 == 0
+    for j in range(num_frames):
+        power = 0.0
+        for i in range(num_bins):
+            value = abs(magnitude[i, j])
+            power += value * value
+        # adjust the DC and sr/2 component
+        first = abs(magnitude[0, j])
+        power -= 0.5 * first * first
+        if is_even:
+            last = abs(magnitude[num_bins - 1, j])
+            power -= 0.5 * last * last
+        value = math.sqrt(2.0 * power / (frame_length * frame_length))
+        rms[0, j] = value
+        rms_db[0, j] = 20.0 * math.log10(value) if value > 0.0 else -np.inf
+    return rms, rms_db
+
+
+def _f0_moments_loop(f0):
+    """
+    Mean and standard deviation of voiced f0 in single pass (Welford), ignoring `NaN` and `0.0` (unvoiced).
+    `f0` should be one-dimensional.
+    Returns:
+        count, mean, std: `mean` and `std` are `NaN` if `count` is 0.
+    """
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    for i in range(f0.shape[0]):
+        value = f0[i]
+        if value > 0.0:  # False for NaN
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            m2 += delta * (value - mean)
+    if count == 0:
+        return 0, np.nan, np.nan
+    return count, mean, math.sqrt(m2 / count)
+
+
+def _envelope_peaks_loop(values, times, state, alpha, prominence, min_interval, max_gap):
+    """
+    Count peaks of the smoothed envelope (e.g., dB of voiced frames) which rise and fall by `prominence`,
+    i.e., nuclei of syllables, in single pass. The detector continues over calls with `state`
+    (float64 array of 7: smoothed value, rising (1.0) or falling (0.0), extreme, its time, valley before it,
+    time of the last peak and time of the last frame, which is NaN at first).
+    Frames apart more than `max_gap` (e.g., a pause) restart the detector, and the peak just before the gap
+    is counted without falling. Peaks closer than `min_interval` to the last one are ignored.
+    """
+    count = 0
+    for i in range(values.shape[0]):
+        value = values[i]
+        t = times[i]
+        if not math.isfinite(value):  # e.g., -inf dB of digital silence
+            continue
+        if math.isnan(state[6]) or t - state[6] > max_gap:
+            if state[1] == 1.0 and state[2] - state[4] >= prominence and state[3] - state[5] >= min_interval:
+                count += 1
+                state[5] = state[3]
+            state[0] = value
+            state[1] = 1.0
+            state[2] = value
+            state[3] = t
+            state[4] = value
+        else:
+            state[0] += alpha * (value - state[0])
+        smoothed = state[0]
+        if state[1] == 1.0:  # rising to a peak
+            if smoothed > state[2]:
+                state[2] = smoothed
+                state[3] = t
+            elif smoothed < state[2] - prominence:
+                if state[2] - state[4] >= prominence and state[3] - state[5] >= min_interval:
+                    count += 1
+                    state[5] = state[3]
+                state[1] = 0.0
+                state[2] = smoothed
+                state[3] = t
+        else:  # falling to a valley
+            if smoothed < state[2]:
+                state[2] = smoothed
+                state[3] = t
+            elif smoothed > state[2] + prominence:
+                state[4] = state[2]
+                state[1] = 1.0
+                state[2] = smoothed
+                state[3] = t
+        state[6] = t
+    return count
+
+
+def _rms_db_numpy(magnitude, frame_length):
+    power = np.abs(magnitude) ** 2
+    power[0] *= 0.5
+    if frame_length % 2 == 0:
+        power[-1] *= 0.5
+    # a Python float keeps the dtype of `magnitude` (an int of `frame_length ** 2` promotes float32 to float64)
+    rms = np.sqrt(np.sum(power, axis=-2, keepdims=True) * (2.0 / frame_length ** 2))
+    with np.errstate(divide="ignore"):
+        rms_db = 20 * np.log10(rms)
+    return rms, rms_db
+
+
+def _f0_moments_numpy(f0):
+    voiced = f0[f0 > 0.0]  # False for NaN
+    if voiced.size == 0:
+        return 0, np.nan, np.nan
+    return voiced.size, float(np.mean(voiced, dtype=np.float64)), float(np.std(voiced, dtype=np.float64))
+
+
+if IS_NUMBA_AVAILABLE:
+    calc_rms_db_kernel = njit(cache=True, nogil=True)(_rms_db_loop)
+    calc_f0_moments_kernel = njit(cache=True, nogil=True)(_f0_moments_loop)
+    calc_envelope_peaks_kernel = njit(cache=True, nogil=True)(_envelope_peaks_loop)
+else:
+    calc_rms_db_kernel = _rms_db_numpy
+    calc_f0_moments_kernel = _f0_moments_numpy
+    calc_envelope_peaks_kernel = _envelope_peaks_loop  # a state machine, which has no vectorized form
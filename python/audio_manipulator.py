@@ -23,6 +23,7 @@ class AudioManipulator:
         import re
         self.pattern = re.compile("\\S+")
         self.INPUT_SAMPLE_RATE: int = 16000  # input samplerate of the device (can be down sampled)
+        self.ANALYSIS_SAMPLE_RATE: int = 16000  # samplerate for analysis, which input will be resampled into
 
     def get_devices(self):
         # session for listing audio_util device
@@ -96,6 +97,7 @@ class AudioManipulator:
         sd.default.channels = (1, devices[device_index]['max_output_channels'])
         # default setting for fields
         self.INPUT_SAMPLE_RATE = sd.default.samplerate
+        self.ANALYSIS_SAMPLE_RATE = Profile.args.analysis_sample_rate
 
     def set_input_device(self, use_default: bool = False) -> bool:
         """
@@ -156,7 +158,35 @@ class AudioManipulator:
             is_success = True
             return is_success
 
-    def int_to_float64(self, audio_data: np.ndarray = None):
+    def set_input_file(self, filename: str) -> bool:
+        """
+        Use an audio file as the input source instead of the device, which will be replayed by `FileInputStream`.
+        Args:
+            filename (str): Path of the audio file.
+        Returns:
+            success (bool): Successfully set the file or not
+        """
+        import soundfile as sf
+        try:
+            info = sf.info(filename)
+        except RuntimeError:  # e.g., not found or unsupported format
+            self.logger.logger.exception("On file selecting, {} can't be read.".format(filename))
+            return False
+        self.INPUT_SAMPLE_RATE = info.samplerate
+        self.ANALYSIS_SAMPLE_RATE = Profile.args.analysis_sample_rate
+        Profile.is_input_device_set = True
+        self.logger.logger.info("Successfully set input file ({} Hz, {:.1f} sec).".format(
+            info.samplerate, info.duration))
+        return True
+
+    def int_to_float(self, audio_data: np.ndarray = None, dtype="float64"):
+        """
+        Convert int16 samples into float ones in [-1.0, 1.0).
+        Args:
+            audio_data: int16 samples.
+            dtype: `float32` or `float64` (see `Profile.analysis_dtype`).
+        Returns:
+        """
         pattern = r"(float)\d{2,3}"
         res: Union[re.Match, None] = re.match(pattern, str(audio_data.dtype))
         try:
@@ -166,9 +196,14 @@ class AudioManipulator:
             self.logger.logger.exception("{} can't accept float.".format(__name__))
             import sys
             sys.exit(1)  # exit as failure
-        res = (audio_data / 2 ** 15).astype(np.float64)
+        # scale after casting, so that no temporary array of float64 is made for float32
+        res = audio_data.astype(dtype)
+        res *= res.dtype.type(1 / 2 ** 15)
         return res
 
+    def int_to_float64(self, audio_data: np.ndarray = None):
+        return self.int_to_float(audio_data=audio_data, dtype=np.float64)
+
     def float_to_int16(self, audio_data: np.ndarray = None):
         try:
             if audio_data.dtype == "int16":
@@ -180,15 +215,22 @@ class AudioManipulator:
         res = (audio_data * 2 ** 15).astype(np.int16)
         return res
 
+    def get_output_directory(self) -> str:
+        """
+        Directory to save outputs such as recorded audio.
+        """
+        import os
+        # get current executing path
+        absolute_path = os.path.abspath("..")
+        return os.path.join(absolute_path, "etc")
+
     def save_wav_auditok(self, audio_region: auditok.AudioRegion, file_name: str = None):
         # if file name is empty, set time format
         if not file_name:
             import datetime
             file_name = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         import os
-        # get current executing path
-        absolute_path = os.path.abspath("..")
-        destination_path = os.path.join(absolute_path, "etc")
+        destination_path = self.get_output_directory()
         file_path = os.path.join(destination_path, file_name + ".wav")
         # if there is no path, make directories
         if not os.path.exists(destination_path):
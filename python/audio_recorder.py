@@ -0,0 +1,245 @@
+import datetime
+import os
+import queue
+import struct
+import threading
+from typing import Union
+
+import numpy as np
+
+from region_index import RegionIndexWriter
+from util.logger import Logger
+from util.time_measure import TimeMeasure
+
+
+class WavFileWriter:
+    """
+    Writer of 16bit PCM WAV, which can fix up its header while the file is still open.
+    Notes:
+        Sizes in the header are written as zero at first, and `update_header()` overwrites them,
+        so that the file is readable up to the last update even if the process crashes.
+    """
+
+    def __init__(self, file_path: str, sample_rate: int, channels: int = 1, sample_width: int = 2):
+        self.file_path = file_path
+        self.sample_rate = int(sample_rate)
+        self.channels = channels
+        self.sample_width = sample_width
+        self.frames: int = 0
+        self.data_bytes: int = 0
+        self._file = open(file_path, "wb")
+        self._write_header()
+
+    def _write_header(self) -> None:
+        block_align = self.channels * self.sample_width
+        self._file.write(struct.pack("<4sI4s4sIHHIIHH4sI",
+                                     b"RIFF", 36 + self.data_bytes, b"WAVE",
+                                     b"fmt ", 16, 1, self.channels, self.sample_rate,
+                                     self.sample_rate * block_align, block_align, self.sample_width * 8,
+                                     b"data", self.data_bytes))
+
+    def write(self, samples: np.ndarray) -> None:
+        data = np.ascontiguousarray(samples, dtype="<i2").tobytes()
+        self._file.write(data)
+        self.data_bytes += len(data)
+        self.frames += len(data) // (self.channels * self.sample_width)
+
+    def update_header(self) -> None:
+        """
+        Fix up sizes in the header (RIFF and data chunk), then go back to the end.
+        """
+        self._file.seek(4)
+        self._file.write(struct.pack("<I", 36 + self.data_bytes))
+        self._file.seek(40)
+        self._file.write(struct.pack("<I", self.data_bytes))
+        self._file.seek(0, os.SEEK_END)
+        self._file.flush()
+
+    def close(self) -> None:
+        self.update_header()
+        self._file.close()
+
+
+class SoundFileWriter:
+    """
+    Writer of compressed formats (e.g., FLAC) with `soundfile`.
+    Notes:
+        libsndfile finalizes the header of FLAC on closing, so `update_header()` just flushes written frames.
+    """
+
+    def __init__(self, file_path: str, sample_rate: int, channels: int = 1, file_format: str = "FLAC"):
+        import soundfile as sf
+        self.file_path = file_path
+        self.frames: int = 0
+        self._file = sf.SoundFile(file_path, mode="w", samplerate=int(sample_rate), channels=channels,
+                                  format=file_format, subtype="PCM_16")
+
+    @property
+    def data_bytes(self) -> int:
+        return os.path.getsize(self.file_path)
+
+    def write(self, samples: np.ndarray) -> None:
+        self._file.write(samples)
+        self.frames += len(samples)
+
+    def update_header(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class AudioRecorder:
+    """
+    Record voiced regions incrementally into files on a background writer thread.
+    Each region is appended as soon as it is closed, so neither memory nor callback time grows with
+    session length, and a crash loses at most the regions since the last header update.
+    The timeline of regions is written into the index file (`.idx`) which has the same name as the recording.
+    Args:
+        sample_rate: Sample rate of regions.
+        directory: Directory to write files.
+        file_format: `wav` or `flac`.
+        max_bytes: Rotate file when its size exceeds this (no limit when 0).
+        max_duration_sec: Rotate file when its duration exceeds this (no limit when 0).
+        header_update_sec: Interval to fix up the header of the file.
+        max_queue_regions: Regions waiting for the writer, beyond which new regions are dropped.
+    Notes:
+        A region which fails to be written (e.g., the disk is full) is dropped, and the next region starts
+        a new file, so that the writer thread keeps running.
+    """
+    _STOP = None  # sentinel for the writer thread
+
+    def __init__(self, sample_rate: int, directory: str, file_format: str = "wav", channels: int = 1,
+                 max_bytes: int = 0, max_duration_sec: float = 0.0, header_update_sec: float = 5.0,
+                 max_queue_regions: int = 256):
+        self.logger = Logger(name=__name__)
+        self.sample_rate = int(sample_rate)
+        self.directory = directory
+        self.file_format = file_format.lower()
+        self.channels = channels
+        self.max_bytes = max_bytes
+        self.max_duration_sec = max_duration_sec
+        self.header_update_sec = header_update_sec
+
+        self.writer: Union[WavFileWriter, SoundFileWriter, None] = None
+        self.index_writer: Union[RegionIndexWriter, None] = None
+        self.file_count: int = 0
+        self.dropped_count: int = 0  # regions dropped since the queue was full
+        self.failed_count: int = 0  # regions dropped since they failed to be written
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_regions)
+        self._thread = threading.Thread(target=self._run, name="audio_recorder", daemon=True)
+        self._thread.start()
+
+    def append(self, samples: np.ndarray, record: np.ndarray = None) -> None:
+        """
+        Append a region of int16 samples. This never blocks, so it can be called from the audio callback.
+        Args:
+            samples: Samples of the region.
+            record: Record of `RegionIndexWriter.DTYPE` for the region, whose `file_offset` will be filled.
+        """
+        try:
+            self._queue.put_nowait((samples, record))
+        except queue.Full:
+            self.dropped_count += 1
+            self.logger.logger.warning("Recording falls behind, so a region is dropped ({} in total).".format(
+                self.dropped_count))
+
+    def _open(self) -> None:
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        file_name = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        if self.file_count > 0:  # rotated in the same second
+            file_name += "_{}".format(self.file_count)
+        file_path = os.path.join(self.directory, file_name + "." + self.file_format)
+        if self.file_format == "wav":
+            self.writer = WavFileWriter(file_path=file_path, sample_rate=self.sample_rate, channels=self.channels)
+        else:
+            self.writer = SoundFileWriter(file_path=file_path, sample_rate=self.sample_rate, channels=self.channels,
+                                          file_format=self.file_format.upper())
+        self.index_writer = RegionIndexWriter(file_path=os.path.join(self.directory, file_name + ".idx"),
+                                              sample_rate=self.sample_rate)
+        self.file_count += 1
+        self.logger.logger.info("Start recording into {}.".format(file_path))
+
+    def _close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.index_writer.close()
+            self.logger.logger.info("Saved {}.".format(self.writer.file_path))
+            self.writer = None
+            self.index_writer = None
+
+    def _discard(self) -> None:
+        # the file may be broken after an error, so the next region starts a new one
+        for writer in (self.writer, self.index_writer):
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception:
+                    self.logger.logger.exception("Failed to close {}.".format(writer.file_path))
+        self.writer = None
+        self.index_writer = None
+
+    def _write(self, samples: np.ndarray, record: Union[np.ndarray, None]) -> None:
+        if self.writer is None:
+            self._open()
+        if record is not None:
+            record["file_offset"] = self.writer.frames
+            self.index_writer.write(record)
+        self.writer.write(samples)
+        if self._is_rotation_needed():
+            self._close()
+
+    def _is_rotation_needed(self) -> bool:
+        if self.max_bytes > 0 and self.writer.data_bytes >= self.max_bytes:
+            return True
+        if self.max_duration_sec > 0 and self.writer.frames / self.sample_rate >= self.max_duration_sec:
+            return True
+        return False
+
+    def _run(self) -> None:
+        """
+        Loop of the writer thread.
+        """
+        last_update = TimeMeasure.get_perf_counter()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.header_update_sec)
+            except queue.Empty:
+                pass
+            else:
+                if item is AudioRecorder._STOP:
+                    break
+                try:
+                    self._write(*item)
+                except Exception:
+                    self.failed_count += 1
+                    self.logger.logger.exception("Failed to record a region, which is dropped ({} in total).".format(
+                        self.failed_count))
+                    self._discard()
+            # periodic header fix-up
+            now = TimeMeasure.get_perf_counter()
+            if self.writer is not None and now - last_update >= self.header_update_sec:
+                try:
+                    self.writer.update_header()
+                    self.index_writer.flush()
+                except Exception:
+                    self.logger.logger.exception("Failed to update the header of {}.".format(self.writer.file_path))
+                    self._discard()
+                last_update = now
+        try:
+            self._close()
+        except Exception:
+            self.logger.logger.exception("Failed to close the recording.")
+            self._discard()
+
+    def close(self) -> None:
+        """
+        Write all of queued regions, then close the file.
+        """
+        if self._thread.is_alive():
+            self._queue.put(AudioRecorder._STOP)
+            self._thread.join()
+        if self.dropped_count > 0 or self.failed_count > 0:
+            self.logger.logger.error("{} regions weren't recorded ({} behind, {} failed).".format(
+                self.dropped_count + self.failed_count, self.dropped_count, self.failed_count))
@@ -0,0 +1,186 @@
+import asyncio
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Union
+
+import numpy as np
+
+from util.logger import Logger
+from util.time_measure import TimeMeasure
+
+
+class AudioRuntime:
+    """
+    Single asyncio runtime which owns capture, the handoff to the analysis worker, publishing and shutdown.
+    1. The audio callback copies each block and hands it to the event loop (`submit()`), which never blocks.
+    2. The worker coroutine takes blocks in order, and runs `AudioStream.handle_block()` on one analysis thread.
+    3. The feature record of the block is published with ZeroMQ on the loop, right after the analysis.
+       Requests of subscribers on the control socket are also served on the loop.
+    SIGINT, SIGTERM (or enter key on the console) stops capture, then blocks in the queue are drained,
+    and the recorder is flushed before returning.
+    Args:
+        audio_stream: `AudioStream` whose `stream` is already created.
+        max_queue_blocks: The number of blocks waiting for the analysis; newer blocks are dropped beyond it.
+    """
+    _STOP = None  # sentinel for the worker
+
+    def __init__(self, audio_stream, max_queue_blocks: int = 32):
+        self.logger = Logger(name=__name__)
+        self.audio_stream = audio_stream
+        self.max_queue_blocks = max_queue_blocks
+        self.loop: Union[asyncio.AbstractEventLoop, None] = None
+        self.block_queue: Union[asyncio.Queue, None] = None
+        self.stop_event: Union[asyncio.Event, None] = None
+        # one thread, so that blocks are analysed in order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis")
+        self.dropped_count: int = 0  # blocks dropped since the last analysis
+        self.latency_ms: float = 0.0  # from the callback to publishing, of the latest block
+        # callbacks of the stream hand blocks over to this runtime
+        self.audio_stream.on_block = self.submit
+
+    def submit(self, indata: np.ndarray, frames: int) -> None:
+        """
+        Hand a block over from the audio callback. This is thread-safe and returns immediately.
+        Args:
+            indata (np.ndarray): int16 samples, which are copied since the buffer is reused by the device.
+            frames: The number of frames in the block.
+        """
+        self.loop.call_soon_threadsafe(self._enqueue, (np.array(indata, copy=True), frames,
+                                                       TimeMeasure.get_perf_counter()))
+
+    def _enqueue(self, item: Tuple[np.ndarray, int, float]) -> None:
+        # blocks submitted until the stream stops are still queued before the sentinel, and drained
+        if self.block_queue.full():
+            self.dropped_count += 1
+            self.logger.logger.warning("Analysis falls behind, so a block is dropped.")
+            return
+        self.block_queue.put_nowait(item)
+
+    def request_stop(self) -> None:
+        if not self.stop_event.is_set():
+            self.logger.logger.info("Stopping...")
+            self.stop_event.set()
+
+    def request_stop_threadsafe(self) -> None:
+        """
+        Request stop from other threads, e.g., when the replay of a file is finished.
+        Blocks submitted before this are still drained, since the loop handles them in order.
+        """
+        self.loop.call_soon_threadsafe(self.request_stop)
+
+    async def run(self) -> None:
+        """
+        Stream until stop is requested, then drain and clean up.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.block_queue = asyncio.Queue(maxsize=self.max_queue_blocks)
+        self.stop_event = asyncio.Event()
+        self.install_stop_triggers()
+        worker = asyncio.create_task(self.work())
+        worker.add_done_callback(self._on_worker_done)
+        sender = self.audio_stream.zeromq_sender
+        control = asyncio.create_task(sender.serve_control()) if sender.control_socket is not None else None
+        # place the loop and the analysis thread before the first block, and report them
+        placement = self.audio_stream.thread_placement
+        placement.place_publish()
+        await self.loop.run_in_executor(self.executor, placement.place_analysis)
+        placement.report()
+        stream = self.audio_stream.stream
+        stream.start()
+        self.logger.logger.info("Streaming... press enter or Ctrl+C to exit.")
+        try:
+            await self.stop_event.wait()
+        finally:
+            # no more blocks are submitted after the stream is stopped
+            await self.loop.run_in_executor(None, stream.stop)
+            stream.close()
+            await self.stop_worker(worker=worker)
+            if control is not None:
+                control.cancel()
+                await asyncio.gather(control, return_exceptions=True)
+            self.remove_stop_triggers()
+            # write the remaining regions on the analysis thread, after the last block
+            for save in (self.audio_stream.save_region, self.audio_stream.save_features,
+                         self.audio_stream.save_checkpoint):
+                try:
+                    await self.loop.run_in_executor(self.executor, save)
+                except Exception:
+                    self.logger.logger.exception("Failed to {}.".format(save.__name__.replace("_", " ")))
+            self.executor.shutdown(wait=True)
+            self.audio_stream.zeromq_sender.close()
+            self.logger.logger.info("Stopped.")
+
+    async def stop_worker(self, worker: asyncio.Task) -> None:
+        """
+        Let the worker drain the remaining blocks and stop at the sentinel.
+        The sentinel isn't queued if the worker is gone, since nobody would take it from the full queue.
+        """
+        if not worker.done():
+            put = asyncio.ensure_future(self.block_queue.put(AudioRuntime._STOP))
+            await asyncio.wait({put, worker}, return_when=asyncio.FIRST_COMPLETED)
+            if not put.done():
+                put.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+
+    def _on_worker_done(self, worker: asyncio.Task) -> None:
+        # the worker ends only at the sentinel, so anything else stops the stream instead of dropping every block
+        if worker.cancelled():
+            self.request_stop()
+        elif worker.exception() is not None:
+            self.logger.logger.error("Analysis worker stopped unexpectedly.", exc_info=worker.exception())
+            self.request_stop()
+
+    async def work(self) -> None:
+        """
+        Analyse and publish blocks in order until the sentinel.
+        A block which fails is logged and skipped, so that the following blocks are still analysed.
+        """
+        while True:
+            item = await self.block_queue.get()
+            if item is AudioRuntime._STOP:
+                return
+            indata, frames, submitted = item
+            # real queue depth (and dropped blocks) tells the pressure to `QualityGovernor`
+            queue_depth = self.block_queue.qsize() + self.dropped_count
+            self.dropped_count = 0
+            try:
+                await self.loop.run_in_executor(self.executor, self.audio_stream.handle_block, indata, frames,
+                                                queue_depth)
+                self.audio_stream.handle_sending()
+                await self.audio_stream.zeromq_sender.send_message()
+                await self.audio_stream.zeromq_sender.send_subscriptions(record=self.audio_stream.feature_record)
+            except Exception:
+                self.logger.logger.exception("Failed to analyse or publish a block, which is skipped.")
+                continue
+            self.latency_ms = (TimeMeasure.get_perf_counter() - submitted) * 1000
+            self.logger.logger.debug("Block published in {:.1f} msec (queue: {}).".format(
+                self.latency_ms, queue_depth))
+
+    def install_stop_triggers(self) -> None:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self.request_stop)
+            except (NotImplementedError, RuntimeError):  # e.g., Windows
+                signal.signal(sig, lambda *_: self.loop.call_soon_threadsafe(self.request_stop))
+        if sys.stdin is not None and sys.stdin.isatty():
+            try:
+                self.loop.add_reader(sys.stdin.fileno(), self._on_stdin)
+            except (NotImplementedError, ValueError):
+                pass
+
+    def remove_stop_triggers(self) -> None:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.remove_signal_handler(sig)
+            except (NotImplementedError, RuntimeError):
+                signal.signal(sig, signal.default_int_handler if sig == signal.SIGINT else signal.SIG_DFL)
+        if sys.stdin is not None and sys.stdin.isatty():
+            try:
+                self.loop.remove_reader(sys.stdin.fileno())
+            except (NotImplementedError, ValueError):
+                pass
+
+    def _on_stdin(self) -> None:
+        sys.stdin.readline()
+        self.request_stop()
@@ -1,14 +1,30 @@
-import re
-import queue
-from typing import Dict, Any, Union
+import datetime
+import os
+import threading
+from typing import Callable, Dict, FrozenSet, Iterable, List, Sequence, Set, Union
 
 import numpy as np
-import auditok
 
 from audio import Audio
+from audio_bus import AudioBus
+from audio_recorder import AudioRecorder
+from f0_range_tracker import F0RangeTracker
+from f0_worker_pool import F0WorkerPool
+from feature_graph import FeatureGraph
+from feature_store import FeatureStore
+from region_index import RegionIndexWriter
+from quality_governor import QualityGovernor
+from rolling_statistics import RunningMoments
+from streaming_f0_tracker import StreamingF0Tracker
+from thread_placement import ThreadPlacement
+from streaming_resampler import StreamingResampler
+from session_checkpoint import SessionCheckpoint
+from shared_ring_buffer import SharedRingBuffer
+from speech_timeline import SpeechTimeline
 from util import sd
 from util.exception import *
 from util.profile import Profile
+from util.time_measure import TimeMeasure
 from util.logger import Logger
 
 
@@ -17,7 +33,33 @@ class AudioStream(Audio):
     This class controls audio_util coming from audio_util device (microphone), using `Python-sounddevice.`
     Note that your available audio_util device could be list by just write `$ python -m sounddevice`
     And an instance of this class will be used in `AudioController` class in `audio_handler.py`
+    Attributes:
+        FEATURE_OUTPUTS: Outputs of the feature graph which are needed for each feature of `QualityLevel`.
+        KEY_FEATURES: Features which fields of the record need (fields which aren't listed need none).
+        ROLLING_FEATURES: Features which rolling statistics of each name need (e.g., `average_rms_db_10s`).
+        PERSISTED_FEATURES: Features computed whatever clients subscribe, since the recording (region index),
+            `FeatureStore` and totals of the session (checkpoint) need them.
+            f0 is left to the demand, since it is the costly one.
     """
+    FEATURE_OUTPUTS: Dict[str, FrozenSet[str]] = {
+        "rms": frozenset({"rms", "rms_db", "rms_db_times", "rms_db_moments"}),
+        "f0": frozenset({"f0", "f0_moments"}),
+    }
+    KEY_FEATURES: Dict[str, FrozenSet[str]] = dict({
+        "average_rms": frozenset({"rms"}),
+        "average_rms_db": frozenset({"rms"}),
+        "average_rms_db_total": frozenset({"rms"}),
+        "std_rms_db": frozenset({"rms"}),
+        "std_rms_db_total": frozenset({"rms"}),
+        "average_f0": frozenset({"f0"}),
+        "std_f0": frozenset({"f0"}),
+    }, **dict.fromkeys(SpeechTimeline.ENVELOPE_FIELDS, frozenset({"rms"})))  # syllables are peaks of dB
+    ROLLING_FEATURES: Dict[str, FrozenSet[str]] = {
+        "rms_db": frozenset({"rms"}),
+        "f0": frozenset({"f0"}),
+        "voiced_ratio": frozenset(),
+    }
+    PERSISTED_FEATURES: FrozenSet[str] = frozenset({"rms"})
 
     def __init__(self, audio_manipulator=None, audio_calculator=None, zeromq_sender=None) -> None:
         """
@@ -38,29 +80,121 @@ class AudioStream(Audio):
         else:
             # setting for input device
             self.DOWN_SAMPLE: int = 20
-            self.CHUNK_DURATION_MS: int = 25 * 40 * 5
+            # shorter blocks with the streaming f0 tracker, so that f0 is emitted as audio arrives
+            self.CHUNK_DURATION_MS: int = Profile.args.block_ms or (1000 if Profile.args.streaming_f0 else 25 * 40 * 5)
             self.FRAME_LENGTH: int = int(  # number of overall frames per callback
                 self.audio_manipulator.INPUT_SAMPLE_RATE * self.CHUNK_DURATION_MS / 1000)
             self.WINDOW_LENGTH: int = 512  # length for each sliding process
             self.HOP_LENGTH: int = self.WINDOW_LENGTH // 4  # usually, one-fourth of WINDOW_LENGTH
             self.SAMPLE_WIDTH = 2
-            self.buffer: queue.Queue = queue.Queue()  # this is for plot
-
-            # audio data
-            self.concat_region: auditok.AudioRegion = auditok.AudioRegion(
-                data=np.array([]).tobytes(),
-                sampling_rate=self.audio_manipulator.INPUT_SAMPLE_RATE,
-                sample_width=self.SAMPLE_WIDTH,
-                channels=1)  # `auditok.AudioRegion` can use operator `+` to concatenate
-            self.concat_rms: np.ndarray = np.array([])
-            self.concat_rms_db: np.ndarray = np.array([])
-            self.concat_f0: np.ndarray = np.array([])
-            # dictionary for sending audio features
+            self.BUS_SLOTS: int = 16  # number of blocks kept in `AudioBus`
+            # every block is published once, and consumers (e.g., plot process) attach to it by name
+            self.audio_bus: AudioBus = AudioBus(name=Profile.args.bus_name, num_slots=self.BUS_SLOTS,
+                                                block_size=self.FRAME_LENGTH, channels=1,
+                                                sample_rate=int(self.audio_manipulator.INPUT_SAMPLE_RATE))
+            # capture at the device-native rate, and analyse at the lower one
+            self.resampler: StreamingResampler = StreamingResampler(
+                input_rate=self.audio_manipulator.INPUT_SAMPLE_RATE,
+                output_rate=self.audio_manipulator.ANALYSIS_SAMPLE_RATE)
+            self.total_samples: int = 0  # number of samples (analysis rate) from the beginning of the stream
+            # ring buffer of f0 for plot process, which is set by `AudioHandler`
+            self.f0_ring: Union[SharedRingBuffer, None] = None
+
+            # voiced regions are written into files incrementally
+            self.audio_recorder: AudioRecorder = AudioRecorder(
+                sample_rate=self.audio_manipulator.ANALYSIS_SAMPLE_RATE,
+                directory=self.audio_manipulator.get_output_directory(),
+                file_format=Profile.args.record_format,
+                max_bytes=int(Profile.args.record_max_mb * 2 ** 20),
+                max_duration_sec=Profile.args.record_max_min * 60)
+            # history of voiced frames (rms and dB) and f0 contours, which is spilled into files
+            store_directory = os.path.join(self.audio_manipulator.get_output_directory(),
+                                           datetime.datetime.now().strftime("features_%Y-%m-%d_%H-%M-%S"))
+            self.frame_store: FeatureStore = FeatureStore(
+                directory=os.path.join(store_directory, "frames"),
+                columns=[("t", "<f8"), ("rms", Profile.analysis_dtype), ("rms_db", Profile.analysis_dtype)])
+            self.f0_store: FeatureStore = FeatureStore(directory=os.path.join(store_directory, "f0"),
+                                                       columns=[("t", "<f8"), ("f0", "<f8")])
+            # moments of dB over total voiced region
+            self.rms_db_moments: RunningMoments = RunningMoments()
+            # degrade estimators instead of dropping audio when the analysis falls behind
+            self.quality_governor: QualityGovernor = QualityGovernor(
+                levels=QualityGovernor.make_levels(f0_method=Profile.f0_estimation_methods,
+                                                   hop_length=self.HOP_LENGTH))
+            # CPUs and priority of threads, and limits of thread pools (before starting worker processes)
+            self.thread_placement: ThreadPlacement = ThreadPlacement(
+                capture_cpus=Profile.args.capture_cpus, analysis_cpus=Profile.args.analysis_cpus,
+                publish_cpus=Profile.args.publish_cpus, f0_worker_cpus=Profile.args.f0_worker_cpus,
+                capture_priority=Profile.args.capture_priority, capture_nice=Profile.args.capture_nice)
+            if Profile.args.pool_threads > 0:
+                self.thread_placement.limit_thread_pools(num_threads=Profile.args.pool_threads)
+            # estimate f0 in worker processes (on this or other hosts)
+            self.f0_worker_pool: Union[F0WorkerPool, None] = None
+            if Profile.args.f0_workers > 0:
+                self.f0_worker_pool = F0WorkerPool(task_port=Profile.args.f0_worker_ports[0],
+                                                   result_port=Profile.args.f0_worker_ports[1],
+                                                   num_local_workers=Profile.args.f0_workers,
+                                                   timeout_sec=Profile.args.f0_worker_timeout,
+                                                   worker_cpus=[self.thread_placement.get_f0_worker_cpus(i)
+                                                                for i in range(Profile.args.f0_workers)],
+                                                   audio_calculator=self.audio_calculator)
+            # narrow the search range of f0 estimators to the speaker, which is learned while streaming
+            self.f0_range_tracker: Union[F0RangeTracker, None] = \
+                F0RangeTracker() if Profile.args.adaptive_f0_range else None
+            # estimate f0 in short windows with context, which continues over blocks within an utterance
+            self.f0_tracker: Union[StreamingF0Tracker, None] = StreamingF0Tracker(
+                sample_rate=self.audio_manipulator.ANALYSIS_SAMPLE_RATE) if Profile.args.streaming_f0 else None
+            self.f0_tracker_params: Union[tuple, None] = None  # estimator of the current utterance
+            self.f0_tracker_end_sample: int = -1  # end of the last region pushed into the tracker
+            self.f0_tracker_ranges: List[Dict[str, float]] = []  # ranges of windows since the last update
+            # features are computed on demand, and ones nobody requests are skipped
+            self.feature_graph: FeatureGraph = self.init_feature_graph()
+            self.requested_features: Set[str] = set(self.FEATURE_OUTPUTS)
+            self.feature_record.add_fields([("quality_level", "<i8"), ("hop_length", "<i8")])
+            self.feature_record["hop_length"] = self.HOP_LENGTH
+            self.input_overflow_count: int = 0  # blocks dropped by the device since the last block
+            # statistics of dB, f0 and voiced ratio over rolling windows
+            self.init_rolling_statistics(
+                windows_sec=Profile.args.rolling_windows,
+                values_per_sec={"rms_db": self.audio_manipulator.ANALYSIS_SAMPLE_RATE / self.HOP_LENGTH,
+                                # 5 msec of Harvest and DIO, or hop length of pYIN
+                                "f0": max(200.0, self.audio_manipulator.ANALYSIS_SAMPLE_RATE / self.HOP_LENGTH),
+                                "voiced_ratio": 1000 / self.CHUNK_DURATION_MS})
+            # features which each field of the record needs, which decides features to compute for subscribers
+            self.key_features: Dict[str, FrozenSet[str]] = self.get_key_features(
+                windows_sec=Profile.args.rolling_windows)
+            # pause and speed of the session from voiced regions and the envelope
+            self.speech_timeline: SpeechTimeline = SpeechTimeline()
+            self.feature_record.add_fields(SpeechTimeline.FIELDS)
+            # accumulators of the session are checkpointed, and resumed after restart
+            self.session_checkpoint: Union[SessionCheckpoint, None] = None
+            checkpoint_path = os.path.join(self.audio_manipulator.get_output_directory(), "session.ckpt")
+            if Profile.args.resume:
+                state = SessionCheckpoint.load(file_path=checkpoint_path)
+                if state is not None:
+                    self.restore_checkpoint_state(state=state)
+            if Profile.args.checkpoint_interval > 0:
+                self.session_checkpoint = SessionCheckpoint(file_path=checkpoint_path,
+                                                            interval_sec=Profile.args.checkpoint_interval)
+            # camelized keys of `self.feature_record` for sending audio features
+            self.message_keys: List[str] = list(self.zeromq_sender.snake_to_camel(
+                data_dict=dict.fromkeys(self.feature_record.keys)))
+            # clients can subscribe a subset of fields, which decides features to compute
+            self.zeromq_sender.initialize_control(schema=self.feature_record.get_schema(),
+                                                  port_number=str(Profile.args.control_port),
+                                                  is_broadcast=not Profile.args.no_broadcast)
             self.stream = None
+            # receiver of blocks from callbacks, which is replaced by `AudioRuntime.submit()` for the handoff
+            self.on_block: Callable[[np.ndarray, int], None] = self.handle_block
 
-            # when exiting, save the voiced region for sample
+            # when exiting, close the recording
             import atexit
             atexit.register(self.save_region)
+            atexit.register(self.save_features)
+            atexit.register(self.save_checkpoint)
+            atexit.register(self.release_bus)
+            if self.f0_worker_pool is not None:
+                atexit.register(self.f0_worker_pool.close)
 
     def audio_callback_numpy(self, indata: np.ndarray, frames: int, time, status) -> None:
         """
@@ -72,18 +206,129 @@ class AudioStream(Audio):
             time:
             status:
         """
-        self.buffer.put(indata[::self.DOWN_SAMPLE])
-        # store all data including both silence and voice
-        self.audio_data = np.append(self.audio_data, indata)
-        # calculate
-        self.handle_calculation(indata=indata)
-        # store dict for message, and will be converted to proper types
-        self.store_message_values(message_data=self.message_data)
-        # send data for each callback
-        self.handle_sending()
+        if not self.thread_placement.is_capture_placed:
+            self.thread_placement.place_capture()
+        if status.input_overflow:
+            self.input_overflow_count += 1
+        self.on_block(indata, frames)
+
+    def audio_callback_raw(self, indata, frames: int, time, status) -> None:
+        """
+        This callback will be called from each audio_util block of `sd.RawInputStream`.
+        Args:
+            indata (cffi.buffer): Buffer of int16 samples, which is valid only in this callback.
+            frames:
+            time:
+            status:
+        Notes:
+            The buffer is wrapped with `np.frombuffer()` without copying, so the features are identical to
+            the ones of `audio_callback_numpy()`.
+        """
+        if not self.thread_placement.is_capture_placed:
+            self.thread_placement.place_capture()
+        if status.input_overflow:
+            self.input_overflow_count += 1
+        self.on_block(np.frombuffer(indata, dtype=np.int16), frames)
+
+    def handle_block(self, indata: np.ndarray, frames: int, queue_depth: int = 0) -> None:
+        """
+        Process each block, which is common for numpy and raw streams.
+        Args:
+            indata (np.ndarray): int16 samples of the block, whose shape is (frames, 1) or (frames,).
+            frames: The number of frames in the block.
+            queue_depth: The number of blocks waiting behind this one (see `AudioRuntime`).
+        Notes:
+            The feature record is sent by `handle_sending()` after this, on the loop of `AudioRuntime`.
+        """
+        # publish all data including both silence and voice
+        self.audio_bus.publish(indata)
+        # resample into the analysis rate
+        analysis_data = self.resampler.process(indata)
+        # calculate features demanded by clients, and adapt the quality level to the cost
+        self.requested_features = self.get_demanded_features(keys=self.zeromq_sender.demanded_keys,
+                                                             key_features=self.key_features)
+        start = TimeMeasure.get_perf_counter()
+        self.handle_calculation(indata=analysis_data)
+        input_overflow_count, self.input_overflow_count = self.input_overflow_count, 0
+        self.handle_quality(processing_sec=TimeMeasure.get_perf_counter() - start,
+                            block_sec=len(analysis_data) / self.audio_manipulator.ANALYSIS_SAMPLE_RATE,
+                            queue_depth=queue_depth + input_overflow_count)
+        # offset of the next block from the beginning of the stream
+        self.total_samples += len(analysis_data)
+        if self.session_checkpoint is not None and self.session_checkpoint.is_due():
+            self.session_checkpoint.save(state=self.get_checkpoint_state())
+
+    def init_feature_graph(self) -> FeatureGraph:
+        """
+        Register features of each block with their inputs.
+        Sources of the graph are given for each block: int16 `samples`, `starts` and `ends` of voiced regions
+        (in samples of the block), `hop_length` and `f0_method` of the quality level, and `block_start_sec`.
+        """
+        calculator = self.audio_calculator
+        graph = FeatureGraph(sources=["samples", "starts", "ends", "hop_length", "f0_method", "block_start_sec"])
+        # shared intermediates
+        graph.register("audio", ["samples"], lambda samples: self.audio_manipulator.int_to_float(
+            audio_data=samples, dtype=Profile.analysis_dtype))
+        graph.register("magnitude", ["audio", "hop_length"], self.calc_block_magnitude)
+        graph.register("frame_rms", ["magnitude"], lambda magnitude: tuple(value.reshape(-1) for value in
+                                                                          calculator.calc_energy_rms_db(
+                                                                              magnitude=magnitude,
+                                                                              frame_length=self.WINDOW_LENGTH)))
+        graph.register("frame_segments", ["frame_rms", "hop_length", "starts", "ends"],
+                       lambda frame_rms, hop_length, starts, ends: calculator.calc_frame_segments(
+                           num_frames=len(frame_rms[0]), hop_length=hop_length, starts=starts, ends=ends))
+        graph.register("f0_contours", ["audio", "starts", "ends", "hop_length", "f0_method", "block_start_sec"],
+                       self.calc_f0_contours)
+        # features of voiced frames in the block
+        graph.register("rms", ["frame_rms", "frame_segments"], lambda frame_rms, segments: frame_rms[0][segments >= 0])
+        graph.register("rms_db", ["frame_rms", "frame_segments"],
+                       lambda frame_rms, segments: frame_rms[1][segments >= 0])
+        graph.register("rms_db_times", ["frame_segments", "hop_length", "block_start_sec"],
+                       lambda segments, hop_length, block_start_sec: calculator.calc_frame_times(
+                           num_frames=len(segments), start_sec=block_start_sec,
+                           frame_period_sec=hop_length / self.audio_manipulator.ANALYSIS_SAMPLE_RATE)[segments >= 0])
+        graph.register("f0", ["f0_contours"], lambda contours: np.concatenate([np.array([])] + contours))
+        # summary of each region
+        graph.register("rms_db_moments", ["frame_rms", "frame_segments", "starts"],
+                       lambda frame_rms, segments, starts: calculator.calc_segment_moments(
+                           values=frame_rms[1], segment_ids=segments, num_segments=len(starts)))
+        graph.register("f0_moments", ["f0_contours", "starts"], self.calc_f0_contour_moments)
+        return graph
 
-    def audio_callback_raw(self, indata, frames: int, time, status):
-        pass
+    @classmethod
+    def get_key_features(cls, windows_sec: Sequence[float]) -> Dict[str, FrozenSet[str]]:
+        """
+        Features of `FEATURE_OUTPUTS` which each field needs, i.e., `KEY_FEATURES` and rolling statistics.
+        """
+        key_features = dict(cls.KEY_FEATURES)
+        for name, features in cls.ROLLING_FEATURES.items():
+            key_features.update(dict.fromkeys(cls.get_rolling_keys(name=name, windows_sec=windows_sec), features))
+        return key_features
+
+    @classmethod
+    def get_demanded_features(cls, keys: Iterable[str], key_features: Dict[str, FrozenSet[str]]) -> Set[str]:
+        """
+        Features of `FEATURE_OUTPUTS` which are needed for the fields, e.g., `average_rms_db_10s` needs `rms`,
+        in addition to `PERSISTED_FEATURES`.
+        Args:
+            keys: Fields which are sent to anyone (see `ZeroMQSender.demanded_keys`).
+            key_features: Features which each field needs (see `get_key_features()`).
+        """
+        features = set(cls.PERSISTED_FEATURES)
+        for key in keys:
+            features |= key_features.get(key, frozenset())
+        return features
+
+    def get_feature_outputs(self, quality_level) -> Set[str]:
+        """
+        Outputs of the feature graph which are requested and allowed by the quality level.
+        """
+        outputs = set()
+        for feature in self.requested_features & quality_level.features:
+            outputs |= self.FEATURE_OUTPUTS[feature]
+        if quality_level.f0_method is None:
+            outputs -= self.FEATURE_OUTPUTS["f0"]
+        return outputs
 
     def handle_calculation(self, indata: np.ndarray = None) -> None:
         """
@@ -91,131 +336,331 @@ class AudioStream(Audio):
         Args:
             indata (np.ndarray): This is audio_util data whose shape will be (`self.block_size`, `sd.default.channels[0]`).
         Returns:
+        Notes:
+            Features are computed by `self.feature_graph`, i.e., only requested ones and their intermediates.
+            Frame features (STFT, rms and dB) are calculated once over the whole block, then reduced for each
+            voiced region with segment IDs, so that both of per-region and per-block values cover every region.
+            f0 is still estimated for each region, since estimators are costly for silence.
         """
+        sample_rate = self.audio_manipulator.ANALYSIS_SAMPLE_RATE
+        indata = indata.reshape(-1)
         # extracts voiced region
-        vad_generator = self.audio_calculator.vad_generator(audio_data=indata,
-                                                            max_dur_sec=self.CHUNK_DURATION_MS / 1000)
-
-        region_num: int = 0
-        voiced_time_ms: float = 0.0
-        rms: np.ndarray = np.array([])
-        rms_db: np.ndarray = np.array([])
-        f0 = np.array([])
-        region_info: str = str()
+        regions = list(self.audio_calculator.vad_generator(audio_data=indata,
+                                                           max_dur_sec=self.CHUNK_DURATION_MS / 1000,
+                                                           sample_rate=sample_rate))
+        region_num: int = len(regions)
+        # positions of regions in the block
+        starts = np.array([int(round(region.meta.start * sample_rate)) for region in regions], dtype=np.int64)
+        ends = np.array([min(int(round(region.meta.end * sample_rate)), len(indata)) for region in regions],
+                        dtype=np.int64)
+        # get voiced time in msec
+        voiced_time_ms: float = float(np.sum(ends - starts)) / sample_rate * 1000
 
-        # calculation for each voiced region
-        for i, region in enumerate(vad_generator):
-            region_num += 1
-            # to save the region
-            if Profile.is_init:
-                Profile.is_writable = True
-                Profile.is_init = False
-
-            # get values represented as np.ndarray
-            voiced_audio_data: np.ndarray = self.audio_manipulator.int_to_float64(
-                audio_data=region.samples.astype("int16"))
-            # get voiced time in msec
-            voiced_time_ms += self.audio_calculator. \
-                calc_samples_to_time(audio_data=voiced_audio_data,
-                                     sample_rate=self.audio_manipulator.INPUT_SAMPLE_RATE)
-            print(voiced_time_ms)
-            # calc stft
-            is_freq, voiced_audio_data_freq = self.audio_calculator.calc_short_time_fourier_transform(
-                voiced_audio_data=voiced_audio_data,
-                n_fft=self.WINDOW_LENGTH)
-            # separate complex-valued data into magnitude and phase
-            magnitude, _ = self.audio_calculator.calc_magphase(voiced_audio_data_freq=voiced_audio_data_freq)
-
-            # calculate energy
-            rms = self.audio_calculator.calc_energy_rms(magnitude=magnitude,
-                                                        frame_length=512,
-                                                        is_freq=is_freq)
-            # calculate sound pressure level (SPL) with db
-            rms_db = self.audio_calculator.calc_amplitude_to_db(audio_amplitude=np.abs(rms))
-            # calculate f0
-            f0_method = Profile.f0_estimation_methods
-            if f0_method == "pYIN":
-                f0, voiced_flag, _, times = self.audio_calculator.calc_f0_pyin(voiced_audio_data=voiced_audio_data)
-            elif f0_method == "DIO":
-                pass
-            elif f0_method == "Harvest":
-                f0 = self.audio_calculator.calc_f0_harvest(voiced_audio_data=voiced_audio_data,
-                                                           sample_rate=self.audio_manipulator.INPUT_SAMPLE_RATE)
-            # store and concat values
-            self.concat_values(region=region, rms=rms, rms_db=rms_db, f0=f0)
+        if self.f0_tracker is not None and (region_num == 0 or starts[0] > 0):
+            # the utterance of the tracker doesn't continue into this block
+            self.flush_f0_tracker()
+        # settings decided by `QualityGovernor`
+        quality_level = self.quality_governor.current
+        values = self.feature_graph.compute(
+            outputs=self.get_feature_outputs(quality_level) if region_num > 0 else (),
+            sources={"samples": indata, "starts": starts, "ends": ends, "hop_length": quality_level.hop_length,
+                     "f0_method": quality_level.f0_method, "block_start_sec": self.total_samples / sample_rate})
+        empty_moments = (np.zeros(region_num, dtype=np.int64), np.full(region_num, np.nan), np.full(region_num, np.nan))
+        rms_db_moments = values.get("rms_db_moments", empty_moments)
+        f0_moments = values.get("f0_moments", empty_moments)
+        if "rms_db" in values:
+            self.rolling_statistics["rms_db"].push(values=values["rms_db"], times=values["rms_db_times"])
+        # store values of voiced frames
+        if "rms_db" in values:
+            self.store_values(times=values["rms_db_times"], rms=values["rms"], rms_db=values["rms_db"])
 
+        region_info: str = str()
+        for i in range(region_num):
+            # save the region with its summary for the region index (copied, since the block may be reused)
+            self.audio_recorder.append(indata[starts[i]:ends[i]].copy(), record=self.make_region_record(
+                region_id=self.total_voiced_region_num + i, start_sample=self.total_samples + int(starts[i]),
+                end_sample=self.total_samples + int(ends[i]),
+                average_rms_db=rms_db_moments[1][i], std_rms_db=rms_db_moments[2][i],
+                average_f0=f0_moments[1][i] if f0_moments[0][i] > 0 else 0.0,
+                std_f0=f0_moments[2][i] if f0_moments[0][i] > 0 else 0.0))
             # concat region info
-            region_info += "\n#{} region: {}sec detected.".format(i, region.duration)
+            region_info += "\n#{} region: {}sec detected.".format(i, regions[i].duration)
+
+        # ratio of voiced time in the block, and statistics at the end of the block
+        block_end_sec = (self.total_samples + len(indata)) / sample_rate
+        block_duration_ms = len(indata) / sample_rate * 1000
+        self.rolling_statistics["voiced_ratio"].push(values=np.array([min(voiced_time_ms / block_duration_ms, 1.0)]),
+                                                     times=np.array([block_end_sec]))
+        self.update_rolling_statistics(now=block_end_sec)
+        # pauses between regions, and syllables in dB of voiced frames
+        block_start_sec = self.total_samples / sample_rate
+        self.speech_timeline.push_regions(starts_sec=block_start_sec + starts / sample_rate,
+                                          ends_sec=block_start_sec + ends / sample_rate,
+                                          block_start_sec=block_start_sec, block_end_sec=block_end_sec)
+        if "rms_db" in values:
+            self.speech_timeline.push_envelope(rms_db=values["rms_db"], times=values["rms_db_times"],
+                                               frame_period_sec=quality_level.hop_length / sample_rate)
+        for key, value in self.speech_timeline.get().items():
+            self.feature_record[key] = value
 
         # calc and update features with overall data
         if region_num > 0:  # if the voiced region was found
             self.logger.logger.info(region_info)
-            # Note: Each assignation will update `Audio.message_data[key]`
+            # Note: Each assignation will update `Audio.feature_record[key]`
             # update number of detected region
             self.total_voiced_region_num += region_num
             # update total voiced time
             self.total_voiced_time_ms += voiced_time_ms
-            # calc average of rms
-            self.average_rms = self.audio_calculator.calc_mean(audio_data=rms)
+        if "rms" in values:
+            # calc average of rms over every region of the block
+            self.average_rms = self.audio_calculator.calc_mean(audio_data=values["rms"])
+        if "rms_db" in values:
+            rms_db = values["rms_db"]
             # calc average of rms_db
-            self.average_rms_db = self.audio_calculator.calc_mean(audio_data=rms_db)  # mean for each region
-            self.average_rms_db_total = self.audio_calculator.calc_mean(
-                audio_data=self.concat_rms_db)  # mean for total voiced region
+            self.average_rms_db = self.audio_calculator.calc_mean(audio_data=rms_db)  # mean for the block
+            self.average_rms_db_total = self.rms_db_moments.mean  # mean for total voiced region
             # calc std of rms_db
-            self.std_rms_db = self.audio_calculator.calc_standard_deviation(audio_data=rms_db)  # std for each region
-            self.std_rms_db_total = self.audio_calculator.calc_standard_deviation(
-                audio_data=self.concat_rms_db)  # std for total voiced region
-
+            self.std_rms_db = self.audio_calculator.calc_standard_deviation(audio_data=rms_db)  # std for the block
+            self.std_rms_db_total = self.rms_db_moments.std  # std for total voiced region
+        if "f0" in values:
             # when getting NaN, `np.float64(0.0)` will be returned
-            f0_avg_candidate = self.audio_calculator.calc_average_f0(f0=f0)
-            f0_std_candidate = self.audio_calculator.calc_standard_deviation_f0(f0=f0)
+            f0_avg_candidate, f0_std_candidate = self.audio_calculator.calc_f0_moments(f0=values["f0"])
             # check if f0 [average | std] are valid (NaN) or not
             if f0_avg_candidate != np.float64(0.0):
                 self.average_f0 = f0_avg_candidate
             if f0_std_candidate != np.float64(0.0):
                 self.std_f0 = f0_std_candidate
 
-    def concat_values(self, region, rms, f0, rms_db) -> None:
+    def calc_block_magnitude(self, audio: np.ndarray, hop_length: int) -> np.ndarray:
+        """
+        Magnitude spectrogram of the whole block.
+        """
+        # calc stft
+        is_freq, audio_freq = self.audio_calculator.calc_short_time_fourier_transform(
+            voiced_audio_data=audio, n_fft=self.WINDOW_LENGTH, hop_length=hop_length)
+        # separate complex-valued data into magnitude and phase
+        magnitude, _ = self.audio_calculator.calc_magphase(voiced_audio_data_freq=audio_freq)
+        return magnitude
+
+    def calc_f0_contours(self, audio: np.ndarray, starts: np.ndarray, ends: np.ndarray, hop_length: int,
+                         f0_method: Union[str, None], block_start_sec: float) -> List[np.ndarray]:
+        """
+        f0 contour of each voiced region in the block, which is estimated by `F0WorkerPool` if it is enabled.
+        """
+        sample_rate = self.audio_manipulator.ANALYSIS_SAMPLE_RATE
+        if self.f0_tracker is not None and self.f0_worker_pool is None and f0_method is not None:
+            return [self.calc_region_f0_streaming(voiced_audio_data=audio[start:end], f0_method=f0_method,
+                                                  hop_length=hop_length, start_sample=self.total_samples + start,
+                                                  is_block_end=end == len(audio))
+                    for start, end in zip(starts.tolist(), ends.tolist())]
+        if self.f0_worker_pool is None or f0_method is None:
+            return [self.calc_region_f0(voiced_audio_data=audio[start:end], f0_method=f0_method,
+                                        hop_length=hop_length, region_start_sec=block_start_sec + start / sample_rate)
+                    for start, end in zip(starts.tolist(), ends.tolist())]
+        # ship every region at once, so that workers estimate them in parallel
+        region_ids = [self.total_voiced_region_num + i for i in range(len(starts))]
+        f0_ranges = []
+        for region_id, start, end in zip(region_ids, starts.tolist(), ends.tolist()):
+            f0_range, decimation = self.get_f0_search_range(f0_method=f0_method)
+            f0_ranges.append(f0_range)
+            self.f0_worker_pool.submit(region_id=region_id, samples=audio[start:end], f0_method=f0_method,
+                                       sample_rate=sample_rate, frame_length=self.WINDOW_LENGTH,
+                                       hop_length=hop_length, decimation=decimation, **f0_range)
+        contours = self.f0_worker_pool.collect(region_ids=region_ids)
+        for f0, f0_range, start in zip(contours, f0_ranges, starts.tolist()):
+            self.handle_region_f0(f0=f0, f0_range=f0_range,
+                                  region_start_sec=block_start_sec + start / sample_rate)
+        return contours
+
+    def calc_f0_contour_moments(self, contours: List[np.ndarray], starts: np.ndarray
+                                ) -> [np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Count, average and std of voiced f0 for each region.
+        """
+        f0 = np.concatenate([np.array([])] + contours)
+        segments = np.repeat(np.arange(len(starts)), [len(contour) for contour in contours])
+        segments[~(f0 > 0.0)] = -1  # unvoiced frames (0.0 or NaN) are excluded
+        return self.audio_calculator.calc_segment_moments(values=f0, segment_ids=segments, num_segments=len(starts))
+
+    def calc_region_f0(self, voiced_audio_data: np.ndarray, f0_method: Union[str, None], hop_length: int,
+                       region_start_sec: float) -> np.ndarray:
         """
-        Store values which is calculated and raw ones into fields.
+        Estimate f0 of a voiced region (within the range of the speaker if it is learned),
+        and hand it to the plot process and rolling statistics.
         Returns:
+            f0 (np.ndarray): f0 contour, which is empty if `f0_method` is `None`.
         """
-        # concat voiced regions
-        self.concat_region = region + self.concat_region
-        # concat energy
-        self.concat_rms = np.append(self.concat_rms, rms)
-        # concat spl
-        self.concat_rms_db = np.append(self.concat_rms_db, rms_db)
-        # concat f0
-        self.concat_f0 = np.append(self.concat_f0, f0)
-
-    def store_message_values(self, message_data: Dict[str, Any]) -> None:
-        """
-        Store values which is calculated and row ones into dictionary for message.
-        In addition to that, the type of data will be converted into another one properly for the serialization.
-        Note:
-            Currently, the parameters should be stored are following:
-        """
-        pattern = r".*?(numpy\.float)\d{2,3}.*"
-        for key in message_data:
-            # get matched data
-            res: Union[re.Match, None] = re.match(pattern, str(type(message_data[key])))
-            # check if the data is valid for serialization
-            if res is None:
-                # just store each value
-                self.message_data[key] = message_data[key]
-            elif res.group(1) == "numpy.float":  # if data type is not for serialization
-                # convert type of numpy into build-in one
-                serializable_value = message_data[key].item()
-                # store them for sending
-                self.message_data[key] = serializable_value
+        f0_range, decimation = self.get_f0_search_range(f0_method=f0_method)
+        f0 = self.estimate_f0(voiced_audio_data=voiced_audio_data, f0_method=f0_method, hop_length=hop_length,
+                              decimation=decimation, **f0_range)
+        self.handle_region_f0(f0=f0, f0_range=f0_range, region_start_sec=region_start_sec)
+        return f0
+
+    def calc_region_f0_streaming(self, voiced_audio_data: np.ndarray, f0_method: str, hop_length: int,
+                                 start_sample: int, is_block_end: bool) -> np.ndarray:
+        """
+        Estimate f0 of a voiced region with `StreamingF0Tracker`, in windows with context.
+        A region which starts right after the previous one (i.e., the utterance crosses the block boundary)
+        continues the utterance with its context, if the estimator isn't changed.
+        The learned range of f0 is read for each window, so that it doesn't restart the utterance,
+        and the range tracker learns the emitted frames with the widest range of their windows.
+        Args:
+            start_sample: Offset of the region from the beginning of the stream.
+            is_block_end: The region reaches the end of the block, so that it may continue in the next block.
+                Frames waiting for their lookahead are emitted with the next block (or `flush_f0_tracker()`).
+        Returns:
+            f0 (np.ndarray): f0 frames emitted for the region, on the grid of the utterance.
+        """
+        sample_rate = self.audio_manipulator.ANALYSIS_SAMPLE_RATE
+        params = (f0_method, hop_length)
+        if not (self.f0_tracker.is_active and params == self.f0_tracker_params
+                and start_sample == self.f0_tracker_end_sample):
+            self.flush_f0_tracker()
+
+            def estimate(samples: np.ndarray) -> np.ndarray:
+                f0_range, decimation = self.get_f0_search_range(f0_method=f0_method)
+                self.f0_tracker_ranges.append(f0_range)
+                return self.estimate_f0(voiced_audio_data=samples, f0_method=f0_method, hop_length=hop_length,
+                                        decimation=decimation, **f0_range)
+
+            self.f0_tracker.reset(estimate=estimate, frame_period_sec=self.get_f0_frame_period_ms() / 1000,
+                                  start_sec=start_sample / sample_rate)
+            self.f0_tracker_params = params
+        region_start_sec = self.f0_tracker.next_frame_sec
+        f0 = self.f0_tracker.push(samples=voiced_audio_data)
+        if is_block_end:
+            self.f0_tracker_end_sample = start_sample + len(voiced_audio_data)
+        else:
+            f0 = np.concatenate([f0, self.f0_tracker.flush()])
+            self.f0_tracker_end_sample = -1
+        self.handle_region_f0(f0=f0, f0_range=self.pop_f0_tracker_range(), region_start_sec=region_start_sec)
+        return f0
+
+    def flush_f0_tracker(self) -> None:
+        """
+        Emit frames left in `StreamingF0Tracker` without lookahead, when the utterance doesn't continue.
+        """
+        if self.f0_tracker is None or not self.f0_tracker.is_active:
+            return
+        region_start_sec = self.f0_tracker.next_frame_sec
+        f0 = self.f0_tracker.flush()
+        self.f0_tracker_end_sample = -1
+        if len(f0) > 0:
+            self.handle_region_f0(f0=f0, f0_range=self.pop_f0_tracker_range(), region_start_sec=region_start_sec)
+
+    def pop_f0_tracker_range(self) -> Dict[str, float]:
+        """
+        The widest range of windows estimated by `StreamingF0Tracker` since the last call (empty if not adaptive).
+        """
+        ranges, self.f0_tracker_ranges = [f0_range for f0_range in self.f0_tracker_ranges if f0_range], []
+        if not ranges:
+            return {}
+        return {"min_freq": min(f0_range["min_freq"] for f0_range in ranges),
+                "max_freq": max(f0_range["max_freq"] for f0_range in ranges)}
+
+    def estimate_f0(self, voiced_audio_data: np.ndarray, f0_method: Union[str, None], hop_length: int,
+                    decimation: int = 1, **f0_range) -> np.ndarray:
+        """
+        Run the f0 estimator of the quality level.
+        Returns:
+            f0 (np.ndarray): f0 contour, which is empty if `f0_method` is `None`.
+        """
+        sample_rate = self.audio_manipulator.ANALYSIS_SAMPLE_RATE
+        f0 = np.array([])
+        if f0_method == "pYIN":
+            f0, voiced_flag, _, times = self.audio_calculator.calc_f0_pyin(
+                voiced_audio_data=voiced_audio_data, sample_rate=sample_rate,
+                frame_length=self.WINDOW_LENGTH, hop_length=hop_length, decimation=decimation, **f0_range)
+        elif f0_method == "DIO":
+            f0 = self.audio_calculator.calc_f0_dio(voiced_audio_data=voiced_audio_data, sample_rate=sample_rate,
+                                                   **f0_range)
+        elif f0_method == "Harvest":
+            f0 = self.audio_calculator.calc_f0_harvest(voiced_audio_data=voiced_audio_data, sample_rate=sample_rate,
+                                                       **f0_range)
+        return f0
+
+    def get_f0_search_range(self, f0_method: Union[str, None]) -> [Dict[str, float], int]:
+        """
+        Range of f0 (`min_freq` and `max_freq`, or empty for the default) and decimation for the next region.
+        """
+        f0_range = {}
+        decimation = 1
+        if self.f0_range_tracker is not None and f0_method is not None:
+            f0_range["min_freq"], f0_range["max_freq"] = self.f0_range_tracker.get_range()
+            if Profile.args.adaptive_f0_decimation:
+                decimation = self.f0_range_tracker.get_decimation(
+                    sample_rate=self.audio_manipulator.ANALYSIS_SAMPLE_RATE, max_freq=f0_range["max_freq"])
+        return f0_range, decimation
+
+    def handle_region_f0(self, f0: np.ndarray, f0_range: Dict[str, float], region_start_sec: float) -> None:
+        """
+        Hand f0 of a region to the range tracker, plot process and rolling statistics.
+        Args:
+            f0_range: Range which f0 was searched with (see `get_f0_search_range()`), or empty if not adaptive.
+        """
+        if f0_range and len(f0) > 0:
+            self.f0_range_tracker.update(f0=f0, f0_range=(f0_range["min_freq"], f0_range["max_freq"]))
+        if self.f0_ring is not None:
+            self.f0_ring.write(f0)
+        # unvoiced frames (0.0 or NaN) are excluded
+        f0_times = self.audio_calculator.calc_frame_times(num_frames=len(f0), start_sec=region_start_sec,
+                                                          frame_period_sec=self.get_f0_frame_period_ms() / 1000)
+        is_voiced = f0 > 0.0  # False for NaN
+        self.rolling_statistics["f0"].push(values=f0[is_voiced], times=f0_times[is_voiced])
+        self.f0_store.append(t=f0_times, f0=f0)
+
+    def handle_quality(self, processing_sec: float, block_sec: float, queue_depth: int = 0) -> None:
+        """
+        Tell the cost of the block to `QualityGovernor`, and report the current level in the message.
+        """
+        self.quality_governor.update(processing_sec=processing_sec, block_sec=block_sec, queue_depth=queue_depth)
+        self.feature_record["quality_level"] = self.quality_governor.level_index
+        self.feature_record["hop_length"] = self.quality_governor.current.hop_length
+
+    def get_f0_frame_period_ms(self) -> float:
+        """
+        Period of f0 frames, i.e., 5 msec for Harvest and DIO, and the hop length for pYIN.
+        """
+        level = self.quality_governor.current
+        if level.f0_method in ("Harvest", "DIO"):
+            return 5.0
+        return level.hop_length / self.audio_manipulator.ANALYSIS_SAMPLE_RATE * 1000
+
+    def make_region_record(self, region_id: int, start_sample: int, end_sample: int, average_rms_db: float,
+                           std_rms_db: float, average_f0: float, std_f0: float) -> np.ndarray:
+        """
+        Make a record of `RegionIndexWriter` which has the position and summary features of the region.
+        Args:
+            start_sample: Offset of the region from the beginning of the stream.
+            end_sample: Offset of the end (exclusive) of the region.
+        Returns:
+            record (np.ndarray): The record, whose `file_offset` will be filled by `AudioRecorder`.
+        """
+        record = RegionIndexWriter.new_record()
+        record["region_id"] = region_id
+        record["start_sample"] = start_sample
+        record["end_sample"] = end_sample
+        record["average_rms_db"] = average_rms_db
+        record["std_rms_db"] = std_rms_db
+        record["average_f0"], record["std_f0"] = average_f0, std_f0
+        return record
+
+    def store_values(self, times: np.ndarray, rms: np.ndarray, rms_db: np.ndarray) -> None:
+        """
+        Store values of voiced frames into the history, and update moments over total voiced region.
+        Returns:
+        """
+        self.frame_store.append(t=times, rms=rms, rms_db=rms_db)
+        self.rms_db_moments.push(values=rms_db)
 
     def handle_sending(self) -> None:
         try:
             # send message after checking initialization
             if self.zeromq_sender.is_initialized:
-                # camelize before sending data
-                message = self.zeromq_sender.snake_to_camel(data_dict=self.message_data)
+                if not self.zeromq_sender.is_broadcast:  # only for subscriptions
+                    return
+                # values are converted into built-in types at once, with camelized keys
+                message = self.feature_record.to_dict(keys=self.message_keys)
                 self.zeromq_sender.set_message(
                     data_dict=message)  # we need it because sending method is async one
                 # get ready and send simultaneously due to async one
@@ -223,7 +668,23 @@ class AudioStream(Audio):
             else:
                 raise ZeroMQNotInitialized("Error before sending message")
         except ZeroMQNotInitialized:
-            self.logger.logger.warn("ZeroMQ is not initialized, so message won't be sent.")
+            self.logger.logger.warning("ZeroMQ is not initialized, so message won't be sent.")
+
+    def start_warm_up(self) -> threading.Thread:
+        """
+        Warm up estimators of every quality level in a background thread, which can run while the device is opening.
+        Returns:
+            threading.Thread: The started thread, which should be joined before starting the stream.
+        """
+        thread = threading.Thread(target=self.audio_calculator.warm_up,
+                                  kwargs={"sample_rate": self.audio_manipulator.ANALYSIS_SAMPLE_RATE,
+                                          "f0_methods": self.quality_governor.get_f0_methods(),
+                                          "n_fft": self.WINDOW_LENGTH,
+                                          "hop_length": self.HOP_LENGTH,
+                                          "dtype": Profile.analysis_dtype},
+                                  name="warm_up", daemon=True)
+        thread.start()
+        return thread
 
     def get_input_stream_numpy(self) -> sd.InputStream:
         """
@@ -248,8 +709,71 @@ class AudioStream(Audio):
 
     def save_region(self) -> None:
         """
-        When exiting, save the voiced audio regions, which is concatenated.
+        When exiting, write the remaining voiced regions and close the recording.
+        Returns:
+        """
+        self.audio_recorder.close()
+
+    def save_features(self) -> None:
+        """
+        When exiting, write the remaining history of features.
+        Returns:
+        """
+        self.flush_f0_tracker()
+        self.frame_store.close()
+        self.f0_store.close()
+
+    def save_checkpoint(self) -> None:
+        """
+        When exiting, write the last checkpoint of the session.
+        Returns:
+        """
+        if self.session_checkpoint is not None:
+            self.session_checkpoint.close(state=self.get_checkpoint_state())
+
+    def get_checkpoint_state(self) -> Dict[str, Union[float, np.ndarray]]:
+        """
+        Accumulators of the session, i.e., totals of `Audio`, moments of dB, pauses and syllables,
+        and the learned range of f0.
+        """
+        state = {"total_voiced_region_num": self.total_voiced_region_num,
+                 "total_voiced_time_ms": self.total_voiced_time_ms}
+        components = {"rms_db_moments": self.rms_db_moments, "speech_timeline": self.speech_timeline,
+                      "f0_range_tracker": self.f0_range_tracker}
+        for prefix, component in components.items():
+            if component is not None:
+                state.update({"{}.{}".format(prefix, key): value for key, value in component.get_state().items()})
+        return state
+
+    def restore_checkpoint_state(self, state: Dict[str, Union[float, np.ndarray]]) -> None:
+        """
+        Resume accumulators from `get_checkpoint_state()` of the previous process.
+        """
+        try:
+            self.total_voiced_region_num = int(state["total_voiced_region_num"])
+            self.total_voiced_time_ms = float(state["total_voiced_time_ms"])
+            components = {"rms_db_moments": self.rms_db_moments, "speech_timeline": self.speech_timeline,
+                          "f0_range_tracker": self.f0_range_tracker}
+            for prefix, component in components.items():
+                component_state = {key[len(prefix) + 1:]: value for key, value in state.items()
+                                   if key.startswith(prefix + ".")}
+                if component is not None and component_state:
+                    component.set_state(component_state)
+        except KeyError:
+            self.logger.logger.exception("Checkpoint lacks some fields, so the session starts from zero.")
+            return
+        if self.rms_db_moments.count > 0:
+            self.average_rms_db_total = self.rms_db_moments.mean
+            self.std_rms_db_total = self.rms_db_moments.std
+        for key, value in self.speech_timeline.get().items():
+            self.feature_record[key] = value
+        self.logger.logger.info("Session is resumed: {} regions, {:.1f} sec voiced.".format(
+            self.total_voiced_region_num, self.total_voiced_time_ms / 1000))
+
+    def release_bus(self) -> None:
+        """
+        When exiting, release the shared memory of `AudioBus`.
         Returns:
         """
-        if Profile.is_writable:
-            self.audio_manipulator.save_wav_auditok(audio_region=self.concat_region)
+        self.audio_bus.close()
+        self.audio_bus.unlink()
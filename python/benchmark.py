@@ -0,0 +1,270 @@
+import timeit
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from util.logger import Logger
+
+
+class Benchmark:
+    """
+    Micro benchmarks of the analysis pipeline, which don't need any audio device.
+    Each method whose name starts with `bench_` is a benchmark, and it can be run like:
+    `$ python benchmark.py raw_callback`
+    Attributes:
+        self.repeat (int): The number of repetition, whose best one will be reported.
+        self.number (int): The number of calls for each repetition.
+    """
+
+    def __init__(self, repeat: int = 5, number: int = 1000):
+        self.logger = Logger(name=__name__)
+        self.repeat = repeat
+        self.number = number
+        self.sample_rate: int = 16000
+        self.frame_length: int = 16000 * 5  # same as `AudioStream.FRAME_LENGTH` with 16kHz
+
+    def measure(self, func: Callable, number: int = None) -> float:
+        """
+        Measure the best time of `func` in micro seconds per call.
+        """
+        number = self.number if number is None else number
+        return min(timeit.repeat(func, repeat=self.repeat, number=number)) / number * 10 ** 6
+
+    def report(self, name: str, results: Dict[str, float]) -> None:
+        baseline = next(iter(results.values()))
+        for label, usec in results.items():
+            self.logger.logger.info("{}: {:<24} {:>12.2f} usec/call ({:.2f}x)".format(
+                name, label, usec, baseline / usec if usec > 0 else float("inf")))
+
+    def make_voice(self, seconds: float = 5.0, dtype=np.float64) -> np.ndarray:
+        """
+        Synthetic voice, i.e., harmonic tone whose f0 varies slowly.
+        """
+        t = np.arange(int(seconds * self.sample_rate)) / self.sample_rate
+        phase = 2 * np.pi * np.cumsum(150.0 + 30.0 * np.sin(2 * np.pi * 0.5 * t)) / self.sample_rate
+        tone = sum(np.sin(k * phase) / k for k in range(1, 6))
+        return (0.3 * tone / np.max(np.abs(tone))).astype(dtype)
+
+    def bench_raw_callback(self) -> None:
+        """
+        Per-callback cost of `sd.InputStream` and `sd.RawInputStream`, from the buffer of PortAudio to the handoff
+        of `AudioStream.audio_callback_numpy()` / `audio_callback_raw()` (`AudioRuntime.submit()` copies the block).
+        Both streams share the C trampoline of cffi, and differ in the Python part of their wrappers
+        (see `sd._StreamBase`): `sd._buffer()` wraps the pointer, `sd.InputStream` also makes the reshaped ndarray
+        with `sd._array()`, then `sd._wrap_callback()` calls back with `sd.CallbackFlags`.
+        The wrappers are closures which PortAudio calls, so the same steps are run here on a buffer of cffi.
+        """
+        import types
+        import sounddevice as sd
+        from audio_stream import AudioStream
+        pointer = sd._ffi.new("char[]", self.frame_length * 2)  # stands for the buffer of PortAudio
+        time_info = sd._ffi.new("PaStreamCallbackTimeInfo*")
+        # the state which the callbacks touch, after the capture thread is placed
+        stream = types.SimpleNamespace(thread_placement=types.SimpleNamespace(is_capture_placed=True),
+                                       input_overflow_count=0,
+                                       on_block=lambda indata, frames: np.array(indata, copy=True))
+
+        def numpy_stream():
+            data = sd._array(sd._buffer(pointer, self.frame_length, 1, 2), 1, "int16")
+            return sd._wrap_callback(lambda *args: AudioStream.audio_callback_numpy(stream, *args), data,
+                                     self.frame_length, time_info, 0)
+
+        def raw_stream():
+            data = sd._buffer(pointer, self.frame_length, 1, 2)
+            return sd._wrap_callback(lambda *args: AudioStream.audio_callback_raw(stream, *args), data,
+                                     self.frame_length, time_info, 0)
+
+        self.report("raw_callback", {"numpy stream": self.measure(numpy_stream),
+                                     "raw stream": self.measure(raw_stream)})
+
+    def bench_precision(self) -> None:
+        """
+        Throughput and accuracy of the front-end, stft and rms with float32 compared to float64.
+        Deviation of dB and f0 from the float64 path should be bounded by `tolerance_db` and `tolerance_hz`,
+        which `tests/test_precision.py` asserts.
+        """
+        from audio_calculator import AudioCalculator
+        from audio_manipulator import AudioManipulator
+        audio_calculator = AudioCalculator()
+        audio_manipulator = AudioManipulator()
+        tolerance_db, tolerance_hz = 0.01, 0.1
+        samples = (self.make_voice(seconds=5.0) * 2 ** 15).astype(np.int16)
+
+        def front_end(dtype):
+            # same as `AudioStream.handle_calculation()`
+            voiced_audio_data = audio_manipulator.int_to_float(audio_data=samples, dtype=dtype)
+            is_freq, voiced_audio_data_freq = audio_calculator.calc_short_time_fourier_transform(
+                voiced_audio_data=voiced_audio_data, n_fft=512)
+            magnitude, _ = audio_calculator.calc_magphase(voiced_audio_data_freq=voiced_audio_data_freq)
+            _, rms_db = audio_calculator.calc_energy_rms_db(magnitude=magnitude, frame_length=512)
+            return voiced_audio_data, rms_db, audio_calculator.calc_mean(audio_data=rms_db), \
+                audio_calculator.calc_standard_deviation(audio_data=rms_db)
+
+        self.report("precision", {"float64": self.measure(lambda: front_end("float64"), number=20),
+                                  "float32": self.measure(lambda: front_end("float32"), number=20)})
+        data64, rms_db64, mean64, std64 = front_end("float64")
+        data32, rms_db32, mean32, std32 = front_end("float32")
+        deviation_db = max(np.max(np.abs(rms_db64 - rms_db32)), abs(mean64 - mean32), abs(std64 - std32))
+        f0_64 = audio_calculator.calc_f0_harvest(voiced_audio_data=data64, sample_rate=self.sample_rate)
+        f0_32 = audio_calculator.calc_f0_harvest(voiced_audio_data=data32, sample_rate=self.sample_rate)
+        deviation_hz = np.max(np.abs(f0_64 - f0_32))
+        self.logger.logger.info("precision: max deviation {:.2e} dB, {:.2e} Hz".format(deviation_db, deviation_hz))
+        if deviation_db > tolerance_db or deviation_hz > tolerance_hz:
+            self.logger.logger.error("precision: deviation exceeds tolerance ({} dB, {} Hz).".format(
+                tolerance_db, tolerance_hz))
+
+    def bench_kernels(self) -> None:
+        """
+        Fused kernels of rms -> dB and f0 moments, compared to librosa and `nanmean`/`nanstd`.
+        """
+        import librosa
+        from audio_calculator import AudioCalculator
+        from audio_kernels import IS_NUMBA_AVAILABLE
+        audio_calculator = AudioCalculator()
+        magnitude = np.abs(librosa.stft(y=self.make_voice(seconds=5.0), n_fft=512, hop_length=128))
+        f0 = audio_calculator.calc_f0_harvest(voiced_audio_data=self.make_voice(seconds=5.0),
+                                              sample_rate=self.sample_rate)
+
+        def rms_db_librosa():
+            rms = librosa.feature.rms(S=magnitude, frame_length=512, hop_length=128)
+            return 20 * np.log10(np.abs(rms))
+
+        def f0_moments_numpy():
+            _f0 = f0.copy()
+            _f0[_f0 == 0.0] = np.nan
+            return np.nanmean(_f0, dtype=np.float64), np.nanstd(_f0, dtype=np.float64)
+
+        audio_calculator.calc_energy_rms_db(magnitude=magnitude)  # compile
+        label = "kernel (numba)" if IS_NUMBA_AVAILABLE else "kernel (numpy)"
+        self.report("rms_db", {"librosa": self.measure(rms_db_librosa, number=200),
+                               label: self.measure(lambda: audio_calculator.calc_energy_rms_db(magnitude=magnitude),
+                                                   number=200)})
+        self.report("f0_moments", {"nanmean/nanstd": self.measure(f0_moments_numpy),
+                                   label: self.measure(lambda: audio_calculator.calc_f0_moments(f0=f0))})
+        deviation = np.max(np.abs(rms_db_librosa() - audio_calculator.calc_energy_rms_db(magnitude=magnitude)[1]))
+        self.logger.logger.info("kernels: max deviation of dB from librosa {:.2e}".format(deviation))
+
+    def bench_f0_range(self) -> None:
+        """
+        Cost of f0 estimators with the full range (C2-C7) compared to the range learned by `F0RangeTracker`,
+        and the deviation of voiced f0 between them.
+        """
+        from audio_calculator import AudioCalculator
+        from f0_range_tracker import F0RangeTracker
+        audio_calculator = AudioCalculator()
+        f0_range_tracker = F0RangeTracker()
+        voice = self.make_voice(seconds=2.0)
+        # learn the speaker with the full range
+        for _ in range(3):
+            f0_range_tracker.update(f0=audio_calculator.calc_f0_harvest(voiced_audio_data=voice,
+                                                                        sample_rate=self.sample_rate))
+        min_freq, max_freq = f0_range_tracker.get_range()
+        decimation = f0_range_tracker.get_decimation(sample_rate=self.sample_rate, max_freq=max_freq)
+        self.logger.logger.info("f0_range: learned {:.1f}-{:.1f} Hz, decimation {}".format(
+            min_freq, max_freq, decimation))
+
+        def harvest(**kwargs):
+            return audio_calculator.calc_f0_harvest(voiced_audio_data=voice, sample_rate=self.sample_rate, **kwargs)
+
+        def pyin(**kwargs):
+            return audio_calculator.calc_f0_pyin(voiced_audio_data=voice, sample_rate=self.sample_rate, **kwargs)[0]
+
+        narrowed = {"min_freq": min_freq, "max_freq": max_freq}
+        self.report("f0_range harvest", {"full": self.measure(harvest, number=3),
+                                         "adaptive": self.measure(lambda: harvest(**narrowed), number=3)})
+        self.report("f0_range pyin", {"full": self.measure(pyin, number=3),
+                                      "adaptive": self.measure(lambda: pyin(**narrowed), number=3),
+                                      "adaptive + decimation": self.measure(
+                                          lambda: pyin(decimation=decimation, **narrowed), number=3)})
+        for label, full, adaptive in [("harvest", harvest(), harvest(**narrowed)),
+                                      ("pyin", pyin(), pyin(decimation=decimation, **narrowed))]:
+            is_voiced = (full > 0.0) & (adaptive > 0.0)  # False for NaN
+            deviation = np.median(np.abs(full[is_voiced] - adaptive[is_voiced])) if np.any(is_voiced) else np.nan
+            self.logger.logger.info("f0_range {}: median deviation {:.2f} Hz, voiced frames {} -> {}".format(
+                label, deviation, np.sum(full > 0.0), np.sum(adaptive > 0.0)))
+
+    def bench_f0_workers(self, num_workers: int = 2, num_regions: int = 8) -> None:
+        """
+        Throughput of Harvest for regions of a block in the analysis thread, compared to local `F0WorkerPool`,
+        whose results should be identical.
+        """
+        from audio_calculator import AudioCalculator
+        from f0_worker_pool import F0WorkerPool
+        audio_calculator = AudioCalculator()
+        regions = [self.make_voice(seconds=1.0 + 0.1 * i) for i in range(num_regions)]
+        pool = F0WorkerPool(num_local_workers=num_workers)
+        try:
+            pool.wait_for_workers(count=num_workers)
+
+            def serial():
+                return [audio_calculator.calc_f0_harvest(voiced_audio_data=region, sample_rate=self.sample_rate)
+                        for region in regions]
+
+            def distributed():
+                for region_id, region in enumerate(regions):
+                    pool.submit(region_id=region_id, samples=region, f0_method="Harvest", sample_rate=self.sample_rate)
+                return pool.collect(region_ids=range(num_regions))
+
+            self.report("f0_workers", {"analysis thread": self.measure(serial, number=1),
+                                       "{} workers".format(num_workers): self.measure(distributed, number=1)})
+            is_identical = all(np.array_equal(a, b) for a, b in zip(serial(), distributed()))
+            self.logger.logger.info("f0_workers: identical results {}, resubmitted {}".format(
+                is_identical, pool.resubmitted_count))
+        finally:
+            pool.close()
+
+    def bench_streaming_f0(self, chunk_sec: float = 0.25) -> None:
+        """
+        Harvest of a whole 5 sec region compared to `StreamingF0Tracker` fed with chunks of `chunk_sec`:
+        total cost, the longest call (CPU burst), and the deviation of voiced f0 from the whole-region one.
+        """
+        from audio_calculator import AudioCalculator
+        from streaming_f0_tracker import StreamingF0Tracker
+        audio_calculator = AudioCalculator()
+        voice = self.make_voice(seconds=5.0)
+        chunk = int(chunk_sec * self.sample_rate)
+        tracker = StreamingF0Tracker(sample_rate=self.sample_rate)
+
+        def estimate(samples):
+            return audio_calculator.calc_f0_harvest(voiced_audio_data=samples, sample_rate=self.sample_rate)
+
+        def streaming():
+            tracker.reset(estimate=estimate, frame_period_sec=0.005)
+            contours = [tracker.push(samples=voice[i:i + chunk]) for i in range(0, len(voice), chunk)]
+            return np.concatenate(contours + [tracker.flush()])
+
+        def longest_call():
+            # each call changes the state, so it is timed once
+            tracker.reset(estimate=estimate, frame_period_sec=0.005)
+            calls = [lambda i=i: tracker.push(samples=voice[i:i + chunk]) for i in range(0, len(voice), chunk)]
+            return max(timeit.timeit(call, number=1) for call in calls + [tracker.flush]) * 10 ** 6
+
+        self.report("streaming_f0", {"whole region": self.measure(lambda: estimate(voice), number=3),
+                                     "streaming": self.measure(streaming, number=3)})
+        self.logger.logger.info("streaming_f0: longest call {:.2f} usec (whole region: one call)".format(
+            longest_call()))
+        whole, streamed = estimate(voice), streaming()
+        is_voiced = (whole > 0.0) & (streamed[:len(whole)] > 0.0)
+        deviation = np.abs(whole[is_voiced] - streamed[:len(whole)][is_voiced])
+        self.logger.logger.info("streaming_f0: frames {} -> {}, deviation median {:.3f} Hz, max {:.3f} Hz".format(
+            len(whole), len(streamed), np.median(deviation), np.max(deviation)))
+
+    def get_names(self) -> List[str]:
+        return [name[len("bench_"):] for name in dir(self) if name.startswith("bench_")]
+
+    def run(self, names: List[str] = None) -> None:
+        for name in (names or self.get_names()):
+            getattr(self, "bench_" + name)()
+
+
+if __name__ == '__main__':
+    import argparse
+    benchmark = Benchmark()
+    parser = argparse.ArgumentParser(description="Micro benchmarks of the analysis pipeline.")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (all of them if empty): {}".format(
+        ", ".join(benchmark.get_names())))
+    args = parser.parse_args()
+    unknown = set(args.names) - set(benchmark.get_names())
+    if unknown:
+        parser.error("unknown benchmarks: {}".format(", ".join(sorted(unknown))))
+    benchmark.run(names=args.names)
@@ -0,0 +1,113 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+from util.logger import Logger
+
+
+class F0RangeTracker:
+    """
+    Learn the f0 distribution of the speaker, and narrow the search range of f0 estimators,
+    since the cost of them (e.g., candidates of pYIN and filterbank of Harvest) scales with the range.
+    The distribution is kept as a histogram on the log (semitone) scale which decays slowly,
+    so that it follows the current speaker.
+    `get_range()` only reads the state, so that it can be called for each window or for regions in flight,
+    and `update()` learns each region with the range which it was searched with.
+    Args:
+        min_freq: The lowest frequency of the full range (C2 as estimators).
+        max_freq: The highest frequency of the full range (C7 as estimators).
+        quantiles: Quantiles of the distribution to be covered.
+        margin_semitones: Safety margin added to both sides of the range.
+        min_frames: The number of voiced frames needed before narrowing.
+        rewiden_every: Use the full range for one region every this number of regions.
+        decay: Decay of the histogram for each region.
+    """
+    BINS_PER_SEMITONE: int = 4
+
+    def __init__(self, min_freq: float = 65.41, max_freq: float = 2093.0, quantiles: Tuple[float, float] = (0.02, 0.98),
+                 margin_semitones: float = 4.0, min_frames: int = 400, rewiden_every: int = 20, decay: float = 0.99):
+        self.logger = Logger(name=__name__)
+        self.min_freq = float(min_freq)
+        self.max_freq = float(max_freq)
+        self.quantiles = quantiles
+        self.margin_semitones = margin_semitones
+        self.min_frames = min_frames
+        self.rewiden_every = rewiden_every
+        self.decay = decay
+        num_bins = int(np.ceil(12 * np.log2(self.max_freq / self.min_freq) * self.BINS_PER_SEMITONE)) + 1
+        self.histogram: np.ndarray = np.zeros(num_bins)
+        self.region_count: int = 0
+        self.narrowed_count: int = 0  # regions searched with a narrowed range since the last full one
+        self.is_wide_next: bool = True  # use the full range for the next region
+
+    def _to_bin(self, f0: np.ndarray) -> np.ndarray:
+        return np.round(12 * np.log2(f0 / self.min_freq) * self.BINS_PER_SEMITONE).astype(np.int64)
+
+    def _to_freq(self, index: float) -> float:
+        return self.min_freq * 2 ** (index / self.BINS_PER_SEMITONE / 12)
+
+    def get_range(self) -> Tuple[float, float]:
+        """
+        Search range for the next region, which doesn't change the state.
+        Returns:
+            min_freq, max_freq: Narrowed range, or the full one while learning and re-widening.
+        """
+        total = np.sum(self.histogram)
+        if self.is_wide_next or total < self.min_frames or self.narrowed_count >= self.rewiden_every - 1:
+            return self.min_freq, self.max_freq
+        cumulative = np.cumsum(self.histogram) / total
+        low = int(np.searchsorted(cumulative, self.quantiles[0]))
+        high = int(np.searchsorted(cumulative, self.quantiles[1]))
+        margin = self.margin_semitones * self.BINS_PER_SEMITONE
+        return max(self.min_freq, self._to_freq(low - margin)), min(self.max_freq, self._to_freq(high + margin))
+
+    def update(self, f0: np.ndarray, f0_range: Tuple[float, float] = None) -> None:
+        """
+        Learn voiced f0 (i.e., neither `0.0` nor `NaN`) of a region.
+        Args:
+            f0: f0 contour of the region.
+            f0_range: Range which the region was searched with (i.e., `get_range()` before it), or the full one.
+        """
+        low, high = (self.min_freq, self.max_freq) if f0_range is None else f0_range
+        is_narrowed = low > self.min_freq or high < self.max_freq
+        self.region_count += 1
+        self.narrowed_count = self.narrowed_count + 1 if is_narrowed else 0
+        f0 = np.asarray(f0).reshape(-1)
+        f0 = f0[(f0 >= self.min_freq) & (f0 <= self.max_freq)]  # False for NaN
+        self.histogram *= self.decay
+        if f0.size > 0:
+            self.histogram += np.bincount(self._to_bin(f0), minlength=len(self.histogram))[:len(self.histogram)]
+        # f0 close to the edge of the narrowed range may be cut off (e.g., another speaker), so search widely
+        edge = 2 ** (1 / 12)  # a semitone
+        self.is_wide_next = bool(is_narrowed and f0.size > 0 and
+                                 (np.min(f0) < low * edge or np.max(f0) > high / edge))
+        if self.is_wide_next:
+            self.logger.logger.debug("f0 reached the edge of {:.1f}-{:.1f} Hz, search widely next.".format(low, high))
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        """
+        Learned distribution, e.g., for `SessionCheckpoint`.
+        """
+        return {"histogram": self.histogram.copy(), "region_count": self.region_count}
+
+    def set_state(self, state: Dict[str, np.ndarray]) -> None:
+        """
+        Restore the learned distribution. The first region still uses the full range, to confirm the speaker.
+        """
+        if len(state["histogram"]) == len(self.histogram):
+            self.histogram[:] = state["histogram"]
+        self.region_count = int(state["region_count"])
+        self.narrowed_count = 0
+        self.is_wide_next = True
+
+    def get_decimation(self, sample_rate: int, max_freq: float, max_decimation: int = 4, min_ratio: float = 8.0
+                       ) -> int:
+        """
+        Decimation factor for a range up to `max_freq`, which keeps the sample rate above `min_ratio` x max f0
+        (i.e., a few harmonics), for estimators which don't decimate internally (pYIN).
+        The factor is a power of two, so that the sample rate and hop length are divided exactly.
+        """
+        decimation = 1
+        while decimation * 2 <= max_decimation and sample_rate / (decimation * 2) >= min_ratio * max_freq:
+            decimation *= 2
+        return decimation
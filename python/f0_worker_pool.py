@@ -0,0 +1,330 @@
+import json
+import multiprocessing
+import os
+import threading
+from typing import Any, Dict, List, Sequence, Set
+
+import numpy as np
+import zmq
+
+from util.logger import Logger
+from util.time_measure import TimeMeasure
+
+# kinds of messages, which are the first frame of multipart messages
+TASK: bytes = b"task"
+RESULT: bytes = b"result"
+HEARTBEAT: bytes = b"heartbeat"
+
+
+def estimate_f0(header: Dict[str, Any], samples: np.ndarray, audio_calculator) -> np.ndarray:
+    """
+    Run the f0 estimator of the task in a worker.
+    """
+    kwargs = {"voiced_audio_data": samples, "sample_rate": header["sample_rate"]}
+    if "min_freq" in header:
+        kwargs.update(min_freq=header["min_freq"], max_freq=header["max_freq"])
+    if header["f0_method"] == "pYIN":
+        return audio_calculator.calc_f0_pyin(frame_length=header["frame_length"], hop_length=header["hop_length"],
+                                             decimation=header.get("decimation", 1), **kwargs)[0]
+    if header["f0_method"] == "DIO":
+        return audio_calculator.calc_f0_dio(**kwargs)
+    return audio_calculator.calc_f0_harvest(**kwargs)
+
+
+def get_frame_count(header: Dict[str, Any], num_samples: int) -> int:
+    """
+    The number of f0 frames which the estimator of the task returns, i.e., `1 + samples // hop_length` of pYIN
+    and 5 msec frames (inclusive) of Harvest and DIO.
+    """
+    if header["f0_method"] == "pYIN":
+        return 1 + num_samples // header["hop_length"]
+    return int(num_samples / header["sample_rate"] * 1000 / 5.0) + 1
+
+
+def run_f0_worker(task_address: str, result_address: str, heartbeat_sec: float = 1.0, cpus: Sequence[int] = ()
+                  ) -> None:
+    """
+    Entry point of a stateless worker, which estimates f0 of regions pulled from `F0WorkerPool`.
+    Workers can run on other hosts, e.g., `$ python f0_worker_pool.py tcp://host:5557 tcp://host:5558`.
+    Args:
+        task_address: Address of the PUSH socket of tasks.
+        result_address: Address of the PULL socket of results and heartbeats.
+        heartbeat_sec: Interval of heartbeats, which are sent even while estimating.
+        cpus: CPUs which the worker is pinned to (any if empty).
+    Notes:
+        A task which fails is answered with an empty contour and the error, so that the region isn't resubmitted
+        to (and doesn't kill) other workers.
+    """
+    logger = Logger(name=__name__)
+    if cpus:
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (AttributeError, OSError):
+            logger.logger.exception("Failed to pin f0 worker to CPUs {}.".format(list(cpus)))
+    from audio_calculator import AudioCalculator
+    audio_calculator = AudioCalculator()
+    worker_id = "{}-{}".format(os.uname().nodename if hasattr(os, "uname") else "local", os.getpid())
+    context = zmq.Context.instance()
+    task_socket = context.socket(zmq.PULL)
+    task_socket.connect(task_address)
+    result_socket = context.socket(zmq.PUSH)
+    result_socket.connect(result_address)
+    state = {"region_id": None}
+    stop_event = threading.Event()
+
+    def send_heartbeats():
+        # sockets can't be shared among threads, so heartbeats have their own
+        heartbeat_socket = context.socket(zmq.PUSH)
+        heartbeat_socket.connect(result_address)
+        while not stop_event.wait(heartbeat_sec):
+            heartbeat_socket.send_multipart([HEARTBEAT, json.dumps(
+                {"worker": worker_id, "region_id": state["region_id"]}).encode("ascii")])
+        heartbeat_socket.close(linger=0)
+
+    heartbeat_thread = threading.Thread(target=send_heartbeats, name="heartbeat", daemon=True)
+    heartbeat_thread.start()
+    logger.logger.info("f0 worker {} is ready (cpus: {}).".format(
+        worker_id, sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else "any"))
+    try:
+        while True:
+            try:
+                kind, header_bytes, pcm = task_socket.recv_multipart()
+                if kind != TASK:
+                    continue
+                header = json.loads(header_bytes)
+                result = {"region_id": header["region_id"], "attempt": header["attempt"], "worker": worker_id}
+            except (ValueError, KeyError, TypeError):
+                logger.logger.exception("Invalid f0 task is ignored.")
+                continue
+            state["region_id"] = header["region_id"]
+            try:
+                f0 = estimate_f0(header=header, samples=np.frombuffer(pcm, dtype=np.float64),
+                                 audio_calculator=audio_calculator)
+            except Exception as error:
+                logger.logger.exception("Failed to estimate f0 of region #{}.".format(header["region_id"]))
+                result["error"] = "{}: {}".format(type(error).__name__, error)
+                f0 = np.empty(0)
+            result_socket.send_multipart([RESULT, json.dumps(result).encode("ascii"),
+                                          np.ascontiguousarray(f0, dtype=np.float64).tobytes()])
+            state["region_id"] = None
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        heartbeat_thread.join()
+        task_socket.close(linger=0)
+        result_socket.close(linger=0)
+
+
+class F0WorkerPool:
+    """
+    Ship PCM of voiced regions to a pool of stateless worker processes (local or remote) over PUSH/PULL sockets,
+    and reassemble their f0 contours in the order of regions.
+    Tasks whose results don't arrive within `timeout_sec` (e.g., the worker died, or no worker is connected)
+    are resubmitted. Tasks are given up after `max_attempts`, or when no worker sends heartbeats,
+    then f0 is estimated locally with `audio_calculator`, or NaN without it, so that `collect()` always returns.
+    Regions whose estimation failed in a worker are NaN, and local workers which died are restarted while collecting.
+    Args:
+        task_port: Port of PUSH socket which distributes tasks.
+        result_port: Port of PULL socket which gathers results and heartbeats.
+        num_local_workers: The number of worker processes started on this machine.
+        timeout_sec: Time to wait for a result before resubmission.
+        max_attempts: The number of submissions of a task, after which its f0 is given up.
+        heartbeat_sec: Interval of heartbeats of workers.
+        worker_cpus: CPUs of each local worker (any if empty).
+        audio_calculator: `AudioCalculator` which estimates f0 of regions given up (NaN if `None`).
+    """
+
+    def __init__(self, task_port: int = 5557, result_port: int = 5558, num_local_workers: int = 2,
+                 timeout_sec: float = 10.0, max_attempts: int = 3, heartbeat_sec: float = 1.0,
+                 worker_cpus: Sequence[Sequence[int]] = (), audio_calculator=None):
+        self.logger = Logger(name=__name__)
+        self.audio_calculator = audio_calculator
+        self.task_address = "tcp://127.0.0.1:{}".format(task_port)
+        self.result_address = "tcp://127.0.0.1:{}".format(result_port)
+        self.timeout_sec = timeout_sec
+        self.max_attempts = max_attempts
+        self.heartbeat_sec = heartbeat_sec
+        self.context = zmq.Context.instance()
+        self.task_socket = self.context.socket(zmq.PUSH)
+        # queue tasks only to connected workers, so that they aren't lost in the pipe to nobody
+        self.task_socket.setsockopt(zmq.IMMEDIATE, 1)
+        self.task_socket.bind("tcp://*:{}".format(task_port))
+        self.result_socket = self.context.socket(zmq.PULL)
+        self.result_socket.bind("tcp://*:{}".format(result_port))
+        self.poller = zmq.Poller()
+        self.poller.register(self.result_socket, zmq.POLLIN)
+        # region_id -> [header, pcm, time of the current attempt]
+        self._pending: Dict[int, List[Any]] = {}
+        self.workers: Dict[str, float] = {}  # worker id -> time of the last heartbeat
+        self._unsent: Set[int] = set()  # regions which couldn't be sent since no worker was connected
+        self.resubmitted_count: int = 0
+        self.restarted_count: int = 0
+        self.worker_cpus: List[List[int]] = [list(cpus) for cpus in worker_cpus]
+        self.processes: List[multiprocessing.Process] = []
+        self._started: List[float] = []  # time when each local worker was started
+        for i in range(num_local_workers):
+            self.processes.append(self._start_worker(index=i))
+            self._started.append(TimeMeasure.get_perf_counter())
+        self.logger.logger.info("Started {} local f0 workers.".format(num_local_workers))
+
+    def _start_worker(self, index: int) -> multiprocessing.Process:
+        # `spawn` avoids inheriting the state of audio devices and threads
+        process = multiprocessing.get_context("spawn").Process(
+            target=run_f0_worker, kwargs={"task_address": self.task_address, "result_address": self.result_address,
+                                          "heartbeat_sec": self.heartbeat_sec,
+                                          "cpus": self.worker_cpus[index] if index < len(self.worker_cpus) else []},
+            name="f0_worker_{}".format(index), daemon=True)
+        process.start()
+        return process
+
+    def restart_dead_workers(self) -> None:
+        """
+        Restart local workers which died (e.g., killed by OOM), at most once per liveness period of each,
+        so that a worker which can't start doesn't spin.
+        """
+        now = TimeMeasure.get_perf_counter()
+        for i, process in enumerate(self.processes):
+            if process.is_alive() or now - self._started[i] < self.heartbeat_sec * 3:
+                continue
+            self.logger.logger.warning("f0 worker {} died (exit code: {}), and is restarted.".format(
+                i, process.exitcode))
+            process.join()
+            self.processes[i] = self._start_worker(index=i)
+            self._started[i] = now
+            self.restarted_count += 1
+
+    def submit(self, region_id: int, samples: np.ndarray, **params) -> None:
+        """
+        Send a region to workers.
+        Args:
+            region_id: ID of the region, which tags the result.
+            samples: Float samples of the region.
+            params: `f0_method`, `sample_rate` and optional `min_freq`, `max_freq`, `frame_length`,
+                `hop_length` and `decimation` (see `estimate_f0()`).
+        """
+        header = dict(params, region_id=int(region_id), attempt=0)
+        pcm = np.ascontiguousarray(samples, dtype=np.float64).tobytes()
+        self._pending[int(region_id)] = [header, pcm, TimeMeasure.get_perf_counter()]
+        self._send(region_id=int(region_id))
+
+    def _send(self, region_id: int) -> None:
+        header, pcm, _ = self._pending[region_id]
+        try:
+            self.task_socket.send_multipart([TASK, json.dumps(header).encode("ascii"), pcm], flags=zmq.NOBLOCK)
+            self._unsent.discard(region_id)
+        except zmq.Again:  # no worker is connected, so it will be sent again while collecting, until timeout
+            if region_id not in self._unsent:
+                self.logger.logger.warning("No f0 worker is available.")
+            self._unsent.add(region_id)
+
+    def wait_for_workers(self, count: int = 1, timeout_sec: float = 30.0) -> bool:
+        """
+        Wait until `count` workers send heartbeats, e.g., while local workers are importing libraries.
+        """
+        start = TimeMeasure.get_perf_counter()
+        while len(self.get_live_workers()) < count:
+            if TimeMeasure.get_perf_counter() - start > timeout_sec:
+                self.logger.logger.warning("Only {} of {} f0 workers are ready.".format(
+                    len(self.get_live_workers()), count))
+                return False
+            self._receive(waiting=set(), results={})
+        return True
+
+    def collect(self, region_ids: Sequence[int]) -> List[np.ndarray]:
+        """
+        Wait for results of the regions.
+        Returns:
+            contours (List[np.ndarray]): f0 contours in the order of `region_ids`, which are estimated locally
+            (or NaN) for regions given up.
+        """
+        results: Dict[int, np.ndarray] = {}
+        waiting = set(int(region_id) for region_id in region_ids)
+        while waiting:
+            self.restart_dead_workers()
+            for region_id in sorted(self._unsent & waiting):
+                self._send(region_id=region_id)
+            self._receive(waiting=waiting, results=results)
+            self._resubmit_expired(waiting=waiting, results=results)
+        return [results[int(region_id)] for region_id in region_ids]
+
+    def _receive(self, waiting: Set[int], results: Dict[int, np.ndarray]) -> None:
+        for socket, _ in self.poller.poll(timeout=int(self.heartbeat_sec * 1000)):
+            kind, header_bytes, *payload = socket.recv_multipart()
+            header = json.loads(header_bytes)
+            self.workers[header["worker"]] = TimeMeasure.get_perf_counter()
+            if kind == RESULT and header["region_id"] in waiting:  # duplicates of resubmission are ignored
+                region_id = header["region_id"]
+                if "error" in header:
+                    results[region_id] = self._give_up(region_id=region_id, reason="the worker failed ({})".format(
+                        header["error"]), is_local=False)
+                else:
+                    results[region_id] = np.frombuffer(payload[0], dtype=np.float64)
+                    self._pending.pop(region_id, None)
+                waiting.discard(region_id)
+
+    def _resubmit_expired(self, waiting: Set[int], results: Dict[int, np.ndarray]) -> None:
+        now = TimeMeasure.get_perf_counter()
+        # unsent regions also expire, so that regions are given up when no worker is connected
+        for region_id in sorted(waiting):
+            header, _, submitted = self._pending[region_id]
+            if now - submitted < self.timeout_sec:
+                continue
+            live_workers = self.get_live_workers()
+            if header["attempt"] + 1 >= self.max_attempts or not live_workers:
+                reason = "after {} attempts".format(header["attempt"] + 1) if live_workers else "no f0 worker is alive"
+                results[region_id] = self._give_up(region_id=region_id, reason=reason)
+                waiting.discard(region_id)
+                continue
+            header["attempt"] += 1
+            self._pending[region_id][2] = now
+            self.resubmitted_count += 1
+            self.logger.logger.warning("f0 of region #{} timed out, resubmitted ({} live workers).".format(
+                region_id, len(live_workers)))
+            self._send(region_id=region_id)
+
+    def _give_up(self, region_id: int, reason: str, is_local: bool = True) -> np.ndarray:
+        """
+        f0 of a region which workers didn't return, which is estimated locally (or NaN).
+        Regions which failed in a worker (`is_local=False`) are NaN, since they would fail here too.
+        """
+        header, pcm, _ = self._pending.pop(region_id)
+        self._unsent.discard(region_id)
+        samples = np.frombuffer(pcm, dtype=np.float64)
+        if self.audio_calculator is not None and is_local:
+            self.logger.logger.warning("f0 of region #{} is estimated locally, since {}.".format(region_id, reason))
+            return estimate_f0(header=header, samples=samples, audio_calculator=self.audio_calculator)
+        self.logger.logger.error("f0 of region #{} is given up, since {}.".format(region_id, reason))
+        return np.full(get_frame_count(header=header, num_samples=len(samples)), np.nan)
+
+    def get_live_workers(self) -> List[str]:
+        """
+        Workers which sent heartbeats recently.
+        """
+        now = TimeMeasure.get_perf_counter()
+        return [worker for worker, last in self.workers.items() if now - last < self.heartbeat_sec * 3]
+
+    def close(self) -> None:
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        self.task_socket.close(linger=0)
+        self.result_socket.close(linger=0)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Start f0 workers which connect to `F0WorkerPool` on a host.")
+    parser.add_argument("task_address", help="address of tasks, e.g., tcp://host:5557")
+    parser.add_argument("result_address", help="address of results, e.g., tcp://host:5558")
+    parser.add_argument("-n", "--num_workers", help="the number of worker processes", type=int, default=1)
+    args = parser.parse_args()
+    processes: List[multiprocessing.Process] = []
+    for i in range(args.num_workers):
+        worker = multiprocessing.get_context("spawn").Process(
+            target=run_f0_worker, args=(args.task_address, args.result_address), name="f0_worker_{}".format(i))
+        worker.start()
+        processes.append(worker)
+    for worker in processes:
+        worker.join()
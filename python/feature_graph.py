@@ -0,0 +1,98 @@
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Sequence, Tuple
+
+from util.exception import FeatureGraphException
+from util.logger import Logger
+
+
+class FeatureNode:
+    """
+    Feature which is computed from its inputs, i.e., other features or sources given for each block.
+    Args:
+        name: Name of the feature.
+        inputs: Names of features (or sources) which are passed to `compute` as positional arguments.
+        compute: Function to compute the feature.
+    """
+
+    def __init__(self, name: str, inputs: Sequence[str], compute: Callable[..., Any]):
+        self.name = name
+        self.inputs: Tuple[str, ...] = tuple(inputs)
+        self.compute = compute
+
+    def __repr__(self) -> str:
+        return "FeatureNode(name={}, inputs={})".format(self.name, list(self.inputs))
+
+
+class FeatureGraph:
+    """
+    Registry of features which resolves their dependencies (DAG), so that only requested features and
+    their intermediates (e.g., STFT magnitude) are computed, and each of them is computed once per block.
+    Examples:
+        graph = FeatureGraph(sources=["samples"])
+        graph.register("audio", ["samples"], lambda samples: samples / 2 ** 15)
+        graph.register("rms", ["audio"], lambda audio: np.sqrt(np.mean(audio ** 2)))
+        graph.compute(outputs=["rms"], sources={"samples": block})  # {"samples": ..., "audio": ..., "rms": ...}
+    """
+
+    def __init__(self, sources: Iterable[str] = ()):
+        self.logger = Logger(name=__name__)
+        self.sources: FrozenSet[str] = frozenset(sources)
+        self.nodes: Dict[str, FeatureNode] = {}
+        self._plans: Dict[FrozenSet[str], List[FeatureNode]] = {}  # resolved order for each set of outputs
+
+    def register(self, name: str, inputs: Sequence[str], compute: Callable[..., Any]) -> None:
+        try:
+            if name in self.nodes or name in self.sources:
+                raise FeatureGraphException("Error when registering feature")
+        except FeatureGraphException:
+            self.logger.logger.exception("Feature `{}` is already registered.".format(name))
+            raise
+        self.nodes[name] = FeatureNode(name=name, inputs=inputs, compute=compute)
+        self._plans.clear()
+
+    def resolve(self, outputs: Iterable[str]) -> List[FeatureNode]:
+        """
+        Order of features to compute the outputs, in which every feature comes after its inputs.
+        Features which no output depends on are not included.
+        """
+        outputs = frozenset(outputs)
+        if outputs in self._plans:
+            return self._plans[outputs]
+        order: List[FeatureNode] = []
+        state: Dict[str, int] = {}  # 1: visiting, 2: done
+        for output in sorted(outputs):
+            self._visit(name=output, state=state, order=order, path=[])
+        self._plans[outputs] = order
+        return order
+
+    def _visit(self, name: str, state: Dict[str, int], order: List[FeatureNode], path: List[str]) -> None:
+        if name in self.sources or state.get(name) == 2:
+            return
+        try:
+            if name not in self.nodes:
+                raise FeatureGraphException("Error when resolving features")
+            if state.get(name) == 1:
+                raise FeatureGraphException("Error when resolving features")
+        except FeatureGraphException:
+            self.logger.logger.exception("Feature `{}` is unknown or cyclic ({}).".format(
+                name, " -> ".join(path + [name])))
+            raise
+        state[name] = 1
+        node = self.nodes[name]
+        for input_name in node.inputs:
+            self._visit(name=input_name, state=state, order=order, path=path + [name])
+        state[name] = 2
+        order.append(node)
+
+    def compute(self, outputs: Iterable[str], sources: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Compute the outputs for a block.
+        Args:
+            outputs: Names of requested features.
+            sources: Values of sources for the block.
+        Returns:
+            values (Dict[str, Any]): Sources, outputs and intermediates which were computed.
+        """
+        values = dict(sources)
+        for node in self.resolve(outputs):
+            values[node.name] = node.compute(*[values[input_name] for input_name in node.inputs])
+        return values
@@ -0,0 +1,94 @@
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+
+class FeatureRecord:
+    """
+    Record of audio features with fixed schema, which is backed by numpy structured array.
+    The record is reused for every message, and conversion into built-in types (or packed bytes)
+    is done in one step, instead of checking the type of each value.
+    Attributes:
+        SCHEMA (List[Tuple[str, str]]): Default fields and dtypes, which are sent to Unity.
+    Examples:
+        record = FeatureRecord()
+        record["average_f0"] = np.float64(120.0)
+        record.to_dict()  # {"t": 0.0, ..., "average_f0": 120.0, ...}
+    """
+    __slots__ = ("dtype", "keys", "_buffer")
+
+    SCHEMA: List[Tuple[str, str]] = [
+        ("t", "<f8"),
+        ("total_voiced_region_num", "<i8"),
+        ("total_voiced_time_ms", "<f8"),
+        ("average_rms", "<f8"),
+        ("average_rms_db", "<f8"),
+        ("average_rms_db_total", "<f8"),
+        ("std_rms_db", "<f8"),
+        ("std_rms_db_total", "<f8"),
+        ("average_f0", "<f8"),
+        ("std_f0", "<f8"),
+    ]
+
+    def __init__(self, schema: Sequence[Tuple[str, str]] = None):
+        schema = FeatureRecord.SCHEMA if schema is None else schema
+        self.dtype: np.dtype = np.dtype(list(schema))
+        self.keys: Tuple[str, ...] = self.dtype.names
+        self._buffer: np.ndarray = np.zeros(1, dtype=self.dtype)
+
+    def add_fields(self, fields: Sequence[Tuple[str, str]]) -> None:
+        """
+        Extend the schema, which should be done before streaming. Values of existing fields are kept.
+        """
+        fields = [field for field in fields if field[0] not in self.keys]
+        if not fields:
+            return
+        buffer = np.zeros(1, dtype=np.dtype(self.dtype.descr + list(fields)))
+        for key in self.keys:
+            buffer[key] = self._buffer[key]
+        self.dtype = buffer.dtype
+        self.keys = self.dtype.names
+        self._buffer = buffer
+
+    def __getitem__(self, key: str):
+        return self._buffer[key][0]
+
+    def __setitem__(self, key: str, value) -> None:
+        self._buffer[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys
+
+    def get_schema(self) -> List[Tuple[str, str]]:
+        """
+        Field names and dtypes (e.g., `<f8`), which are needed to decode `to_bytes()`.
+        """
+        return [(key, self.dtype[key].str) for key in self.keys]
+
+    def to_tuple(self, keys: Sequence[str] = None) -> Tuple[Any, ...]:
+        """
+        All of values as built-in types, in the order of the schema.
+        Args:
+            keys: Subset of fields, in this order.
+        """
+        if keys is None:
+            return self._buffer[0].item()
+        return tuple(self._buffer[key][0].item() for key in keys)
+
+    def to_dict(self, keys: Sequence[str] = None) -> Dict[str, Any]:
+        """
+        All of values as built-in types.
+        Args:
+            keys: Keys of the dict instead of field names (e.g., camel case), in the order of the schema.
+        """
+        return dict(zip(self.keys if keys is None else keys, self.to_tuple()))
+
+    def to_bytes(self, keys: Sequence[str] = None) -> bytes:
+        """
+        Packed values (little endian) in the order of the schema.
+        Args:
+            keys: Subset of fields, in this order.
+        """
+        if keys is None:
+            return self._buffer.tobytes()
+        return b"".join(self._buffer[key].tobytes() for key in keys)
@@ -0,0 +1,152 @@
+import json
+import os
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from util.logger import Logger
+
+
+class FeatureStore:
+    """
+    Append-only columnar store of feature history (e.g., rms and dB of voiced frames) with a time index.
+    Rows are appended into one fixed-size chunk in memory, and the chunk is spilled into files (one for each column)
+    when it fills, so that appends are O(1) and memory doesn't grow with the length of the session.
+    Spilled chunks are read through `np.memmap`, and `index.json` (written on each spill and on closing) keeps
+    the layout and the first/last times of chunks, so that finished sessions can be opened by `FeatureStore.open()`.
+    Args:
+        directory: Directory of the store, which is made if it doesn't exist.
+        columns: Names and dtypes of columns, which should include the time column `t` in seconds.
+        chunk_size: The number of rows of each chunk.
+    Notes:
+        Times should be appended in chronological order, since range reads rely on it.
+    """
+    INDEX_FILE: str = "index.json"
+
+    def __init__(self, directory: str, columns: Sequence[Tuple[str, str]], chunk_size: int = 65536):
+        self.logger = Logger(name=__name__)
+        self.directory = directory
+        self.columns: Dict[str, np.dtype] = {name: np.dtype(dtype) for name, dtype in columns}
+        self.chunk_size = int(chunk_size)
+        self.chunk_lengths: List[int] = []  # of spilled chunks
+        self.chunk_first_times: List[float] = []
+        self.chunk_last_times: List[float] = []
+        self.is_read_only: bool = False
+        self._chunk: Dict[str, np.ndarray] = {name: np.empty(self.chunk_size, dtype=dtype)
+                                              for name, dtype in self.columns.items()}
+        self._length: int = 0  # rows in `self._chunk`
+        self._memmaps: Dict[Tuple[int, str], np.memmap] = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def open(cls, directory: str) -> "FeatureStore":
+        """
+        Open a finished store to read.
+        """
+        with open(os.path.join(directory, cls.INDEX_FILE)) as f:
+            index = json.load(f)
+        store = cls(directory=directory, columns=index["columns"], chunk_size=index["chunk_size"])
+        store.chunk_lengths = index["chunk_lengths"]
+        store.chunk_first_times = index["chunk_first_times"]
+        store.chunk_last_times = index["chunk_last_times"]
+        store.is_read_only = True
+        return store
+
+    def __len__(self) -> int:
+        return sum(self.chunk_lengths) + self._length
+
+    def append(self, **values: np.ndarray) -> None:
+        """
+        Append rows, i.e., arrays of the same length for all columns (e.g., `t=times, rms_db=rms_db`).
+        """
+        length = len(values["t"])
+        offset = 0
+        while offset < length:
+            size = min(length - offset, self.chunk_size - self._length)
+            for name, column in self._chunk.items():
+                column[self._length:self._length + size] = values[name][offset:offset + size]
+            self._length += size
+            offset += size
+            if self._length == self.chunk_size:
+                self._spill()
+
+    def _spill(self) -> None:
+        if self._length == 0:
+            return
+        chunk_id = len(self.chunk_lengths)
+        for name, column in self._chunk.items():
+            column[:self._length].tofile(self._get_path(chunk_id=chunk_id, name=name))
+        self.chunk_lengths.append(self._length)
+        self.chunk_first_times.append(float(self._chunk["t"][0]))
+        self.chunk_last_times.append(float(self._chunk["t"][self._length - 1]))
+        self._length = 0
+        self.write_index()
+
+    def _get_path(self, chunk_id: int, name: str) -> str:
+        return os.path.join(self.directory, "{:06d}_{}.bin".format(chunk_id, name))
+
+    def _get_chunk(self, chunk_id: int, name: str) -> np.ndarray:
+        if chunk_id == len(self.chunk_lengths):  # the chunk in memory
+            return self._chunk[name][:self._length]
+        key = (chunk_id, name)
+        if key not in self._memmaps:
+            self._memmaps[key] = np.memmap(self._get_path(chunk_id=chunk_id, name=name), dtype=self.columns[name],
+                                           mode="r", shape=(self.chunk_lengths[chunk_id],))
+        return self._memmaps[key]
+
+    def read(self, name: str, start: int = 0, stop: int = None) -> np.ndarray:
+        """
+        Values of a column in rows [start, stop).
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        parts = []
+        chunk_start = 0
+        for chunk_id, chunk_length in enumerate(self.chunk_lengths + [self._length]):
+            chunk_stop = chunk_start + chunk_length
+            if chunk_stop > start and chunk_start < stop:
+                parts.append(self._get_chunk(chunk_id=chunk_id, name=name)[max(start - chunk_start, 0):
+                                                                          min(stop, chunk_stop) - chunk_start])
+            chunk_start = chunk_stop
+        if not parts:
+            return np.empty(0, dtype=self.columns[name])
+        return np.concatenate(parts)
+
+    def read_time_range(self, start_sec: float, end_sec: float, names: Sequence[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Rows whose times are in [start_sec, end_sec), which are found with the time index of chunks.
+        """
+        names = list(self.columns) if names is None else names
+        first_times = self.chunk_first_times + ([float(self._chunk["t"][0])] if self._length > 0 else [])
+        last_times = self.chunk_last_times + ([float(self._chunk["t"][self._length - 1])] if self._length > 0 else [])
+        # chunks which may overlap the range
+        first_chunk = int(np.searchsorted(last_times, start_sec, side="left"))
+        last_chunk = int(np.searchsorted(first_times, end_sec, side="left"))
+        res = {name: [] for name in names}
+        for chunk_id in range(first_chunk, last_chunk):
+            times = self._get_chunk(chunk_id=chunk_id, name="t")
+            begin, end = np.searchsorted(times, [start_sec, end_sec], side="left")
+            for name in names:
+                res[name].append(self._get_chunk(chunk_id=chunk_id, name=name)[begin:end])
+        return {name: np.concatenate(parts) if parts else np.empty(0, dtype=self.columns[name])
+                for name, parts in res.items()}
+
+    def write_index(self) -> None:
+        """
+        Write the layout of spilled chunks atomically.
+        """
+        index = {"columns": [[name, dtype.str] for name, dtype in self.columns.items()],
+                 "chunk_size": self.chunk_size, "chunk_lengths": self.chunk_lengths,
+                 "chunk_first_times": self.chunk_first_times, "chunk_last_times": self.chunk_last_times}
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(index, f)
+        os.replace(path + ".tmp", path)
+
+    def close(self) -> None:
+        """
+        Spill the rows in memory, so that the whole session can be opened later.
+        """
+        if not self.is_read_only:
+            self._spill()
+            self.write_index()
+        self._memmaps.clear()
@@ -0,0 +1,81 @@
+import threading
+from typing import Callable, Union
+
+import numpy as np
+import soundfile as sf
+
+from util.logger import Logger
+from util.time_measure import TimeMeasure
+
+
+class FileInputStatus:
+    """
+    Stands for `sd.CallbackFlags` of blocks read from a file, which never overflow.
+    """
+    input_overflow: bool = False
+
+
+class FileInputStream:
+    """
+    Replay an audio file through the callback of `AudioStream`, in place of `sd.InputStream`.
+    Blocks are read on their own thread (named `capture`, like the thread of PortAudio), at the pace of the device,
+    so that the whole pipeline (handoff, analysis and publishing) behaves as with the live input.
+    Args:
+        filename: Audio file, which is mixed down into mono and converted into int16.
+        callback: Same as the one of `sd.InputStream`, i.e., `callback(indata, frames, time, status)`.
+        blocksize: The number of frames of each block.
+        speed: Pace of the replay relative to the real time (0: as fast as possible).
+        finished_callback: Called from the capture thread after the last block, or after `stop()`.
+    """
+
+    def __init__(self, filename: str, callback: Callable, blocksize: int, speed: float = 1.0,
+                 finished_callback: Union[Callable[[], None], None] = None):
+        self.logger = Logger(name=__name__)
+        self.sound_file = sf.SoundFile(filename)
+        self.samplerate: int = self.sound_file.samplerate
+        self.callback = callback
+        self.blocksize = blocksize
+        self.speed = speed
+        self.finished_callback = finished_callback
+        self._stop_event = threading.Event()
+        self._thread: Union[threading.Thread, None] = None
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._replay, name="capture", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def close(self) -> None:
+        self.stop()
+        self.sound_file.close()
+
+    def _replay(self) -> None:
+        status = FileInputStatus()
+        block_sec = self.blocksize / self.samplerate
+        start = TimeMeasure.get_perf_counter()
+        block_count = 0
+        for block in self.sound_file.blocks(blocksize=self.blocksize, dtype="int16", always_2d=True,
+                                             fill_value=0):  # the last block is padded with silence
+            if self._stop_event.is_set():
+                break
+            if self.speed > 0:
+                # wait until the block would be captured by the device
+                delay = start + (block_count + 1) * block_sec / self.speed - TimeMeasure.get_perf_counter()
+                if delay > 0 and self._stop_event.wait(delay):
+                    break
+            if block.shape[1] > 1:  # mix down into mono
+                block = np.mean(block, axis=1, dtype=np.float64).astype(np.int16).reshape(-1, 1)
+            self.callback(np.ascontiguousarray(block), len(block), None, status)
+            block_count += 1
+        self.logger.logger.info("Replayed {} blocks of the file.".format(block_count))
+        if self.finished_callback is not None:
+            self.finished_callback()
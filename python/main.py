@@ -5,6 +5,7 @@ from audio_manipulator import AudioManipulator
 from audio_calculator import AudioCalculator
 from audio_stream import AudioStream
 from audio_handler import AudioHandler
+from sampling_profiler import SamplingProfiler
 
 
 class Main:
@@ -39,32 +40,130 @@ class Main:
         # description for each argument
         # following `-f` and `-s` arguments should be mutually exclusive (i.e., xor)
         xor_group = parser.add_mutually_exclusive_group(required=True)
-        xor_group.add_argument("-f", "--filename", help="whether using wave file or not")
+        xor_group.add_argument("-f", "--filename", help="replay wave file as input, instead of audio_util device")
         xor_group.add_argument("-s", "--stream", help="whether using audio_util device as input source or not",
                                action="store_true", default=False)
         xor_group.add_argument("-i", "--input", help="start as input mode. it won't be plotted.", action="store_true",
                                default=False)
         parser.add_argument("-d", "--down_input_sample_rate", help="set input sample rate as 16000",
                             action="store_true", default=False)
+        parser.add_argument("--analysis_sample_rate", help="sample rate for analysis, which input will be "
+                                                           "resampled into", type=int, default=16000)
         parser.add_argument("-D", "--default_input_device", help="use default input device", action="store_true",
                             default=False)
+        parser.add_argument("-p", "--plot_f0", help="plot f0 contour in addition to amplitude in stream mode",
+                            action="store_true", default=False)
+        parser.add_argument("--bus_name", help="name of shared memory to publish audio blocks for other processes",
+                            default="vocal_analysis")
+        parser.add_argument("--record_format", help="file format to record voiced regions",
+                            choices=["wav", "flac"], default="wav")
+        parser.add_argument("--record_max_mb", help="rotate the recording file when its size exceeds this (0: no limit)",
+                            type=float, default=0.0)
+        parser.add_argument("--record_max_min", help="rotate the recording file when its duration exceeds this "
+                                                     "in minutes (0: no limit)", type=float, default=60.0)
+        parser.add_argument("--control_port", help="port of control socket to subscribe features", type=int,
+                            default=5556)
+        parser.add_argument("--no_broadcast", help="send features only to subscribers of control socket, "
+                                                   "so that features nobody subscribes are not calculated",
+                            action="store_true", default=False)
+        parser.add_argument("--f0_workers", help="the number of local worker processes to estimate f0 "
+                                                 "(0: estimate in the analysis thread)", type=int, default=0)
+        parser.add_argument("--f0_worker_ports", help="ports of tasks and results for f0 workers, which workers on "
+                                                      "other hosts can connect to", nargs=2, type=int,
+                            default=[5557, 5558])
+        parser.add_argument("--f0_worker_timeout", help="resubmit a region to f0 workers after this in seconds",
+                            type=float, default=10.0)
+        parser.add_argument("-r", "--raw_buffer", help="use raw buffer (bytes) stream instead of numpy one",
+                            action="store_true", default=False)
+        parser.add_argument("--precision", help="precision of front-end, stft and rms (pyworld always uses float64)",
+                            choices=["float32", "float64"], default="float64")
+        parser.add_argument("--rolling_windows", help="windows of rolling statistics in seconds", nargs="+",
+                            type=float, default=[10.0, 60.0, 300.0])
+        parser.add_argument("--adaptive_f0_range", help="narrow the search range of f0 to the speaker, "
+                                                        "which is learned while streaming", action="store_true",
+                            default=False)
+        parser.add_argument("--adaptive_f0_decimation", help="decimate audio for pYIN with the narrowed range "
+                                                             "(with --adaptive_f0_range)", action="store_true",
+                            default=False)
+        parser.add_argument("--streaming_f0", help="estimate f0 in short windows with context, which continues "
+                                                   "over blocks, instead of each whole region (not with --f0_workers)",
+                            action="store_true", default=False)
+        parser.add_argument("--block_ms", help="duration of blocks which are analysed and sent in msec "
+                                               "(default: 5000, or 1000 with --streaming_f0)", type=int, default=None)
+        parser.add_argument("--checkpoint_interval", help="interval of checkpoints of session totals in seconds "
+                                                          "(0: no checkpoint)", type=float, default=10.0)
+        parser.add_argument("--resume", help="resume session totals from the last checkpoint in etc/",
+                            action="store_true", default=False)
+        parser.add_argument("--capture_cpus", help="CPUs to pin the capture (callback) thread to", nargs="+", type=int,
+                            default=[])
+        parser.add_argument("--analysis_cpus", help="CPUs to pin the analysis thread to", nargs="+", type=int,
+                            default=[])
+        parser.add_argument("--publish_cpus", help="CPUs to pin the publishing (event loop) thread to", nargs="+",
+                            type=int, default=[])
+        parser.add_argument("--f0_worker_cpus", help="CPUs to pin f0 workers to, one for each worker in turn",
+                            nargs="+", type=int, default=[])
+        parser.add_argument("--capture_priority", help="SCHED_FIFO priority of the capture thread (1-99, 0: default "
+                                                       "policy), which needs CAP_SYS_NICE", type=int, default=0)
+        parser.add_argument("--capture_nice", help="niceness of the capture thread, without --capture_priority",
+                            type=int, default=None)
+        parser.add_argument("--pool_threads", help="limit threads of BLAS/OpenMP and numba pools (0: no limit)",
+                            type=int, default=0)
+        parser.add_argument("--replay_speed", help="pace of replaying the file of `-f` relative to the real time "
+                                                   "(0: as fast as possible, where blocks may be dropped as with "
+                                                   "the device)", type=float, default=1.0)
+        parser.add_argument("--profile", help="profile capture, analysis and publish threads by sampling, and write "
+                                              "collapsed stacks (for flamegraphs) and summary into etc/",
+                            action="store_true", default=False)
+        parser.add_argument("--profile_interval", help="interval of sampling of --profile in msec", type=float,
+                            default=5.0)
+        parser.add_argument("-w", "--warm_up", help="warm up estimators in background before streaming",
+                            action="store_true", default=False)
         # parsing
         return parser.parse_args()
 
     def start_mode(self):
-        # firstly, set input device
-        self.audio_manipulator.set_input_device(use_default=Profile.args.default_input_device)
+        if not Profile.args.profile:
+            self.run_mode()
+            return
+        profiler = SamplingProfiler(interval_sec=Profile.args.profile_interval / 1000,
+                                    summary_classes=[AudioCalculator, AudioStream])
+        profiler.start()
+        try:
+            self.run_mode()
+        finally:
+            profiler.stop()
+            import datetime
+            import os
+            profiler.write(path_prefix=os.path.join(self.audio_manipulator.get_output_directory(),
+                                                    datetime.datetime.now().strftime("profile_%Y-%m-%d_%H-%M-%S")))
+
+    def run_mode(self):
+        # firstly, set input device (or file)
+        if Profile.args.filename is not None:
+            if not self.audio_manipulator.set_input_file(filename=Profile.args.filename):
+                return
+        else:
+            self.audio_manipulator.set_input_device(use_default=Profile.args.default_input_device)
 
         # execute according process
         if Profile.args.available_device:
             pass
         elif Profile.args.filename is not None:
-            # todo implement
-            pass
+            self.logger.logger.info("Start replaying the file (without plotting).")
+            self.audio_stream = AudioStream(audio_manipulator=self.audio_manipulator,
+                                            audio_calculator=self.audio_calculator,
+                                            zeromq_sender=self.zeromq_sender
+                                            )
+            self.audio_handler = AudioHandler(audio_stream=self.audio_stream)
+            self.audio_handler.start_file(filename=Profile.args.filename)
         elif Profile.args.stream:
             self.logger.logger.info("Start streaming and plotting.")
-            self.audio_handler.start_plot_amplitude()
-            # todo complete following process
+            self.audio_stream = AudioStream(audio_manipulator=self.audio_manipulator,
+                                            audio_calculator=self.audio_calculator,
+                                            zeromq_sender=self.zeromq_sender
+                                            )
+            self.audio_handler = AudioHandler(audio_stream=self.audio_stream)
+            self.audio_handler.start_plot_amplitude(with_f0=Profile.args.plot_f0)
         elif Profile.args.input:
             self.logger.logger.info("Start streaming input (without plotting).")
             self.audio_stream = AudioStream(audio_manipulator=self.audio_manipulator,
@@ -72,8 +171,8 @@ class Main:
                                             zeromq_sender=self.zeromq_sender
                                             )
             self.audio_handler = AudioHandler(audio_stream=self.audio_stream)
-            self.audio_handler.start_input()  # input audio
-            self.zeromq_sender.handle_message()  # send message
+            # input audio, and send message for each block
+            self.audio_handler.start_input(is_buffer=Profile.args.raw_buffer)
         else:
             self.logger.logger.error("Invalid mode selection.")
 
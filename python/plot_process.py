@@ -0,0 +1,106 @@
+import multiprocessing
+
+import numpy as np
+
+from audio_bus import AudioBusReader
+from shared_ring_buffer import RingBuffer, SharedRingBuffer
+from util.logger import Logger
+
+
+def run_plot(name: str, capacity: int, channels: int = 1, kind: str = "amplitude", interval: float = 30.0,
+             max_points: int = 2000, y_range=(-1.0, 1.0), down_sample: int = 1) -> None:
+    """
+    Entry point of the plot process, which plots the latest samples written by `AudioStream`.
+    Args:
+        name: Name of the shared memory, i.e., `AudioBus` for `amplitude` and `SharedRingBuffer` for `f0`.
+        capacity: The number of samples to plot (after `down_sample`).
+        channels: The number of channels.
+        kind: `amplitude` or `f0`, which decides the source and appearance.
+        interval: Interval of redrawing in msec.
+        max_points: The number of points to draw at most (samples are decimated to this).
+        y_range: Range of y-axis.
+        down_sample: Step to down sample PCM blocks from `AudioBus`.
+    """
+    # matplotlib is imported only in the plot process
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+
+    if kind == "amplitude":
+        # consume PCM blocks from the bus, and keep them in the local ring
+        reader = AudioBusReader(name=name)
+        ring = RingBuffer(capacity=capacity, channels=channels)
+    else:
+        reader = None
+        ring = SharedRingBuffer(capacity=capacity, channels=channels, name=name, create=False)
+    step = max(1, capacity // max_points)
+    plot_data = np.zeros((capacity // step, channels))
+    fig, ax = plt.subplots()
+    lines = ax.plot(plot_data)
+    if channels > 1:
+        ax.legend(['channel {}'.format(c) for c in range(1, channels + 1)],
+                  loc='lower left', ncol=channels)
+    ax.axis((0, len(plot_data), y_range[0], y_range[1]))
+    if kind == "amplitude":
+        ax.set_yticks([0])
+        ax.yaxis.grid(True)
+        ax.tick_params(bottom='off', top='off', labelbottom='off',
+                       right='off', left='off', labelleft='off')
+    else:
+        ax.set_ylabel("f0 [Hz]")
+        ax.yaxis.grid(True)
+    fig.tight_layout(pad=0)
+    last_cursor = [-1]
+
+    def update_plot(frame):
+        """
+        This is called for each plot update.
+        Lines will be updated only when the writer moved the cursor.
+        """
+        if reader is not None:
+            for _, block in reader.read():
+                ring.write(block[::down_sample] / 2 ** 15)
+        cursor, data = ring.read_latest(length=len(plot_data) * step)
+        if cursor != last_cursor[0]:
+            last_cursor[0] = cursor
+            data = data[::step]
+            for column, line in enumerate(lines):
+                line.set_ydata(data[:, column])
+        return lines
+
+    ani = FuncAnimation(fig, update_plot, interval=interval, blit=True)  # noqa: F841
+    plt.show()
+    if reader is not None:
+        reader.close()
+    else:
+        ring.close()
+
+
+class PlotProcess:
+    """
+    Plot the content of `AudioBus` (amplitude) or `SharedRingBuffer` (f0) in another process.
+    Since the process has its own GIL and GUI loop, the plot never slows the analysis down.
+    Args:
+        name: Name of the shared memory written by `AudioStream`.
+        capacity: The number of samples to plot.
+    """
+
+    def __init__(self, name: str, capacity: int, channels: int = 1, kind: str = "amplitude", interval: float = 30.0,
+                 y_range=(-1.0, 1.0), down_sample: int = 1):
+        self.logger = Logger(name=__name__)
+        # `spawn` avoids inheriting the state of audio devices and threads
+        context = multiprocessing.get_context("spawn")
+        self.process = context.Process(target=run_plot,
+                                       kwargs={"name": name, "capacity": capacity,
+                                               "channels": channels, "kind": kind,
+                                               "interval": interval, "y_range": y_range,
+                                               "down_sample": down_sample},
+                                       name="plot_{}".format(kind), daemon=True)
+
+    def start(self) -> None:
+        self.process.start()
+        self.logger.logger.info("Started plot process ({}).".format(self.process.name))
+
+    def stop(self) -> None:
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
@@ -0,0 +1,118 @@
+from typing import FrozenSet, List, Union
+
+from util.logger import Logger
+
+
+class QualityLevel:
+    """
+    Set of settings which decides the cost of the analysis for each block.
+    Args:
+        f0_method: f0 estimator (`Harvest`, `pYIN`, `DIO`), or `None` not to estimate f0.
+        hop_length: Hop length of STFT (and pYIN).
+        features: Subset of features to calculate, e.g., {"rms", "f0"}.
+    """
+
+    def __init__(self, f0_method: Union[str, None], hop_length: int, features: FrozenSet[str]):
+        self.f0_method = f0_method
+        self.hop_length = hop_length
+        self.features = features
+
+    def __repr__(self) -> str:
+        return "QualityLevel(f0_method={}, hop_length={}, features={})".format(
+            self.f0_method, self.hop_length, sorted(self.features))
+
+
+class QualityGovernor:
+    """
+    Trade the cost of estimators for real-time safety.
+    The governor watches the real-time factor (RTF, i.e., processing time / block duration) and the depth of
+    the queue of blocks waiting for the analysis, then steps down the quality level when the analysis falls behind,
+    and steps back up when there is enough headroom again.
+    Args:
+        levels: Quality levels from the highest (most expensive) to the lowest.
+        degrade_rtf: Step down when smoothed RTF exceeds this.
+        recover_rtf: Step up when smoothed RTF is below this (should be far below `degrade_rtf` for hysteresis).
+        degrade_blocks: The number of consecutive blocks under pressure to step down.
+        recover_blocks: The number of consecutive blocks with headroom to step up.
+        smoothing: Weight of the latest RTF for exponential moving average.
+    """
+    F0_METHODS: List[str] = ["Harvest", "pYIN", "DIO"]  # from the most expensive
+
+    def __init__(self, levels: List[QualityLevel], degrade_rtf: float = 0.8, recover_rtf: float = 0.3,
+                 degrade_blocks: int = 2, recover_blocks: int = 10, smoothing: float = 0.5):
+        self.logger = Logger(name=__name__)
+        self.levels = levels
+        self.degrade_rtf = degrade_rtf
+        self.recover_rtf = recover_rtf
+        self.degrade_blocks = degrade_blocks
+        self.recover_blocks = recover_blocks
+        self.smoothing = smoothing
+        self.level_index: int = 0
+        self.rtf: float = 0.0  # smoothed
+        self._pressure_count: int = 0
+        self._headroom_count: int = 0
+
+    @classmethod
+    def make_levels(cls, f0_method: str = "Harvest", hop_length: int = 128) -> List[QualityLevel]:
+        """
+        Levels whose cost decreases at each step: the configured f0 estimator with the hop, then with the double hop
+        (cheaper STFT and pYIN), then cheaper estimators with the double hop, and the one without f0 at last.
+        Estimators of every level should be warmed up (see `AudioCalculator.warm_up()`), since levels are switched
+        when the analysis falls behind, i.e., when first-call costs hurt the most.
+        """
+        methods = cls.F0_METHODS[cls.F0_METHODS.index(f0_method):] if f0_method in cls.F0_METHODS else []
+        levels = [QualityLevel(f0_method=method, hop_length=hop_length, features=frozenset({"rms", "f0"}))
+                  for method in methods[:1]]
+        levels += [QualityLevel(f0_method=method, hop_length=hop_length * 2, features=frozenset({"rms", "f0"}))
+                   for method in methods]
+        levels.append(QualityLevel(f0_method=None, hop_length=hop_length * 4, features=frozenset({"rms"})))
+        return levels
+
+    def get_f0_methods(self) -> List[str]:
+        """
+        f0 estimators used by the levels, from the highest level.
+        """
+        return list(dict.fromkeys(level.f0_method for level in self.levels if level.f0_method is not None))
+
+    @property
+    def current(self) -> QualityLevel:
+        return self.levels[self.level_index]
+
+    def update(self, processing_sec: float, block_sec: float, queue_depth: int = 0) -> bool:
+        """
+        Update with the cost of the latest block, and switch the level if needed.
+        Args:
+            processing_sec: Time taken to process the block.
+            block_sec: Duration of the block.
+            queue_depth: The number of blocks waiting for the analysis (or dropped by the device).
+        Returns:
+            is_switched (bool): The level was switched or not.
+        """
+        rtf = processing_sec / block_sec if block_sec > 0 else 0.0
+        self.rtf = self.smoothing * rtf + (1 - self.smoothing) * self.rtf
+        if self.rtf > self.degrade_rtf or queue_depth > 0:
+            self._pressure_count += 1
+            self._headroom_count = 0
+        elif self.rtf < self.recover_rtf:
+            self._headroom_count += 1
+            self._pressure_count = 0
+        else:  # between thresholds, keep the level
+            self._pressure_count = 0
+            self._headroom_count = 0
+
+        if self._pressure_count >= self.degrade_blocks and self.level_index < len(self.levels) - 1:
+            return self._switch(self.level_index + 1, rtf=rtf, queue_depth=queue_depth)
+        if self._headroom_count >= self.recover_blocks and self.level_index > 0:
+            return self._switch(self.level_index - 1, rtf=rtf, queue_depth=queue_depth)
+        return False
+
+    def _switch(self, level_index: int, rtf: float, queue_depth: int) -> bool:
+        direction = "down" if level_index > self.level_index else "up"
+        self.level_index = level_index
+        self._pressure_count = 0
+        self._headroom_count = 0
+        # the cost of the new level is unknown yet
+        self.rtf = (self.degrade_rtf + self.recover_rtf) / 2
+        self.logger.logger.info("Quality level stepped {} to #{} {} (RTF: {:.2f}, queue: {}).".format(
+            direction, level_index, self.current, rtf, queue_depth))
+        return True
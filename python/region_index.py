@@ -0,0 +1,109 @@
+import os
+import struct
+
+import numpy as np
+
+
+class RegionIndexWriter:
+    """
+    Write the timeline of voiced regions as a compact binary index alongside a recording.
+    Attributes:
+        DTYPE (np.dtype): Fixed-size record of each region.
+    Notes:
+        The layout of the file is `[header (16 bytes)][record x N]`, and the header is
+        `[magic (4s), version (uint32), sample_rate (uint32), record size (uint32)]`.
+        `start_sample` and `end_sample` are offsets from the beginning of the stream,
+        and `file_offset` is the offset (in samples) of the region in the recording.
+    """
+    MAGIC: bytes = b"VAIX"
+    VERSION: int = 1
+    HEADER_FORMAT: str = "<4sIII"
+    HEADER_BYTES: int = struct.calcsize(HEADER_FORMAT)
+    DTYPE: np.dtype = np.dtype([
+        ("region_id", "<i8"),
+        ("start_sample", "<i8"),
+        ("end_sample", "<i8"),
+        ("file_offset", "<i8"),
+        ("average_rms_db", "<f4"),
+        ("std_rms_db", "<f4"),
+        ("average_f0", "<f4"),
+        ("std_f0", "<f4"),
+    ])
+
+    def __init__(self, file_path: str, sample_rate: int):
+        self.file_path = file_path
+        self._file = open(file_path, "wb")
+        self._file.write(struct.pack(RegionIndexWriter.HEADER_FORMAT, RegionIndexWriter.MAGIC,
+                                     RegionIndexWriter.VERSION, int(sample_rate), RegionIndexWriter.DTYPE.itemsize))
+
+    @staticmethod
+    def new_record() -> np.ndarray:
+        return np.zeros(1, dtype=RegionIndexWriter.DTYPE)
+
+    def write(self, record: np.ndarray) -> None:
+        self._file.write(record.tobytes())
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class RegionIndex:
+    """
+    Read the index written by `RegionIndexWriter`, which gives O(log n) random access to regions
+    by id or time without rescanning audio.
+    Examples:
+        index = RegionIndex("../etc/2022-03-01_12-00-00.idx")
+        record = index.find_region(312)  # f0 and dB of region #312
+        samples = index.read_samples(record)  # audio of the region
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, "rb") as f:
+            magic, version, self.sample_rate, record_size = struct.unpack(
+                RegionIndexWriter.HEADER_FORMAT, f.read(RegionIndexWriter.HEADER_BYTES))
+        if magic != RegionIndexWriter.MAGIC or record_size != RegionIndexWriter.DTYPE.itemsize:
+            raise ValueError("{} is not a region index of version {}.".format(file_path, RegionIndexWriter.VERSION))
+        # a record being written (e.g., on crash) is ignored
+        num_records = (os.path.getsize(file_path) - RegionIndexWriter.HEADER_BYTES) // record_size
+        self.records: np.ndarray = np.memmap(file_path, dtype=RegionIndexWriter.DTYPE, mode="r",
+                                             offset=RegionIndexWriter.HEADER_BYTES, shape=(num_records,)) \
+            if num_records > 0 else np.zeros(0, dtype=RegionIndexWriter.DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def find_region(self, region_id: int):
+        """
+        Find the record of the region by its id.
+        Returns:
+            record (np.void | None): The record, or `None` if not found in this index.
+        """
+        i = int(np.searchsorted(self.records["region_id"], region_id))
+        if i < len(self.records) and self.records["region_id"][i] == region_id:
+            return self.records[i]
+        return None
+
+    def find_time_range(self, start_sec: float, end_sec: float) -> np.ndarray:
+        """
+        Find records of regions overlapping with the time range from the beginning of the stream.
+        """
+        start_sample = int(start_sec * self.sample_rate)
+        end_sample = int(end_sec * self.sample_rate)
+        # regions are sorted by both start and end
+        first = int(np.searchsorted(self.records["end_sample"], start_sample, side="right"))
+        last = int(np.searchsorted(self.records["start_sample"], end_sample, side="left"))
+        return self.records[first:last]
+
+    def read_samples(self, record, recording_path: str = None) -> np.ndarray:
+        """
+        Read samples of the region from the WAV recording, which has the same name as the index.
+        """
+        if recording_path is None:
+            recording_path = os.path.splitext(self.file_path)[0] + ".wav"
+        wav = np.memmap(recording_path, dtype="<i2", mode="r", offset=44)
+        length = int(record["end_sample"] - record["start_sample"])
+        return np.array(wav[int(record["file_offset"]):int(record["file_offset"]) + length])
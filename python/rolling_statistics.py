@@ -0,0 +1,142 @@
+from collections import deque
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+
+class RollingStatistics:
+    """
+    Mean, standard deviation, min and max over several time windows (e.g., last 10s, 60s and 5min),
+    which are updated in O(1) amortised time per value.
+    Values are kept in one fixed-size ring buffer which is shared by all windows, and each window has
+    its own running sums and monotonic queues for min and max.
+    Args:
+        windows_sec: Durations of windows in seconds.
+        capacity: The number of values which can be kept, i.e., (the longest window) x (values per second).
+    """
+
+    def __init__(self, windows_sec: Sequence[float] = (10.0, 60.0, 300.0), capacity: int = 65536):
+        self.windows_sec: Tuple[float, ...] = tuple(windows_sec)
+        self.capacity: int = int(capacity)
+        self._values: np.ndarray = np.zeros(self.capacity)
+        self._times: np.ndarray = np.zeros(self.capacity)
+        self._seq: int = 0  # sequence number of the next value
+        num = len(self.windows_sec)
+        self._start = [0] * num  # sequence number of the oldest value of each window
+        self._sum = [0.0] * num
+        self._sum_sq = [0.0] * num
+        self._removed = [0] * num  # to recompute sums periodically, since subtraction accumulates errors
+        self._min = [deque() for _ in range(num)]  # (seq, value), whose values are increasing
+        self._max = [deque() for _ in range(num)]  # (seq, value), whose values are decreasing
+
+    def push(self, values: np.ndarray, times: np.ndarray) -> None:
+        """
+        Add values with their times in seconds, which should be in chronological order.
+        """
+        for value, time in zip(np.asarray(values, dtype=np.float64).tolist(),
+                               np.asarray(times, dtype=np.float64).tolist()):
+            index = self._seq % self.capacity
+            if self._seq - self.capacity >= 0:  # the oldest value will be overwritten
+                for w in range(len(self.windows_sec)):
+                    if self._start[w] <= self._seq - self.capacity:
+                        self._remove_oldest(w)
+            self._values[index] = value
+            self._times[index] = time
+            for w in range(len(self.windows_sec)):
+                self._sum[w] += value
+                self._sum_sq[w] += value * value
+                min_queue, max_queue = self._min[w], self._max[w]
+                while min_queue and min_queue[-1][1] >= value:
+                    min_queue.pop()
+                min_queue.append((self._seq, value))
+                while max_queue and max_queue[-1][1] <= value:
+                    max_queue.pop()
+                max_queue.append((self._seq, value))
+            self._seq += 1
+        if len(values) > 0:
+            self.evict(now=float(times[-1]))
+
+    def evict(self, now: float) -> None:
+        """
+        Remove values older than each window. This should be called even when no value is pushed (e.g., silence).
+        """
+        for w, window_sec in enumerate(self.windows_sec):
+            while self._start[w] < self._seq and self._times[self._start[w] % self.capacity] < now - window_sec:
+                self._remove_oldest(w)
+
+    def _remove_oldest(self, w: int) -> None:
+        value = self._values[self._start[w] % self.capacity]
+        self._sum[w] -= value
+        self._sum_sq[w] -= value * value
+        self._start[w] += 1
+        for queue in (self._min[w], self._max[w]):
+            while queue and queue[0][0] < self._start[w]:
+                queue.popleft()
+        self._removed[w] += 1
+        if self._removed[w] >= self.capacity:  # amortised O(1)
+            self._refresh(w)
+
+    def _refresh(self, w: int) -> None:
+        indices = np.arange(self._start[w], self._seq) % self.capacity
+        values = self._values[indices]
+        self._sum[w] = float(np.sum(values))
+        self._sum_sq[w] = float(np.sum(values * values))
+        self._removed[w] = 0
+
+    def get(self, w: int) -> Dict[str, float]:
+        """
+        Statistics of the window, which are `0.0` when the window is empty.
+        Returns:
+            res (Dict[str, float]): `average`, `std`, `min` and `max`.
+        """
+        size = self._seq - self._start[w]
+        if size <= 0:
+            return {"average": 0.0, "std": 0.0, "min": 0.0, "max": 0.0}
+        mean = self._sum[w] / size
+        variance = max(self._sum_sq[w] / size - mean * mean, 0.0)
+        return {"average": mean, "std": variance ** 0.5, "min": self._min[w][0][1], "max": self._max[w][0][1]}
+
+    @staticmethod
+    def window_suffix(window_sec: float) -> str:
+        """
+        Suffix of field names, e.g., `10s` and `5min`.
+        """
+        if window_sec >= 60 and window_sec % 60 == 0:
+            return "{}min".format(int(window_sec // 60))
+        return "{:g}s".format(window_sec)
+
+
+class RunningMoments:
+    """
+    Mean and standard deviation of all values from the beginning, which are updated in O(batch) per push
+    by merging the moments of each batch (Chan et al.), instead of recomputing them over the whole history.
+    """
+
+    def __init__(self):
+        self.count: int = 0
+        self.mean: float = 0.0
+        self._m2: float = 0.0  # sum of squared deviations
+
+    def push(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        if values.size == 0:
+            return
+        batch_mean = float(np.mean(values))
+        batch_m2 = float(np.sum((values - batch_mean) ** 2))
+        count = self.count + values.size
+        delta = batch_mean - self.mean
+        self.mean += delta * values.size / count
+        self._m2 += batch_m2 + delta * delta * self.count * values.size / count
+        self.count = count
+
+    @property
+    def std(self) -> float:
+        return (self._m2 / self.count) ** 0.5 if self.count > 0 else 0.0
+
+    def get_state(self) -> Dict[str, float]:
+        return {"count": self.count, "mean": self.mean, "m2": self._m2}
+
+    def set_state(self, state: Dict[str, float]) -> None:
+        self.count = int(state["count"])
+        self.mean = float(state["mean"])
+        self._m2 = float(state["m2"])
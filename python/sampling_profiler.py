@@ -0,0 +1,172 @@
+import collections
+import os
+import sys
+import threading
+from types import CodeType, FrameType
+from typing import Dict, Iterable, List, Tuple, Union
+
+from util.logger import Logger
+from util.time_measure import TimeMeasure
+
+
+class SamplingProfiler:
+    """
+    Low-overhead sampling profiler of the pipeline, which doesn't trace calls like `cProfile`,
+    but snapshots stacks of the threads (`sys._current_frames()`) at intervals from its own thread.
+    Threads are grouped into roles:
+        capture: the callback of the device (thread of PortAudio), or the replay thread of `FileInputStream`.
+        analysis: the thread of `AudioRuntime` which runs `AudioStream.handle_block()`.
+        publish: the event loop of `AudioRuntime` (the main thread), which publishes with ZeroMQ.
+    Args:
+        interval_sec: Interval of sampling.
+        summary_classes: Classes whose methods are summarized for each function (e.g., `AudioCalculator`).
+    Notes:
+        The thread of PortAudio has Python frames only while calling back, so its samples are the cost of callbacks.
+        Other threads (e.g., logging and heartbeats) aren't sampled.
+    """
+    CALLBACKS = ("audio_callback_numpy", "audio_callback_raw")
+
+    def __init__(self, interval_sec: float = 0.005, summary_classes: Iterable[type] = ()):
+        self.logger = Logger(name=__name__)
+        self.interval_sec = interval_sec
+        self.method_names: Dict[CodeType, str] = self.get_method_names(classes=summary_classes)
+        # (role, code objects from the root) -> the number of samples
+        self.stacks: collections.Counter = collections.Counter()
+        self.sample_count: int = 0
+        self.sampling_sec: float = 0.0  # time spent for sampling, i.e., overhead
+        self.elapsed_sec: float = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Union[threading.Thread, None] = None
+
+    @staticmethod
+    def get_method_names(classes: Iterable[type]) -> Dict[CodeType, str]:
+        """
+        Qualified names of methods (including inherited ones), keyed by their code objects.
+        """
+        names = {}
+        for cls in classes:
+            for owner in cls.__mro__[:-1]:  # except `object`
+                for name, attr in vars(owner).items():
+                    if isinstance(attr, (staticmethod, classmethod)):
+                        attr = attr.__func__
+                    elif isinstance(attr, property):
+                        attr = attr.fget
+                    code = getattr(attr, "__code__", None)
+                    if code is not None:
+                        names.setdefault(code, "{}.{}".format(owner.__name__, name))
+        return names
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        self.logger.logger.info("Sampling profiler started (interval: {} msec).".format(self.interval_sec * 1000))
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        start = TimeMeasure.get_perf_counter()
+        own_ident = threading.get_ident()
+        while not self._stop_event.wait(self.interval_sec):
+            sample_start = TimeMeasure.get_perf_counter()
+            self.sample(own_ident=own_ident)
+            self.sampling_sec += TimeMeasure.get_perf_counter() - sample_start
+        self.elapsed_sec += TimeMeasure.get_perf_counter() - start
+
+    def sample(self, own_ident: int = None) -> None:
+        """
+        Take one snapshot of stacks of the threads.
+        """
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = self.get_stack(frame=frame)
+            role = self.get_role(name=thread_names.get(ident, ""), stack=stack)
+            if role is not None:
+                self.stacks[(role, stack)] += 1
+        self.sample_count += 1
+
+    @staticmethod
+    def get_stack(frame: FrameType) -> Tuple[CodeType, ...]:
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        return tuple(reversed(codes))
+
+    def get_role(self, name: str, stack: Tuple[CodeType, ...]) -> Union[str, None]:
+        if name.startswith("analysis"):
+            return "analysis"
+        if name == "capture" or any(code.co_name in self.CALLBACKS for code in stack):
+            return "capture"
+        if name == "MainThread":
+            return "publish"
+        return None
+
+    def format_code(self, code: CodeType) -> str:
+        if code in self.method_names:
+            return self.method_names[code]
+        module = os.path.splitext(os.path.basename(code.co_filename))[0]
+        return "{}.{}".format(module, getattr(code, "co_qualname", code.co_name))
+
+    def get_collapsed(self) -> List[str]:
+        """
+        Stacks in the collapsed format (e.g., `analysis;frame_a;frame_b 12`), which flamegraph tools read.
+        """
+        lines = collections.Counter()
+        for (role, stack), count in self.stacks.items():
+            lines[";".join([role] + [self.format_code(code).replace(";", ":") for code in stack])] += count
+        return ["{} {}".format(line, count) for line, count in sorted(lines.items())]
+
+    def get_summary(self) -> List[Tuple[str, str, int, int]]:
+        """
+        Samples of summarized methods for each role.
+        Returns:
+            rows (List[Tuple[str, str, int, int]]): Role, method, total samples (the method is on the stack) and
+            own samples (the method is the innermost one of summarized methods), in descending order of total.
+        """
+        total = collections.Counter()
+        own = collections.Counter()
+        for (role, stack), count in self.stacks.items():
+            methods = [self.method_names[code] for code in stack if code in self.method_names]
+            for method in set(methods):  # once for recursive calls
+                total[(role, method)] += count
+            if methods:
+                own[(role, methods[-1])] += count
+        return sorted(((role, method, count, own[(role, method)]) for (role, method), count in total.items()),
+                      key=lambda row: (row[0], -row[2], row[1]))
+
+    def get_role_counts(self) -> Dict[str, int]:
+        counts = collections.Counter()
+        for (role, _), count in self.stacks.items():
+            counts[role] += count
+        return dict(counts)
+
+    def write(self, path_prefix: str) -> None:
+        """
+        Write `<path_prefix>.collapsed` for flamegraphs and `<path_prefix>.txt` of the summary.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path_prefix)), exist_ok=True)
+        with open(path_prefix + ".collapsed", "w") as f:
+            f.write("\n".join(self.get_collapsed()) + "\n")
+        overhead = self.sampling_sec / self.elapsed_sec * 100 if self.elapsed_sec > 0 else 0.0
+        lines = ["{} samples in {:.1f} sec (interval: {} msec, overhead: {:.2f} %)".format(
+            self.sample_count, self.elapsed_sec, self.interval_sec * 1000, overhead)]
+        for role, count in sorted(self.get_role_counts().items()):
+            lines.append("{:<10} {:>8} samples ({:.1f} %)".format(role, count, count / max(self.sample_count, 1) * 100))
+        lines.append("")
+        lines.append("{:<10} {:<56} {:>10} {:>10} {:>10}".format("role", "method", "total", "own", "own msec"))
+        # actual period, which is longer than the interval by the sampling itself
+        period_sec = self.elapsed_sec / self.sample_count if self.sample_count > 0 else self.interval_sec
+        for role, method, count, own_count in self.get_summary():
+            lines.append("{:<10} {:<56} {:>10} {:>10} {:>10.1f}".format(
+                role, method, count, own_count, own_count * period_sec * 1000))
+        with open(path_prefix + ".txt", "w") as f:
+            f.write("\n".join(lines) + "\n")
+        self.logger.logger.info("Profile is written into {}.collapsed and .txt:\n{}".format(
+            path_prefix, "\n".join(lines[:len(self.get_role_counts()) + 1])))
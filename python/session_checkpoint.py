@@ -0,0 +1,150 @@
+import json
+import os
+import struct
+import threading
+import zlib
+from typing import Any, Dict, Union
+
+import numpy as np
+
+from util.exception import CheckpointException
+from util.logger import Logger
+from util.time_measure import TimeMeasure
+
+
+class SessionCheckpoint:
+    """
+    Periodic checkpoint of accumulators of the session (e.g., `*_total` fields), so that a restarted process
+    resumes them without re-analysing the recording.
+    The state is a flat dict of scalars and arrays, which is packed into one numpy record, and written
+    on a background thread into a temporary file, then renamed over the checkpoint (`os.replace()`),
+    so that the checkpoint is always complete even if the process dies while writing.
+    Args:
+        file_path: Path of the checkpoint.
+        interval_sec: Interval of checkpoints.
+    Notes:
+        The layout of the file is `[header (16 bytes)][dtype (JSON)][record]`, and the header is
+        `[magic (4s), version (uint32), size of dtype (uint32), crc32 of dtype and record (uint32)]`.
+        The dtype is stored with the record, so that fields added later are just missing in older checkpoints.
+    """
+    MAGIC: bytes = b"VACP"
+    VERSION: int = 1
+    HEADER_FORMAT: str = "<4sIII"
+    HEADER_BYTES: int = struct.calcsize(HEADER_FORMAT)
+
+    def __init__(self, file_path: str, interval_sec: float = 10.0):
+        self.logger = Logger(name=__name__)
+        self.file_path = file_path
+        self.interval_sec = interval_sec
+        self.last_saved: float = TimeMeasure.get_perf_counter()
+        self.saved_count: int = 0
+        # only the latest state is written, if the writer falls behind
+        self._pending: Union[Dict[str, Any], None] = None
+        self._condition = threading.Condition()
+        self._is_closed: bool = False
+        self._thread = threading.Thread(target=self._run, name="checkpoint", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def encode(cls, state: Dict[str, Any]) -> bytes:
+        """
+        Pack the state (scalars and arrays) into bytes of the checkpoint.
+        """
+        values = {name: np.asarray(value) for name, value in state.items()}
+        fields = [[name, value.dtype.str, list(value.shape)] for name, value in values.items()]
+        record = np.zeros(1, dtype=np.dtype([(name, dtype, tuple(shape)) for name, dtype, shape in fields]))
+        for name, value in values.items():
+            record[name] = value
+        descr = json.dumps(fields).encode("ascii")
+        payload = descr + record.tobytes()
+        return struct.pack(cls.HEADER_FORMAT, cls.MAGIC, cls.VERSION, len(descr), zlib.crc32(payload)) + payload
+
+    @classmethod
+    def decode(cls, data: bytes) -> Dict[str, Any]:
+        """
+        Unpack bytes of the checkpoint into the state.
+        """
+        if len(data) < cls.HEADER_BYTES:
+            raise CheckpointException("Checkpoint is truncated.")
+        magic, version, descr_bytes, crc = struct.unpack(cls.HEADER_FORMAT, data[:cls.HEADER_BYTES])
+        payload = data[cls.HEADER_BYTES:]
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise CheckpointException("Unknown checkpoint (magic: {}, version: {}).".format(magic, version))
+        if zlib.crc32(payload) != crc:
+            raise CheckpointException("Checkpoint is corrupted.")
+        fields = json.loads(payload[:descr_bytes])
+        record = np.frombuffer(payload[descr_bytes:], dtype=np.dtype(
+            [(name, dtype, tuple(shape)) for name, dtype, shape in fields]), count=1)
+        return {name: record[name][0] for name, _, _ in fields}
+
+    @classmethod
+    def load(cls, file_path: str) -> Union[Dict[str, Any], None]:
+        """
+        Read the state of the checkpoint.
+        Returns:
+            state (Union[Dict[str, Any], None]): The state, or `None` if the checkpoint doesn't exist or is invalid.
+        """
+        logger = Logger(name=__name__)
+        if not os.path.exists(file_path):
+            logger.logger.info("No checkpoint to resume: {}".format(file_path))
+            return None
+        try:
+            with open(file_path, "rb") as f:
+                return cls.decode(f.read())
+        except CheckpointException:
+            logger.logger.exception("Checkpoint {} can't be resumed.".format(file_path))
+            return None
+
+    def is_due(self) -> bool:
+        return TimeMeasure.get_perf_counter() - self.last_saved >= self.interval_sec
+
+    def save(self, state: Dict[str, Any]) -> None:
+        """
+        Hand the state to the writer thread. This never waits for the disk.
+        """
+        self.last_saved = TimeMeasure.get_perf_counter()
+        with self._condition:
+            self._pending = state
+            self._condition.notify()
+
+    def write(self, state: Dict[str, Any]) -> None:
+        """
+        Write the state atomically, i.e., into a temporary file which replaces the checkpoint.
+        """
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_path = self.file_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(self.encode(state))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.file_path)
+        self.saved_count += 1
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None and not self._is_closed:
+                    self._condition.wait()
+                state, self._pending = self._pending, None
+                if state is None:  # closed
+                    return
+            try:
+                self.write(state)
+            except OSError:
+                self.logger.logger.exception("Failed to write checkpoint {}.".format(self.file_path))
+
+    def close(self, state: Dict[str, Any] = None) -> None:
+        """
+        Write the last state (if given) and stop the writer thread. Calling this again does nothing.
+        """
+        if self._is_closed:
+            return
+        if state is not None:
+            self.save(state=state)
+        with self._condition:
+            self._is_closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.logger.logger.info("Checkpoint is saved into {} ({} times).".format(self.file_path, self.saved_count))
@@ -0,0 +1,111 @@
+from multiprocessing import shared_memory
+from typing import Tuple
+
+import numpy as np
+
+from util.shared_memory import attach_shared_memory
+
+
+class RingBuffer:
+    """
+    Ring buffer of samples with a write cursor, which doesn't roll the whole buffer for each write.
+    Attributes:
+        self.capacity (int): The number of samples (rows) which can be kept.
+        self.channels (int): The number of channels (columns).
+    Notes:
+        The memory layout is `[write cursor (int64)][data (capacity x channels)]`.
+        The write cursor counts all of written samples, so readers can find out how many samples are new.
+    """
+    HEADER_BYTES: int = 8
+
+    def __init__(self, capacity: int, channels: int = 1, dtype=np.float32, buffer=None):
+        self.capacity: int = int(capacity)
+        self.channels: int = int(channels)
+        self.dtype = np.dtype(dtype)
+        if buffer is None:  # local (not shared) buffer
+            buffer = bytearray(RingBuffer.calc_size(capacity=capacity, channels=channels, dtype=dtype))
+        self._cursor = np.ndarray((1,), dtype=np.int64, buffer=buffer, offset=0)
+        self._data = np.ndarray((self.capacity, self.channels), dtype=self.dtype, buffer=buffer,
+                                offset=self.HEADER_BYTES)
+
+    @staticmethod
+    def calc_size(capacity: int, channels: int = 1, dtype=np.float32) -> int:
+        return RingBuffer.HEADER_BYTES + int(capacity) * int(channels) * np.dtype(dtype).itemsize
+
+    @property
+    def cursor(self) -> int:
+        return int(self._cursor[0])
+
+    def write(self, data: np.ndarray) -> None:
+        """
+        Write samples after the latest ones.
+        Args:
+            data (np.ndarray): Samples whose shape is (n, channels) or (n,).
+        """
+        data = np.asarray(data).reshape(-1, self.channels)
+        if len(data) > self.capacity:  # only the latest ones can be kept
+            data = data[-self.capacity:]
+        n = len(data)
+        cursor = self.cursor
+        start = cursor % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = data[:first]
+        if first < n:  # wrap around
+            self._data[:n - first] = data[first:]
+        # publish after writing data
+        self._cursor[0] = cursor + n
+
+    def read_latest(self, length: int = None) -> Tuple[int, np.ndarray]:
+        """
+        Read the latest samples in chronological order.
+        Args:
+            length: The number of samples to read (all of them when `None`).
+        Returns:
+            cursor (int): The write cursor when reading.
+            res (np.ndarray): Copied samples whose shape is (length, channels).
+        """
+        length = self.capacity if length is None else min(int(length), self.capacity)
+        cursor = self.cursor
+        end = cursor % self.capacity
+        if end >= length:
+            res = self._data[end - length:end].copy()
+        else:
+            res = np.concatenate([self._data[self.capacity - (length - end):], self._data[:end]])
+        return cursor, res
+
+
+class SharedRingBuffer(RingBuffer):
+    """
+    `RingBuffer` on `multiprocessing.shared_memory`, which is written by one process and read by others.
+    Notes:
+        Readers don't lock the writer, so that a sample being overwritten while reading may be torn,
+        which is acceptable for plotting.
+    """
+
+    def __init__(self, capacity: int, channels: int = 1, dtype=np.float32, name: str = None, create: bool = True):
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True,
+                                                   size=RingBuffer.calc_size(capacity=capacity, channels=channels,
+                                                                             dtype=dtype))
+        else:
+            self._shm = attach_shared_memory(name=name)
+        super().__init__(capacity=capacity, channels=channels, dtype=dtype, buffer=self._shm.buf)
+        if create:
+            self._cursor[0] = 0
+            self._data[:] = 0
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def close(self) -> None:
+        # views should be released before closing the shared memory
+        self._cursor = None
+        self._data = None
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """
+        Release the shared memory. This should be called only by the creator.
+        """
+        self._shm.unlink()
@@ -0,0 +1,135 @@
+import math
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from audio_kernels import calc_envelope_peaks_kernel
+from rolling_statistics import RunningMoments
+
+
+class SpeechTimeline:
+    """
+    Pause and speed features of the session, which are updated incrementally from VAD events (voiced regions)
+    and the envelope (dB of voiced frames), without touching stored audio.
+        pause: Gaps between voiced regions longer than `min_pause_sec` (shorter ones are within speech).
+        voiced/unvoiced ratio: Voiced time over unvoiced time of the session.
+        syllable: Peaks of the smoothed envelope which rise and fall by `prominence_db` (see `audio_kernels`).
+            Articulation rate is syllables per voiced second, and speech rate also counts pauses.
+    Args:
+        min_pause_sec: The shortest gap to be a pause.
+        prominence_db: Rise and fall of dB around a nucleus of syllable.
+        min_syllable_sec: The shortest interval between nuclei.
+        smoothing_sec: Time constant of the exponential smoothing of the envelope.
+    Attributes:
+        FIELDS (List[Tuple[str, str]]): Fields and dtypes, which are added into `FeatureRecord`.
+        ENVELOPE_FIELDS (Tuple[str, ...]): Fields which need the envelope (i.e., `rms` of `AudioStream`).
+    """
+    FIELDS: List[Tuple[str, str]] = [
+        ("total_pause_num", "<i8"),
+        ("last_pause_ms", "<f8"),
+        ("current_pause_ms", "<f8"),
+        ("average_pause_ms_total", "<f8"),
+        ("std_pause_ms_total", "<f8"),
+        ("max_pause_ms_total", "<f8"),
+        ("voiced_unvoiced_ratio_total", "<f8"),
+        ("total_syllable_num", "<i8"),
+        ("articulation_rate_total", "<f8"),
+        ("speech_rate_total", "<f8"),
+    ]
+    ENVELOPE_FIELDS: Tuple[str, ...] = ("total_syllable_num", "articulation_rate_total", "speech_rate_total")
+
+    def __init__(self, min_pause_sec: float = 0.2, prominence_db: float = 2.0, min_syllable_sec: float = 0.1,
+                 smoothing_sec: float = 0.02):
+        self.min_pause_sec = min_pause_sec
+        self.prominence_db = prominence_db
+        self.min_syllable_sec = min_syllable_sec
+        self.smoothing_sec = smoothing_sec
+        # pauses
+        self.pause_ms_moments: RunningMoments = RunningMoments()
+        self.last_pause_ms: float = 0.0
+        self.max_pause_ms: float = 0.0
+        self.last_voiced_end_sec: Union[float, None] = None  # end of the last voiced region
+        # voiced and elapsed time
+        self.voiced_sec: float = 0.0
+        self.elapsed_sec: float = 0.0
+        self.now_sec: float = 0.0
+        # syllables
+        self.syllable_num: int = 0
+        self.envelope_sec: float = 0.0  # voiced time whose envelope is analysed
+        self.peak_state: np.ndarray = np.array([0.0, 0.0, 0.0, 0.0, 0.0, -np.inf, np.nan])
+
+    def push_regions(self, starts_sec: np.ndarray, ends_sec: np.ndarray, block_start_sec: float,
+                     block_end_sec: float) -> None:
+        """
+        Update pauses and voiced time with voiced regions of a block.
+        Args:
+            starts_sec: Starts of regions from the beginning of the stream, in order.
+            ends_sec: Ends of regions.
+            block_start_sec: Start of the block.
+            block_end_sec: End of the block.
+        """
+        for start, end in zip(starts_sec.tolist(), ends_sec.tolist()):
+            if self.last_voiced_end_sec is not None and start - self.last_voiced_end_sec >= self.min_pause_sec:
+                self.last_pause_ms = (start - self.last_voiced_end_sec) * 1000
+                self.max_pause_ms = max(self.max_pause_ms, self.last_pause_ms)
+                self.pause_ms_moments.push(values=np.array([self.last_pause_ms]))
+            self.last_voiced_end_sec = end
+        self.voiced_sec += float(np.sum(ends_sec - starts_sec))
+        self.elapsed_sec += block_end_sec - block_start_sec
+        self.now_sec = block_end_sec
+
+    def push_envelope(self, rms_db: np.ndarray, times: np.ndarray, frame_period_sec: float) -> None:
+        """
+        Count syllables in dB of voiced frames, which continues over blocks.
+        Args:
+            rms_db: dB of voiced frames.
+            times: Times of the frames.
+            frame_period_sec: Period of frames, e.g., `hop_length / sample_rate`.
+        """
+        alpha = 1.0 - math.exp(-frame_period_sec / self.smoothing_sec)
+        self.syllable_num += int(calc_envelope_peaks_kernel(
+            np.ascontiguousarray(rms_db, dtype=np.float64), np.ascontiguousarray(times, dtype=np.float64),
+            self.peak_state, alpha, self.prominence_db, self.min_syllable_sec, 1.5 * frame_period_sec))
+        self.envelope_sec += len(rms_db) * frame_period_sec
+
+    def get_state(self) -> Dict[str, float]:
+        """
+        Accumulators of the session, e.g., for `SessionCheckpoint`.
+        Times relative to the stream (e.g., the end of the last region) and the detector of peaks aren't included,
+        since the stream restarts from zero.
+        """
+        return dict({"pause_ms_" + key: value for key, value in self.pause_ms_moments.get_state().items()},
+                    last_pause_ms=self.last_pause_ms, max_pause_ms=self.max_pause_ms, voiced_sec=self.voiced_sec,
+                    elapsed_sec=self.elapsed_sec, syllable_num=self.syllable_num, envelope_sec=self.envelope_sec)
+
+    def set_state(self, state: Dict[str, float]) -> None:
+        self.pause_ms_moments.set_state({key: state["pause_ms_" + key] for key in ("count", "mean", "m2")})
+        self.last_pause_ms = float(state["last_pause_ms"])
+        self.max_pause_ms = float(state["max_pause_ms"])
+        self.voiced_sec = float(state["voiced_sec"])
+        self.elapsed_sec = float(state["elapsed_sec"])
+        self.syllable_num = int(state["syllable_num"])
+        self.envelope_sec = float(state["envelope_sec"])
+
+    def get(self) -> Dict[str, float]:
+        """
+        Values of `FIELDS`.
+        """
+        unvoiced_sec = self.elapsed_sec - self.voiced_sec
+        articulation_rate = self.syllable_num / self.envelope_sec if self.envelope_sec > 0 else 0.0
+        # speaking time includes pauses between voiced regions
+        pause_sec = self.pause_ms_moments.count * self.pause_ms_moments.mean / 1000
+        speaking_sec = self.voiced_sec + pause_sec
+        return {
+            "total_pause_num": self.pause_ms_moments.count,
+            "last_pause_ms": self.last_pause_ms,
+            "current_pause_ms": (self.now_sec - self.last_voiced_end_sec) * 1000
+            if self.last_voiced_end_sec is not None else 0.0,
+            "average_pause_ms_total": self.pause_ms_moments.mean,
+            "std_pause_ms_total": self.pause_ms_moments.std,
+            "max_pause_ms_total": self.max_pause_ms,
+            "voiced_unvoiced_ratio_total": self.voiced_sec / unvoiced_sec if unvoiced_sec > 0 else 0.0,
+            "total_syllable_num": self.syllable_num,
+            "articulation_rate_total": articulation_rate,
+            "speech_rate_total": articulation_rate * self.voiced_sec / speaking_sec if speaking_sec > 0 else 0.0,
+        }
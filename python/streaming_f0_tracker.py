@@ -0,0 +1,113 @@
+from typing import Callable, List, Union
+
+import numpy as np
+
+from util.logger import Logger
+
+
+class StreamingF0Tracker:
+    """
+    Estimate f0 of an utterance incrementally in short windows as audio arrives, instead of the whole region at once.
+    Each window is analysed with `context_sec` of audio before it and `lookahead_sec` after it,
+    and only frames inside the window are emitted, so that frames match the whole-region estimation
+    except for the estimator's global smoothing beyond the context.
+    Frames are on the grid of the utterance (`k * frame_period_sec` from its beginning) like whole-region estimators.
+    Args:
+        sample_rate: Sample rate of the audio.
+        window_sec: Duration of frames emitted by each analysis.
+        context_sec: Audio kept before each window for the analysis window of estimators (about 4 periods of C2).
+        lookahead_sec: Audio needed after each window, which delays the emission.
+    """
+
+    def __init__(self, sample_rate: int, window_sec: float = 1.0, context_sec: float = 0.1,
+                 lookahead_sec: float = 0.1):
+        self.logger = Logger(name=__name__)
+        self.sample_rate = sample_rate
+        self.window_sec = window_sec
+        self.context_sec = context_sec
+        self.lookahead_sec = lookahead_sec
+        self.estimate: Union[Callable[[np.ndarray], np.ndarray], None] = None
+        self.frame_period_sec: float = 0.005
+        self.start_sec: float = 0.0  # time of the beginning of the utterance
+        self.buffer: np.ndarray = np.array([])
+        self.buffer_start: int = 0  # sample of the utterance at the head of `self.buffer`
+        self.total_samples: int = 0  # samples of the utterance pushed so far
+        self.next_frame: int = 0  # frame of the utterance which will be emitted next
+
+    @property
+    def is_active(self) -> bool:
+        return self.estimate is not None
+
+    @property
+    def next_frame_sec(self) -> float:
+        """
+        Time of the frame which will be emitted next.
+        """
+        return self.start_sec + self.next_frame * self.frame_period_sec
+
+    def reset(self, estimate: Callable[[np.ndarray], np.ndarray], frame_period_sec: float, start_sec: float = 0.0
+              ) -> None:
+        """
+        Start a new utterance.
+        Args:
+            estimate: f0 estimator of a segment, which returns frames at `k * frame_period_sec` from its beginning.
+            frame_period_sec: Period of frames of `estimate`.
+            start_sec: Time of the beginning of the utterance.
+        """
+        self.estimate = estimate
+        self.frame_period_sec = frame_period_sec
+        self.start_sec = start_sec
+        self.buffer = np.array([])
+        self.buffer_start = 0
+        self.total_samples = 0
+        self.next_frame = 0
+
+    def _frame_to_sample(self, frame: int) -> int:
+        return int(round(frame * self.frame_period_sec * self.sample_rate))
+
+    def _to_frames(self, seconds: float) -> int:
+        return max(int(round(seconds / self.frame_period_sec)), 1)
+
+    def push(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Append audio of the utterance.
+        Returns:
+            f0 (np.ndarray): Frames which got their lookahead, from `self.next_frame` (before pushing).
+        """
+        self.buffer = np.concatenate([self.buffer, samples]) if len(self.buffer) > 0 else samples
+        self.total_samples += len(samples)
+        window_frames = self._to_frames(self.window_sec)
+        lookahead = int(round(self.lookahead_sec * self.sample_rate))
+        contours: List[np.ndarray] = [np.array([])]
+        while self._frame_to_sample(self.next_frame + window_frames) + lookahead <= self.total_samples:
+            end_frame = self.next_frame + window_frames
+            contours.append(self._analyse(end_frame=end_frame, end_sample=self._frame_to_sample(end_frame) + lookahead))
+        return np.concatenate(contours)
+
+    def flush(self) -> np.ndarray:
+        """
+        Emit the remaining frames without lookahead, e.g., at the end of a region.
+        The context is kept, so that the utterance can be continued by `push()` (e.g., in the next block).
+        Returns:
+            f0 (np.ndarray): Frames up to the end of audio pushed so far (inclusive, as whole-region estimators).
+        """
+        end_frame = int(np.floor(self.total_samples / (self.frame_period_sec * self.sample_rate))) + 1
+        if end_frame <= self.next_frame:
+            return np.array([])
+        return self._analyse(end_frame=end_frame, end_sample=self.total_samples)
+
+    def _analyse(self, end_frame: int, end_sample: int) -> np.ndarray:
+        # the segment starts on the frame grid, so that its frames are the ones of the utterance
+        first_frame = max(self.next_frame - self._to_frames(self.context_sec), 0)
+        start_sample = max(self._frame_to_sample(first_frame), self.buffer_start)
+        f0 = np.asarray(self.estimate(self.buffer[start_sample - self.buffer_start:end_sample - self.buffer_start]))
+        f0 = f0[self.next_frame - first_frame:end_frame - first_frame]
+        if len(f0) < end_frame - self.next_frame:  # estimators may drop the last frame of segments
+            f0 = np.concatenate([f0, np.zeros(end_frame - self.next_frame - len(f0))])
+        self.next_frame = end_frame
+        # keep only the context of the next window
+        keep_from = self._frame_to_sample(max(self.next_frame - self._to_frames(self.context_sec), 0))
+        if keep_from > self.buffer_start:
+            self.buffer = self.buffer[keep_from - self.buffer_start:]
+            self.buffer_start = keep_from
+        return f0
@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+from scipy import signal
+
+
+class StreamingResampler:
+    """
+    Stateful polyphase resampler, which converts blocks of the device-native rate into the analysis rate.
+    Since the last input samples are kept as the history for the next block, there are no artefacts
+    at the boundaries of blocks, i.e., the output is the same as resampling the whole stream at once
+    (delayed by the half length of the filter).
+    Args:
+        input_rate: Sample rate of input blocks.
+        output_rate: Sample rate of output blocks.
+        half_taps: The number of zero crossings of the low-pass filter on each side.
+        rolloff: Cutoff of the low-pass filter relative to the lower Nyquist frequency.
+        beta: Parameter of kaiser window.
+    Notes:
+        Output `y[n]` is `sum_j H[p, j] * x[q - j]` where `t = n * down`, `p = t % up`, `q = t // up`,
+        and `H[p, j] = h[p + j * up]` is the polyphase decomposition of the filter `h`.
+    """
+
+    def __init__(self, input_rate: int, output_rate: int, half_taps: int = 16, rolloff: float = 0.95,
+                 beta: float = 5.0, chunk_size: int = 4096):
+        self.input_rate = int(input_rate)
+        self.output_rate = int(output_rate)
+        gcd = math.gcd(self.input_rate, self.output_rate)
+        self.up: int = self.output_rate // gcd
+        self.down: int = self.input_rate // gcd
+        self.chunk_size = chunk_size
+        # low-pass filter of the up sampled rate
+        num_taps = 2 * half_taps * max(self.up, self.down) + 1
+        h = signal.firwin(num_taps, cutoff=rolloff / max(self.up, self.down), window=("kaiser", beta)) * self.up
+        # polyphase decomposition, whose shape is (up, taps_per_phase)
+        self.taps_per_phase: int = -(-num_taps // self.up)
+        h = np.concatenate([h, np.zeros(self.taps_per_phase * self.up - num_taps)])
+        self.polyphase: np.ndarray = h.reshape(self.taps_per_phase, self.up).T.copy()
+        self.delay_sec: float = (num_taps - 1) / 2 / (self.up * self.input_rate)
+        self.reset()
+
+    @property
+    def is_bypass(self) -> bool:
+        return self.up == self.down
+
+    def reset(self) -> None:
+        self.history: np.ndarray = np.zeros(self.taps_per_phase - 1)
+        self.input_count: int = 0  # global index of the first sample of the next block
+        self.output_count: int = 0  # global index of the next output
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """
+        Resample a block, keeping the history for the next one.
+        Args:
+            block (np.ndarray): Samples of a channel whose shape is (n,) or (n, 1).
+        Returns:
+            res (np.ndarray): Resampled samples whose dtype is the same as `block`.
+        """
+        block = np.asarray(block).reshape(-1)
+        if self.is_bypass:
+            return block
+        buffer = np.concatenate([self.history, block.astype(np.float64)])
+        base = self.input_count - (self.taps_per_phase - 1)  # global index of `buffer[0]`
+        last = self.input_count + len(block) - 1
+        # outputs whose all inputs are available, i.e., `q <= last`
+        output_end = -(-(last + 1) * self.up // self.down)
+        res = np.empty(output_end - self.output_count)
+        taps = np.arange(self.taps_per_phase)
+        for start in range(0, len(res), self.chunk_size):
+            n = np.arange(self.output_count + start, min(self.output_count + start + self.chunk_size, output_end))
+            t = n * self.down
+            q = t // self.up - base
+            res[start:start + len(n)] = np.einsum("ij,ij->i", self.polyphase[t % self.up],
+                                                  buffer[q[:, None] - taps[None, :]])
+        self.history = buffer[len(buffer) - (self.taps_per_phase - 1):]
+        self.input_count += len(block)
+        self.output_count = output_end
+        if np.issubdtype(block.dtype, np.integer):
+            info = np.iinfo(block.dtype)
+            return np.clip(np.round(res), info.min, info.max).astype(block.dtype)
+        return res.astype(block.dtype)
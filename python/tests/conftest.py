@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# modules of the package import each other by top-level names (e.g., `from util.logger import Logger`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def stop_logger():
+    """
+    Write queued records while the output of pytest is still open, instead of when exiting.
+    """
+    yield
+    from util.logger import Logger
+    Logger.stop()
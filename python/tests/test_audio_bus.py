@@ -0,0 +1,60 @@
+import os
+import subprocess
+import sys
+import uuid
+
+import numpy as np
+import pytest
+
+from audio_bus import AudioBus, AudioBusReader
+from util.exception import SharedMemoryInUseException
+
+
+@pytest.fixture
+def bus():
+    bus = AudioBus(name="test_bus_{}".format(uuid.uuid4().hex[:8]), num_slots=4, block_size=8)
+    yield bus
+    bus.close()
+    bus.unlink()
+
+
+def test_blocks_are_read_in_order(bus):
+    reader = AudioBusReader(name=bus.name)
+    for i in range(3):
+        bus.publish(np.full(8, i, dtype=np.int16))
+    blocks = reader.read()
+    assert [seq for seq, _ in blocks] == [0, 1, 2]
+    assert [int(block[0, 0]) for _, block in blocks] == [0, 1, 2]
+    reader.close()
+
+
+def test_overrun_is_counted(bus):
+    reader = AudioBusReader(name=bus.name)
+    for i in range(7):
+        bus.publish(np.full(8, i, dtype=np.int16))
+    blocks = reader.read()
+    assert reader.overrun_count == 4
+    assert [seq for seq, _ in blocks] == [4, 5, 6]
+    reader.close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="shared memory on Windows is released with its last handle")
+def test_bus_of_running_writer_is_kept(bus):
+    with pytest.raises(SharedMemoryInUseException):
+        AudioBus(name=bus.name, num_slots=4, block_size=8)
+    # the first bus still works for its readers
+    reader = AudioBusReader(name=bus.name)
+    bus.publish(np.ones(8, dtype=np.int16))
+    assert len(reader.read()) == 1
+    reader.close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="shared memory on Windows is released with its last handle")
+def test_bus_of_crashed_writer_is_recreated(bus):
+    process = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    bus._header[5] = int(process.stdout)  # the writer has exited
+    bus.publish(np.ones(8, dtype=np.int16))
+    recreated = AudioBus(name=bus.name, num_slots=4, block_size=8)
+    assert recreated.write_seq == 0
+    assert int(recreated._header[5]) == os.getpid()
+    recreated.close()
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("librosa")
+pytest.importorskip("pyworld")
+
+from audio_calculator import AudioCalculator  # noqa: E402
+
+HOP_LENGTH = 128
+
+
+@pytest.fixture(scope="module")
+def audio_calculator():
+    return AudioCalculator()
+
+
+def expected_segments(num_frames: int, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    segment_ids = np.full(num_frames, -1)
+    for j in range(num_frames):
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            if start <= j * HOP_LENGTH < end:
+                segment_ids[j] = i
+    return segment_ids
+
+
+@pytest.mark.parametrize("starts, ends", [
+    ([], []),
+    ([0], [16000]),
+    ([100, 3000, 8192], [2000, 3001, 20000]),  # a region without frames, and the last beyond the block
+    ([128, 256], [256, 512]),  # adjacent regions on frame centers
+])
+def test_frame_segments_match_loop(audio_calculator, starts, ends):
+    starts, ends = np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+    num_frames = 16000 // HOP_LENGTH + 1
+    segment_ids = audio_calculator.calc_frame_segments(num_frames=num_frames, hop_length=HOP_LENGTH, starts=starts,
+                                                       ends=ends)
+    np.testing.assert_array_equal(segment_ids, expected_segments(num_frames=num_frames, starts=starts, ends=ends))
+
+
+def test_segment_moments_match_numpy(audio_calculator):
+    rng = np.random.default_rng(0)
+    num_segments = 5
+    values = rng.normal(loc=60.0, scale=5.0, size=1000)
+    segment_ids = rng.integers(low=-1, high=num_segments, size=values.size)
+    segment_ids[segment_ids == 3] = -1  # an empty segment
+    counts, means, stds = audio_calculator.calc_segment_moments(values=values, segment_ids=segment_ids,
+                                                                num_segments=num_segments)
+    for i in range(num_segments):
+        selected = values[segment_ids == i]
+        assert counts[i] == selected.size
+        if selected.size == 0:
+            assert np.isnan(means[i]) and np.isnan(stds[i])
+        else:
+            assert means[i] == pytest.approx(np.mean(selected), rel=1e-12)
+            assert stds[i] == pytest.approx(np.std(selected), rel=1e-9)
+
+
+def test_segment_moments_of_frames(audio_calculator):
+    # moments of frames in each region equal those of the slices of the frames
+    values = np.linspace(-50.0, -10.0, 126)
+    starts, ends = np.array([0, 4000, 9000]), np.array([1000, 8000, 9001])
+    segment_ids = audio_calculator.calc_frame_segments(num_frames=values.size, hop_length=HOP_LENGTH, starts=starts,
+                                                       ends=ends)
+    counts, means, stds = audio_calculator.calc_segment_moments(values=values, segment_ids=segment_ids,
+                                                                num_segments=starts.size)
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        frames = values[-(-start // HOP_LENGTH):-(-end // HOP_LENGTH)]
+        assert counts[i] == frames.size
+        if frames.size > 0:
+            assert means[i] == pytest.approx(np.mean(frames))
+            assert stds[i] == pytest.approx(np.std(frames), abs=1e-9)
+    assert counts[2] == 0  # no frame center in [9000, 9001)
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+import audio_kernels
+from audio_kernels import (_f0_moments_loop, _f0_moments_numpy, _rms_db_loop, _rms_db_numpy, calc_f0_moments_kernel,
+                           calc_rms_db_kernel)
+
+librosa = pytest.importorskip("librosa")
+
+RMS_KERNELS = [calc_rms_db_kernel, _rms_db_loop, _rms_db_numpy]
+F0_KERNELS = [calc_f0_moments_kernel, _f0_moments_loop, _f0_moments_numpy]
+
+
+def make_magnitude(n_fft: int, dtype=np.float32) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    audio = (0.1 * rng.normal(size=16000)).astype(dtype)
+    audio[4000:6000] = 0.0  # digital silence
+    return np.abs(librosa.stft(y=audio, n_fft=n_fft, hop_length=128))
+
+
+@pytest.mark.parametrize("kernel", RMS_KERNELS)
+@pytest.mark.parametrize("n_fft", [512, 511])
+def test_rms_db_matches_librosa(kernel, n_fft):
+    magnitude = make_magnitude(n_fft=n_fft)
+    rms, rms_db = kernel(magnitude, n_fft)
+    expected = librosa.feature.rms(S=magnitude, frame_length=n_fft)
+    assert rms.shape == rms_db.shape == expected.shape
+    assert rms.dtype == rms_db.dtype == np.float32
+    np.testing.assert_allclose(rms, expected, rtol=1e-4, atol=1e-9)
+    is_silent = expected[0] == 0.0
+    assert np.any(is_silent)
+    assert np.all(rms_db[0, is_silent] == -np.inf)
+    expected_db = librosa.amplitude_to_db(expected[:, ~is_silent], ref=1.0, amin=1e-10, top_db=None)
+    np.testing.assert_allclose(rms_db[:, ~is_silent], expected_db, rtol=0, atol=1e-3)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_rms_db_kernel_matches_numpy_fallback(dtype):
+    magnitude = make_magnitude(n_fft=512, dtype=dtype)
+    rms, rms_db = calc_rms_db_kernel(magnitude, 512)
+    expected, expected_db = _rms_db_numpy(magnitude.copy(), 512)
+    tolerance = 1e-5 if dtype == np.float32 else 1e-12
+    np.testing.assert_allclose(rms, expected, rtol=tolerance)
+    np.testing.assert_allclose(rms_db, expected_db, rtol=0, atol=tolerance * 100)
+
+
+def make_f0() -> np.ndarray:
+    rng = np.random.default_rng(1)
+    f0 = rng.normal(loc=150.0, scale=20.0, size=1001)
+    f0[::7] = 0.0  # unvoiced of Harvest and DIO
+    f0[3::11] = np.nan  # unvoiced of pYIN
+    return f0
+
+
+@pytest.mark.parametrize("kernel", F0_KERNELS)
+def test_f0_moments_match_nan_functions(kernel):
+    f0 = make_f0()
+    original = f0.copy()
+    count, mean, std = kernel(f0)
+    voiced = np.where(f0 > 0.0, f0, np.nan)
+    assert count == np.count_nonzero(~np.isnan(voiced))
+    assert mean == pytest.approx(np.nanmean(voiced), rel=1e-12)
+    assert std == pytest.approx(np.nanstd(voiced), rel=1e-10)
+    np.testing.assert_array_equal(f0, original)  # not mutated, including NaN
+
+
+@pytest.mark.parametrize("kernel", F0_KERNELS)
+def test_f0_moments_of_unvoiced(kernel):
+    count, mean, std = kernel(np.array([0.0, np.nan, 0.0]))
+    assert count == 0 and np.isnan(mean) and np.isnan(std)
+    count, mean, std = kernel(np.array([], dtype=np.float64))
+    assert count == 0 and np.isnan(mean) and np.isnan(std)
+
+
+def test_calculator_f0_moments_keep_input():
+    pytest.importorskip("pyworld")
+    from audio_calculator import AudioCalculator
+    audio_calculator = AudioCalculator()
+    f0 = make_f0()[::2]  # not contiguous
+    original = f0.copy()
+    mean, std = audio_calculator.calc_f0_moments(f0=f0)
+    voiced = np.where(f0 > 0.0, f0, np.nan)
+    assert mean == pytest.approx(np.nanmean(voiced), rel=1e-12)
+    assert std == pytest.approx(np.nanstd(voiced), rel=1e-10)
+    np.testing.assert_array_equal(f0, original)
+    assert audio_calculator.calc_f0_moments(f0=np.full(10, np.nan)) == (0.0, 0.0)
+
+
+def test_kernels_are_compiled_if_numba_is_available():
+    if audio_kernels.IS_NUMBA_AVAILABLE:
+        assert calc_rms_db_kernel is not _rms_db_numpy and calc_f0_moments_kernel is not _f0_moments_numpy
+    else:
+        assert calc_rms_db_kernel is _rms_db_numpy and calc_f0_moments_kernel is _f0_moments_numpy
@@ -0,0 +1,127 @@
+import glob
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+
+from audio_recorder import AudioRecorder, WavFileWriter
+from region_index import RegionIndex, RegionIndexWriter
+
+SAMPLE_RATE = 16000
+
+
+def make_region(index: int, num_samples: int = 1600) -> np.ndarray:
+    return (np.arange(num_samples) + index * 1000).astype(np.int16)
+
+
+def read_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as f:
+        assert f.getframerate() == SAMPLE_RATE and f.getsampwidth() == 2 and f.getnchannels() == 1
+        return np.frombuffer(f.readframes(f.getnframes()), dtype="<i2")
+
+
+def wait_until(condition, timeout_sec: float = 5.0) -> None:
+    start = time.perf_counter()
+    while not condition():
+        assert time.perf_counter() - start < timeout_sec
+        time.sleep(0.01)
+
+
+def test_header_is_fixed_up_while_open(tmp_path):
+    path = str(tmp_path / "session.wav")
+    writer = WavFileWriter(file_path=path, sample_rate=SAMPLE_RATE)
+    writer.write(make_region(0))
+    writer.update_header()
+    # readable up to the last update, e.g., after a crash
+    np.testing.assert_array_equal(read_wav(path), make_region(0))
+    writer.write(make_region(1))
+    np.testing.assert_array_equal(read_wav(path), make_region(0))
+    writer.close()
+    np.testing.assert_array_equal(read_wav(path), np.concatenate([make_region(0), make_region(1)]))
+    assert writer.frames == 3200 and os.path.getsize(path) == 44 + 6400
+
+
+def record_regions(recorder: AudioRecorder, count: int) -> None:
+    for i in range(count):
+        record = RegionIndexWriter.new_record()
+        record["region_id"] = i
+        recorder.append(make_region(i), record=record)
+    recorder.close()
+
+
+def get_recordings(directory: str):
+    # files rotated in the same second have suffixes, in order
+    paths = sorted(glob.glob(os.path.join(directory, "*.wav")), key=lambda path: (len(path), path))
+    return [(read_wav(path), RegionIndex(file_path=os.path.splitext(path)[0] + ".idx")) for path in paths]
+
+
+def assert_regions(recordings, regions_per_file) -> None:
+    assert [len(index) for _, index in recordings] == regions_per_file
+    region_id = 0
+    for samples, index in recordings:
+        for record in index.records:
+            assert record["region_id"] == region_id
+            offset = int(record["file_offset"])
+            np.testing.assert_array_equal(samples[offset:offset + 1600], make_region(region_id))
+            region_id += 1
+        assert len(samples) == 1600 * len(index)
+
+
+def test_rotation_by_size(tmp_path):
+    # 3200 bytes per region, so a file is rotated after the second region
+    recorder = AudioRecorder(sample_rate=SAMPLE_RATE, directory=str(tmp_path), max_bytes=5000)
+    record_regions(recorder=recorder, count=5)
+    assert recorder.file_count == 3
+    assert_regions(recordings=get_recordings(directory=str(tmp_path)), regions_per_file=[2, 2, 1])
+
+
+def test_rotation_by_duration(tmp_path):
+    # 0.1 sec per region
+    recorder = AudioRecorder(sample_rate=SAMPLE_RATE, directory=str(tmp_path), max_duration_sec=0.3)
+    record_regions(recorder=recorder, count=7)
+    assert recorder.file_count == 3
+    assert_regions(recordings=get_recordings(directory=str(tmp_path)), regions_per_file=[3, 3, 1])
+
+
+def test_failed_region_doesnt_stop_writer(tmp_path):
+    directory = tmp_path / "records"
+    directory.write_bytes(b"")  # a file instead of the directory
+    recorder = AudioRecorder(sample_rate=SAMPLE_RATE, directory=str(directory))
+    record = RegionIndexWriter.new_record()
+    recorder.append(make_region(0), record=record)
+    wait_until(lambda: recorder.failed_count == 1)
+    assert recorder._thread.is_alive()
+    # the next region starts a file once the directory can be made
+    directory.unlink()
+    record = RegionIndexWriter.new_record()
+    record["region_id"] = 1
+    recorder.append(make_region(1), record=record)
+    recorder.close()
+    assert recorder.failed_count == 1
+    recordings = get_recordings(directory=str(directory))
+    assert len(recordings) == 1
+    np.testing.assert_array_equal(recordings[0][0], make_region(1))
+    assert recordings[0][1].records["region_id"].tolist() == [1]
+
+
+def test_regions_are_dropped_when_writer_falls_behind(tmp_path):
+    recorder = AudioRecorder(sample_rate=SAMPLE_RATE, directory=str(tmp_path), max_queue_regions=1)
+    is_released = threading.Event()
+    open_file = recorder._open
+
+    def open_slowly():
+        is_released.wait()
+        open_file()
+
+    recorder._open = open_slowly
+    recorder.append(make_region(0))
+    wait_until(lambda: recorder._queue.empty())  # the writer is opening the file
+    for i in range(1, 4):
+        recorder.append(make_region(i))  # never blocks
+    assert recorder.dropped_count == 2
+    is_released.set()
+    recorder.close()
+    samples, _ = get_recordings(directory=str(tmp_path))[0]
+    np.testing.assert_array_equal(samples, np.concatenate([make_region(0), make_region(1)]))
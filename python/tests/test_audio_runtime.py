@@ -0,0 +1,108 @@
+import asyncio
+
+import numpy as np
+
+from audio_runtime import AudioRuntime
+
+
+class StubSender:
+    control_socket = None
+
+    def __init__(self):
+        self.message_count = 0
+
+    async def send_message(self):
+        self.message_count += 1
+
+    async def send_subscriptions(self, record):
+        pass
+
+    def close(self):
+        pass
+
+
+class StubPlacement:
+    def place_publish(self):
+        pass
+
+    def place_analysis(self):
+        pass
+
+    def report(self):
+        pass
+
+
+class StubDevice:
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class StubStream:
+    """
+    `AudioStream` whose `failing_block`-th block raises.
+    """
+
+    def __init__(self, failing_block: int):
+        self.failing_block = failing_block
+        self.block_count = 0
+        self.zeromq_sender = StubSender()
+        self.thread_placement = StubPlacement()
+        self.stream = StubDevice()
+        self.feature_record = None
+        self.saved = []
+
+    def handle_block(self, indata, frames, queue_depth):
+        self.block_count += 1
+        if self.block_count == self.failing_block:
+            raise ValueError("broken block")
+
+    def handle_sending(self):
+        pass
+
+    def save_region(self):
+        self.saved.append("region")
+
+    def save_features(self):
+        self.saved.append("features")
+
+    def save_checkpoint(self):
+        self.saved.append("checkpoint")
+
+
+async def run_with_blocks(runtime: AudioRuntime, num_blocks: int) -> None:
+    task = asyncio.create_task(runtime.run())
+    while runtime.stop_event is None:
+        await asyncio.sleep(0.01)
+    for _ in range(num_blocks):
+        runtime.submit(indata=np.zeros(160, dtype=np.int16), frames=160)
+    await asyncio.sleep(0.1)
+    runtime.request_stop()
+    await asyncio.wait_for(task, timeout=5.0)
+
+
+def test_failing_block_is_skipped_and_stream_is_saved():
+    stream = StubStream(failing_block=3)
+    runtime = AudioRuntime(audio_stream=stream, max_queue_blocks=8)
+    asyncio.run(run_with_blocks(runtime=runtime, num_blocks=6))
+    assert stream.block_count == 6
+    assert stream.zeromq_sender.message_count == 5
+    assert stream.saved == ["region", "features", "checkpoint"]
+
+
+def test_stops_when_worker_dies_with_full_queue():
+    stream = StubStream(failing_block=-1)
+    runtime = AudioRuntime(audio_stream=stream, max_queue_blocks=2)
+
+    async def work():
+        raise RuntimeError("worker is gone")
+
+    runtime.work = work
+    asyncio.run(run_with_blocks(runtime=runtime, num_blocks=8))
+    assert runtime.stop_event.is_set()
+    assert stream.saved == ["region", "features", "checkpoint"]
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from f0_range_tracker import F0RangeTracker
+
+
+def make_f0(size: int = 200, seed: int = 0) -> np.ndarray:
+    # a speaker around 150 Hz with unvoiced frames
+    f0 = 150.0 * 2 ** (np.random.default_rng(seed).normal(0.0, 1.0, size) / 12)
+    f0[::10] = 0.0
+    f0[1::10] = np.nan
+    return f0
+
+
+def learn(tracker: F0RangeTracker, regions: int) -> None:
+    for i in range(regions):
+        tracker.update(f0=make_f0(seed=i), f0_range=tracker.get_range())
+
+
+def test_full_range_while_learning():
+    tracker = F0RangeTracker(min_frames=400)
+    assert tracker.get_range() == (tracker.min_freq, tracker.max_freq)
+    learn(tracker=tracker, regions=2)  # 320 voiced frames
+    assert tracker.get_range() == (tracker.min_freq, tracker.max_freq)
+
+
+def test_narrows_to_speaker():
+    tracker = F0RangeTracker(min_frames=400)
+    learn(tracker=tracker, regions=4)
+    low, high = tracker.get_range()
+    assert tracker.min_freq < low < 150.0 < high < tracker.max_freq
+    # quantiles of the speaker with the margin of 4 semitones on each side
+    assert low == pytest.approx(150.0 * 2 ** (-6.5 / 12), rel=0.05)
+    assert high == pytest.approx(150.0 * 2 ** (6.5 / 12), rel=0.05)
+
+
+def test_get_range_doesnt_change_state():
+    tracker = F0RangeTracker(min_frames=400, rewiden_every=3)
+    learn(tracker=tracker, regions=4)
+    state = (tracker.region_count, tracker.narrowed_count, tracker.is_wide_next)
+    ranges = [tracker.get_range() for _ in range(10)]  # e.g., for each window of a region
+    assert len(set(ranges)) == 1
+    assert (tracker.region_count, tracker.narrowed_count, tracker.is_wide_next) == state
+
+
+def test_rewidens_every_n_regions():
+    tracker = F0RangeTracker(min_frames=400, rewiden_every=4)
+    learn(tracker=tracker, regions=4)
+    is_full = []
+    for i in range(12):
+        f0_range = tracker.get_range()
+        is_full.append(f0_range == (tracker.min_freq, tracker.max_freq))
+        tracker.update(f0=make_f0(seed=10 + i), f0_range=f0_range)
+    # one full region after every 3 narrowed ones
+    assert sum(is_full) == 3 and np.all(np.diff(np.flatnonzero(is_full)) == 4)
+
+
+def test_rewidens_when_regions_are_in_flight():
+    # ranges of regions submitted at once (e.g., to workers) are the same, and every region is counted
+    tracker = F0RangeTracker(min_frames=400, rewiden_every=4)
+    learn(tracker=tracker, regions=4)
+    f0_range = tracker.get_range()
+    assert f0_range != (tracker.min_freq, tracker.max_freq)
+    for i in range(3):
+        tracker.update(f0=make_f0(seed=20 + i), f0_range=f0_range)
+    assert tracker.get_range() == (tracker.min_freq, tracker.max_freq)
+
+
+def test_widens_when_f0_reaches_edge_of_its_range():
+    tracker = F0RangeTracker(min_frames=400)
+    learn(tracker=tracker, regions=4)
+    low, high = tracker.get_range()
+    # f0 of another speaker close to the upper edge of the range which the region was searched with
+    tracker.update(f0=np.full(50, high * 0.99), f0_range=(low, high))
+    assert tracker.is_wide_next
+    assert tracker.get_range() == (tracker.min_freq, tracker.max_freq)
+    # the same f0 searched with the full range doesn't trigger it
+    tracker.update(f0=np.full(50, high * 0.99), f0_range=(tracker.min_freq, tracker.max_freq))
+    assert not tracker.is_wide_next
+
+
+def test_state_restores_with_full_range_first():
+    tracker = F0RangeTracker(min_frames=400)
+    learn(tracker=tracker, regions=4)
+    narrowed = tracker.get_range()
+    resumed = F0RangeTracker(min_frames=400)
+    resumed.set_state(tracker.get_state())
+    assert resumed.region_count == 4
+    assert resumed.get_range() == (resumed.min_freq, resumed.max_freq)
+    resumed.update(f0=make_f0(seed=30), f0_range=resumed.get_range())
+    assert resumed.get_range() == pytest.approx(narrowed, rel=0.05)
+
+
+@pytest.mark.parametrize("max_freq, expected", [(2093.0, 1), (1001.0, 1), (1000.0, 2), (501.0, 2), (500.0, 4),
+                                                (100.0, 4)])
+def test_decimation_keeps_harmonics(max_freq, expected):
+    tracker = F0RangeTracker()
+    decimation = tracker.get_decimation(sample_rate=16000, max_freq=max_freq)
+    assert decimation == expected
+    assert 16000 / decimation >= 8.0 * max_freq or decimation == 1
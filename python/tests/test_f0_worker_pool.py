@@ -0,0 +1,141 @@
+import json
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+zmq = pytest.importorskip("zmq")
+
+from f0_worker_pool import HEARTBEAT, F0WorkerPool, get_frame_count  # noqa: E402
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def pool():
+    pool = F0WorkerPool(task_port=get_free_port(), result_port=get_free_port(), num_local_workers=0,
+                        timeout_sec=0.2, max_attempts=3, heartbeat_sec=0.05)
+    yield pool
+    pool.close()
+
+
+def collect_in_thread(pool: F0WorkerPool, region_ids, timeout_sec: float):
+    contours = []
+    thread = threading.Thread(target=lambda: contours.extend(pool.collect(region_ids=region_ids)), daemon=True)
+    thread.start()
+    thread.join(timeout=timeout_sec)
+    assert not thread.is_alive(), "collect() doesn't return without workers"
+    return contours
+
+
+def test_collect_returns_without_workers(pool):
+    samples = np.zeros(16000)
+    for region_id in range(2):
+        pool.submit(region_id=region_id, samples=samples, f0_method="Harvest", sample_rate=16000)
+    contours = collect_in_thread(pool=pool, region_ids=[0, 1], timeout_sec=5.0)
+    assert len(contours) == 2
+    for f0 in contours:
+        assert len(f0) == 201  # 5 msec frames of 1 sec, inclusive
+        assert np.all(np.isnan(f0))
+    assert not pool._pending and not pool._unsent
+
+
+def test_collect_estimates_locally_without_workers(pool):
+    class Calculator:
+        def calc_f0_harvest(self, voiced_audio_data, sample_rate):
+            return np.full(get_frame_count(header={"f0_method": "Harvest", "sample_rate": sample_rate},
+                                           num_samples=len(voiced_audio_data)), 100.0)
+
+    pool.audio_calculator = Calculator()
+    pool.submit(region_id=7, samples=np.zeros(8000), f0_method="Harvest", sample_rate=16000)
+    contours = collect_in_thread(pool=pool, region_ids=[7], timeout_sec=5.0)
+    np.testing.assert_array_equal(contours[0], np.full(101, 100.0))
+
+
+def test_frame_count_of_pyin():
+    assert get_frame_count(header={"f0_method": "pYIN", "hop_length": 128, "sample_rate": 16000},
+                           num_samples=16000) == 126
+
+
+SAMPLE_RATE = 16000
+
+
+def make_tone(freq: float, duration_sec: float) -> np.ndarray:
+    t = np.arange(int(duration_sec * SAMPLE_RATE)) / SAMPLE_RATE
+    return 0.3 * np.sin(2 * np.pi * freq * t)
+
+
+@pytest.fixture
+def local_pool():
+    pytest.importorskip("pyworld")
+    pool = F0WorkerPool(task_port=get_free_port(), result_port=get_free_port(), num_local_workers=2,
+                        timeout_sec=5.0, max_attempts=3, heartbeat_sec=0.1)
+    # local workers import libraries before their first heartbeat
+    assert pool.wait_for_workers(count=2, timeout_sec=120.0)
+    yield pool
+    pool.close()
+
+
+def estimate_locally(samples: np.ndarray) -> np.ndarray:
+    from audio_calculator import AudioCalculator
+    return AudioCalculator().calc_f0_harvest(voiced_audio_data=samples, sample_rate=SAMPLE_RATE)
+
+
+def get_worker_pids(pool: F0WorkerPool):
+    return [process.pid for process in pool.processes]
+
+
+def test_local_workers_reassemble_in_order(local_pool):
+    regions = [make_tone(freq=freq, duration_sec=0.3 + 0.1 * i) for i, freq in enumerate([120, 180, 240, 150, 300])]
+    for region_id, samples in enumerate(regions):
+        local_pool.submit(region_id=region_id, samples=samples, f0_method="Harvest", sample_rate=SAMPLE_RATE)
+    region_ids = [3, 0, 4, 1, 2]
+    contours = collect_in_thread(pool=local_pool, region_ids=region_ids, timeout_sec=60.0)
+    for region_id, f0 in zip(region_ids, contours):
+        np.testing.assert_array_equal(f0, estimate_locally(samples=regions[region_id]))
+    assert local_pool.resubmitted_count == 0
+
+
+def test_failed_task_doesnt_kill_workers(local_pool):
+    pids = get_worker_pids(pool=local_pool)
+    # pYIN without `frame_length` fails in the worker
+    local_pool.submit(region_id=0, samples=make_tone(freq=200.0, duration_sec=0.5), f0_method="pYIN",
+                      sample_rate=SAMPLE_RATE, hop_length=128)
+    samples = make_tone(freq=200.0, duration_sec=0.5)
+    local_pool.submit(region_id=1, samples=samples, f0_method="Harvest", sample_rate=SAMPLE_RATE)
+    failed, f0 = collect_in_thread(pool=local_pool, region_ids=[0, 1], timeout_sec=30.0)
+    assert len(failed) == 1 + 8000 // 128 and np.all(np.isnan(failed))
+    np.testing.assert_array_equal(f0, estimate_locally(samples=samples))
+    # the failure isn't resubmitted to other workers, and nobody died
+    assert local_pool.resubmitted_count == 0
+    assert all(process.is_alive() for process in local_pool.processes)
+    assert get_worker_pids(pool=local_pool) == pids
+
+
+def test_killed_worker_is_resubmitted_and_restarted(local_pool):
+    pids = get_worker_pids(pool=local_pool)
+    regions = [make_tone(freq=150.0, duration_sec=10.0), make_tone(freq=250.0, duration_sec=0.5)]
+    local_pool.submit(region_id=0, samples=regions[0], f0_method="Harvest", sample_rate=SAMPLE_RATE)
+    # kill the worker which reports the region in its heartbeat
+    busy_pid = None
+    for _ in range(1000):
+        kind, header_bytes, *_ = local_pool.result_socket.recv_multipart()
+        header = json.loads(header_bytes)
+        if kind == HEARTBEAT and header["region_id"] == 0:
+            busy_pid = int(header["worker"].rsplit("-", 1)[1])
+            break
+    assert busy_pid in pids
+    local_pool.processes[pids.index(busy_pid)].kill()
+    local_pool.submit(region_id=1, samples=regions[1], f0_method="Harvest", sample_rate=SAMPLE_RATE)
+    contours = collect_in_thread(pool=local_pool, region_ids=[0, 1], timeout_sec=120.0)
+    for f0, samples in zip(contours, regions):
+        np.testing.assert_array_equal(f0, estimate_locally(samples=samples))
+    assert local_pool.resubmitted_count >= 1
+    assert local_pool.restarted_count == 1
+    assert all(process.is_alive() for process in local_pool.processes)
+    assert busy_pid not in get_worker_pids(pool=local_pool)
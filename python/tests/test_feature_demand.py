@@ -0,0 +1,37 @@
+from audio_stream import AudioStream
+from feature_record import FeatureRecord
+from speech_timeline import SpeechTimeline
+
+WINDOWS_SEC = [10.0, 60.0, 300.0]
+
+
+def get_demanded_features(keys):
+    return AudioStream.get_demanded_features(keys=keys, key_features=AudioStream.get_key_features(
+        windows_sec=WINDOWS_SEC))
+
+
+def test_f0_subscriber_keeps_persisted_features():
+    assert get_demanded_features(keys=["average_f0"]) == {"f0", "rms"}
+    assert get_demanded_features(keys=["std_f0_1min"]) == {"f0", "rms"}
+
+
+def test_no_subscriber_computes_only_persisted_features():
+    assert get_demanded_features(keys=[]) == set(AudioStream.PERSISTED_FEATURES)
+    assert get_demanded_features(keys=["total_voiced_region_num", "max_voiced_ratio_5min"]) == {"rms"}
+
+
+def test_fields_demand_their_features():
+    assert "f0" not in get_demanded_features(keys=["average_rms_db_10s", "std_rms_db_total", "average_rms"])
+    assert "f0" not in get_demanded_features(keys=list(SpeechTimeline.ENVELOPE_FIELDS))
+    assert get_demanded_features(keys=["unknown_key"]) == {"rms"}
+
+
+def test_every_feature_field_is_mapped():
+    key_features = AudioStream.get_key_features(windows_sec=WINDOWS_SEC)
+    keys = [key for key, _ in FeatureRecord.SCHEMA]
+    for name in AudioStream.ROLLING_FEATURES:
+        keys += AudioStream.get_rolling_keys(name=name, windows_sec=WINDOWS_SEC)
+    for key in keys:
+        for feature in AudioStream.FEATURE_OUTPUTS:
+            if feature in key:
+                assert feature in key_features[key], key
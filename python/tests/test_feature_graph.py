@@ -0,0 +1,84 @@
+import pytest
+
+from feature_graph import FeatureGraph
+from util.exception import FeatureGraphException
+
+
+def make_graph(calls: list) -> FeatureGraph:
+    def track(name, compute):
+        def wrapped(*args):
+            calls.append(name)
+            return compute(*args)
+        return wrapped
+
+    graph = FeatureGraph(sources=["samples"])
+    graph.register("audio", ["samples"], track("audio", lambda samples: [s / 2 for s in samples]))
+    graph.register("power", ["audio"], track("power", lambda audio: [a * a for a in audio]))
+    graph.register("rms", ["power"], track("rms", lambda power: (sum(power) / len(power)) ** 0.5))
+    graph.register("peak", ["audio"], track("peak", lambda audio: max(abs(a) for a in audio)))
+    graph.register("crest", ["peak", "rms"], track("crest", lambda peak, rms: peak / rms))
+    return graph
+
+
+def test_resolve_orders_inputs_first():
+    graph = make_graph(calls=[])
+    order = [node.name for node in graph.resolve(outputs=["crest"])]
+    assert sorted(order) == ["audio", "crest", "peak", "power", "rms"]
+    for node in graph.resolve(outputs=["crest"]):
+        assert all(order.index(name) < order.index(node.name) for name in node.inputs if name in order)
+
+
+def test_resolve_excludes_features_not_demanded():
+    graph = make_graph(calls=[])
+    assert [node.name for node in graph.resolve(outputs=["peak"])] == ["audio", "peak"]
+    assert graph.resolve(outputs=[]) == []
+
+
+def test_compute_runs_each_feature_once():
+    calls = []
+    graph = make_graph(calls=calls)
+    values = graph.compute(outputs=["rms", "crest"], sources={"samples": [2.0, -2.0, 2.0, -2.0]})
+    assert sorted(calls) == ["audio", "crest", "peak", "power", "rms"]
+    assert values["rms"] == pytest.approx(1.0)
+    assert values["crest"] == pytest.approx(1.0)
+    assert values["samples"] == [2.0, -2.0, 2.0, -2.0]
+
+
+def test_missing_dependency_raises():
+    graph = make_graph(calls=[])
+    graph.register("spectrum", ["stft"], lambda stft: stft)
+    with pytest.raises(FeatureGraphException):
+        graph.resolve(outputs=["spectrum"])
+    with pytest.raises(FeatureGraphException):
+        graph.resolve(outputs=["unknown"])
+    # other outputs still resolve
+    assert [node.name for node in graph.resolve(outputs=["peak"])] == ["audio", "peak"]
+
+
+def test_cycle_raises():
+    graph = FeatureGraph(sources=["samples"])
+    graph.register("a", ["samples", "c"], lambda samples, c: c)
+    graph.register("b", ["a"], lambda a: a)
+    graph.register("c", ["b"], lambda b: b)
+    with pytest.raises(FeatureGraphException):
+        graph.resolve(outputs=["b"])
+    graph.register("self", ["self"], lambda value: value)
+    with pytest.raises(FeatureGraphException):
+        graph.resolve(outputs=["self"])
+
+
+def test_duplicate_registration_raises():
+    graph = make_graph(calls=[])
+    with pytest.raises(FeatureGraphException):
+        graph.register("rms", ["audio"], lambda audio: audio)
+    with pytest.raises(FeatureGraphException):
+        graph.register("samples", [], lambda: None)
+
+
+def test_register_invalidates_plans():
+    graph = make_graph(calls=[])
+    assert [node.name for node in graph.resolve(outputs=["peak"])] == ["audio", "peak"]
+    with pytest.raises(FeatureGraphException):
+        graph.resolve(outputs=["gain"])
+    graph.register("gain", ["peak"], lambda peak: 1 / peak)
+    assert [node.name for node in graph.resolve(outputs=["gain"])] == ["audio", "peak", "gain"]
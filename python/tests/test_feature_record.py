@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pytest
+
+from feature_record import FeatureRecord
+
+
+def make_record() -> FeatureRecord:
+    record = FeatureRecord()
+    record["t"] = 12.5
+    record["total_voiced_region_num"] = 3
+    record["average_rms_db"] = np.float64(-31.25)
+    record["average_f0"] = 150.0
+    record["std_f0"] = np.nan
+    return record
+
+
+def test_values_are_builtin_types():
+    record = make_record()
+    values = record.to_tuple()
+    assert len(values) == len(FeatureRecord.SCHEMA)
+    assert type(values[1]) is int and type(values[0]) is float
+    res = record.to_dict()
+    assert list(res) == [name for name, _ in FeatureRecord.SCHEMA]
+    assert res["total_voiced_region_num"] == 3 and res["average_f0"] == 150.0
+    # NaN is kept, which `json.dumps()` writes as `NaN`
+    assert np.isnan(res["std_f0"])
+    assert json.loads(json.dumps(res))["average_rms_db"] == -31.25
+
+
+def test_dict_keys_rename_fields():
+    record = make_record()
+    camel = ["t", "totalVoicedRegionNum", "totalVoicedTimeMs", "averageRms", "averageRmsDb", "averageRmsDbTotal",
+             "stdRmsDb", "stdRmsDbTotal", "averageF0", "stdF0"]
+    res = record.to_dict(keys=camel)
+    assert list(res) == camel
+    assert res["averageF0"] == 150.0 and res["totalVoicedRegionNum"] == 3
+
+
+def test_subset_in_requested_order():
+    record = make_record()
+    keys = ["t", "average_f0", "total_voiced_region_num"]
+    assert record.to_tuple(keys=keys) == (12.5, 150.0, 3)
+    values = np.frombuffer(record.to_bytes(keys=keys), dtype=np.dtype([(key, record.dtype[key]) for key in keys]))
+    assert values.tolist() == [(12.5, 150.0, 3)]
+
+
+def test_add_fields_keeps_values():
+    record = make_record()
+    record.add_fields(fields=[("total_pause_num", "<i8"), ("average_f0", "<f4"), ("rms_10s", "<f8")])
+    assert record.keys[-2:] == ("total_pause_num", "rms_10s")
+    assert record.dtype["average_f0"] == np.dtype("<f8")  # existing fields aren't changed
+    assert record["average_f0"] == 150.0 and record["total_voiced_region_num"] == 3
+    assert record["total_pause_num"] == 0 and "rms_10s" in record
+    record["rms_10s"] = 0.5
+    assert record.to_dict()["rms_10s"] == 0.5
+    schema = record.get_schema()
+    assert schema[:len(FeatureRecord.SCHEMA)] == FeatureRecord.SCHEMA
+    assert schema[-2:] == [("total_pause_num", "<i8"), ("rms_10s", "<f8")]
+    record.add_fields(fields=[("rms_10s", "<f8")])  # nothing is added
+    assert record.get_schema() == schema
+
+
+def test_bytes_of_whole_record_match_schema():
+    record = make_record()
+    values = np.frombuffer(record.to_bytes(), dtype=np.dtype(record.get_schema()))
+    assert values.tolist()[0][:2] == (12.5, 3)
+    assert record.dtype.itemsize == len(record.to_bytes())
+
+
+def test_binary_subscription_round_trip():
+    pytest.importorskip("zmq")
+    from util.zeromq_sender import ZeroMQSender
+    record = make_record()
+    record.add_fields(fields=[("total_pause_num", "<i8")])
+    record["total_pause_num"] = 7
+    sender = ZeroMQSender()
+    sender.available_keys = [key for key, _ in record.get_schema()]
+    sender.field_dtypes = dict(record.get_schema())
+    reply = sender.handle_control(identity=b"client", payload=json.dumps(
+        {"command": "subscribe", "features": ["averageF0", "total_pause_num", "totalVoicedRegionNum"],
+         "encoding": "binary"}).encode("ascii"))
+    assert reply["ok"]
+    # the client decodes messages with the fields of the reply
+    dtype = np.dtype([(name, dtype) for name, dtype in reply["fields"]])
+    keys = sender.subscriptions[b"client"].keys
+    values = np.frombuffer(record.to_bytes(keys=keys), dtype=dtype)[0]
+    assert dtype.names == ("t", "averageF0", "totalPauseNum", "totalVoicedRegionNum")
+    assert values["t"] == 12.5 and values["averageF0"] == 150.0
+    assert values["totalPauseNum"] == 7 and values["totalVoicedRegionNum"] == 3
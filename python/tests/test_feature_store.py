@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from feature_store import FeatureStore
+
+COLUMNS = [("t", "<f8"), ("rms_db", "<f4"), ("voiced", "|u1")]
+
+
+def make_rows(num_rows: int) -> dict:
+    rng = np.random.default_rng(0)
+    return {"t": np.arange(num_rows) * 0.008, "rms_db": rng.normal(-30.0, 5.0, num_rows).astype(np.float32),
+            "voiced": (rng.random(num_rows) < 0.5).astype(np.uint8)}
+
+
+def append_in_batches(store: FeatureStore, rows: dict) -> None:
+    sizes = [1, 7, 0, 64, 100, 3, 500]
+    offset = 0
+    for size in sizes + [len(rows["t"])]:
+        size = min(size, len(rows["t"]) - offset)
+        store.append(**{name: column[offset:offset + size] for name, column in rows.items()})
+        offset += size
+
+
+def assert_rows(store: FeatureStore, rows: dict) -> None:
+    assert len(store) == len(rows["t"])
+    for name, column in rows.items():
+        values = store.read(name)
+        assert values.dtype == column.dtype
+        np.testing.assert_array_equal(values, column)
+        np.testing.assert_array_equal(store.read(name, start=30, stop=230), column[30:230])
+    expected = (rows["t"] >= 1.0) & (rows["t"] < 2.5)
+    selected = store.read_time_range(start_sec=1.0, end_sec=2.5)
+    for name, column in rows.items():
+        np.testing.assert_array_equal(selected[name], column[expected])
+    assert store.read_time_range(start_sec=100.0, end_sec=200.0, names=["rms_db"])["rms_db"].size == 0
+
+
+@pytest.mark.parametrize("num_rows", [0, 50, 64, 1000])
+def test_round_trip(tmp_path, num_rows):
+    rows = make_rows(num_rows=num_rows)
+    store = FeatureStore(directory=str(tmp_path), columns=COLUMNS, chunk_size=64)
+    append_in_batches(store=store, rows=rows)
+    # rows in memory and spilled chunks are read alike while writing
+    assert_rows(store=store, rows=rows)
+    store.close()
+    opened = FeatureStore.open(directory=str(tmp_path))
+    assert opened.is_read_only
+    assert opened.columns == store.columns
+    assert opened.chunk_lengths == store.chunk_lengths
+    assert_rows(store=opened, rows=rows)
+    opened.close()
+
+
+def test_time_range_on_chunk_boundaries(tmp_path):
+    rows = make_rows(num_rows=256)
+    store = FeatureStore(directory=str(tmp_path), columns=COLUMNS, chunk_size=64)
+    store.append(**rows)
+    store.close()
+    opened = FeatureStore.open(directory=str(tmp_path))
+    for start, end in [(0, 64), (63, 65), (64, 128), (128, 256), (10, 11), (0, 256)]:
+        selected = opened.read_time_range(start_sec=rows["t"][start], end_sec=rows["t"][end - 1] + 1e-9, names=["t"])
+        np.testing.assert_array_equal(selected["t"], rows["t"][start:end])
@@ -0,0 +1,55 @@
+import logging
+
+import pytest
+
+from util import logger as logger_module
+from util.logger import RateLimitFilter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(logger_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_record(level: int, lineno: int = 10, msg: str = "message") -> logging.LogRecord:
+    return logging.makeLogRecord({"name": "test", "pathname": "test.py", "lineno": lineno, "levelno": level,
+                                  "levelname": logging.getLevelName(level), "msg": msg})
+
+
+def count_passed(rate_limit: RateLimitFilter, level: int, number: int) -> int:
+    return sum(rate_limit.filter(make_record(level=level)) for _ in range(number))
+
+
+def test_warnings_are_limited_per_line(clock):
+    rate_limit = RateLimitFilter(interval_sec=10.0)
+    assert count_passed(rate_limit=rate_limit, level=logging.WARNING, number=5) == 1
+    # other lines have their own windows
+    assert rate_limit.filter(make_record(level=logging.WARNING, lineno=11))
+
+
+def test_errors_have_looser_budget(clock):
+    rate_limit = RateLimitFilter(interval_sec=10.0, error_budget=10)
+    assert count_passed(rate_limit=rate_limit, level=logging.ERROR, number=15) == 10
+    assert count_passed(rate_limit=rate_limit, level=logging.INFO, number=15) == 15
+    assert count_passed(rate_limit=rate_limit, level=logging.DEBUG, number=15) == 15
+
+
+def test_suppressed_count_is_reported_after_window(clock):
+    rate_limit = RateLimitFilter(interval_sec=10.0)
+    count_passed(rate_limit=rate_limit, level=logging.WARNING, number=4)
+    clock[0] += 10.0
+    record = make_record(level=logging.WARNING)
+    assert rate_limit.filter(record)
+    assert record.getMessage() == "message (3 similar records were suppressed)"
+
+
+def test_suppressed_count_is_flushed(clock):
+    rate_limit = RateLimitFilter(interval_sec=10.0)
+    count_passed(rate_limit=rate_limit, level=logging.WARNING, number=3)
+    summaries = rate_limit.flush()
+    assert [summary.getMessage() for summary in summaries] == [
+        "2 similar records were suppressed, the last one: message"]
+    assert summaries[0].levelno == logging.WARNING
+    assert rate_limit.flush() == []
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("librosa")
+pytest.importorskip("pyworld")
+
+from audio_calculator import AudioCalculator  # noqa: E402
+from audio_manipulator import AudioManipulator  # noqa: E402
+
+SAMPLE_RATE = 16000
+TOLERANCE_DB = 0.01
+TOLERANCE_HZ = 0.1
+
+
+@pytest.fixture(scope="module")
+def audio_calculator():
+    return AudioCalculator()
+
+
+@pytest.fixture(scope="module")
+def samples():
+    """
+    Synthetic voice (harmonic tone whose f0 varies slowly) of int16, like blocks of the device.
+    """
+    t = np.arange(5 * SAMPLE_RATE) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(150.0 + 30.0 * np.sin(2 * np.pi * 0.5 * t)) / SAMPLE_RATE
+    tone = sum(np.sin(k * phase) / k for k in range(1, 6))
+    return (0.3 * tone / np.max(np.abs(tone)) * 2 ** 15).astype(np.int16)
+
+
+def front_end(audio_calculator: AudioCalculator, samples: np.ndarray, dtype: str):
+    """
+    Same as the front-end of `AudioStream`, i.e., int16 -> float, stft, magnitude and rms in dB.
+    """
+    audio = AudioManipulator().int_to_float(audio_data=samples, dtype=dtype)
+    _, audio_freq = audio_calculator.calc_short_time_fourier_transform(voiced_audio_data=audio, n_fft=512)
+    magnitude, _ = audio_calculator.calc_magphase(voiced_audio_data_freq=audio_freq)
+    _, rms_db = audio_calculator.calc_energy_rms_db(magnitude=magnitude, frame_length=512)
+    return audio, rms_db
+
+
+def test_float32_keeps_dtype(audio_calculator, samples):
+    audio, rms_db = front_end(audio_calculator=audio_calculator, samples=samples, dtype="float32")
+    assert audio.dtype == np.float32
+    assert rms_db.dtype == np.float32
+
+
+def test_float32_db_moments_match_float64(audio_calculator, samples):
+    _, rms_db64 = front_end(audio_calculator=audio_calculator, samples=samples, dtype="float64")
+    _, rms_db32 = front_end(audio_calculator=audio_calculator, samples=samples, dtype="float32")
+    assert np.max(np.abs(rms_db64 - rms_db32)) < TOLERANCE_DB
+    assert abs(audio_calculator.calc_mean(audio_data=rms_db64)
+               - audio_calculator.calc_mean(audio_data=rms_db32)) < TOLERANCE_DB
+    assert abs(audio_calculator.calc_standard_deviation(audio_data=rms_db64)
+               - audio_calculator.calc_standard_deviation(audio_data=rms_db32)) < TOLERANCE_DB
+
+
+def test_float32_f0_moments_match_float64(audio_calculator, samples):
+    audio64, _ = front_end(audio_calculator=audio_calculator, samples=samples, dtype="float64")
+    audio32, _ = front_end(audio_calculator=audio_calculator, samples=samples, dtype="float32")
+    f0_64 = audio_calculator.calc_f0_harvest(voiced_audio_data=audio64, sample_rate=SAMPLE_RATE)
+    f0_32 = audio_calculator.calc_f0_harvest(voiced_audio_data=audio32, sample_rate=SAMPLE_RATE)
+    average64, std64 = audio_calculator.calc_f0_moments(f0=f0_64)
+    average32, std32 = audio_calculator.calc_f0_moments(f0=f0_32)
+    assert 120.0 < average64 < 180.0  # the tone is found
+    assert abs(average64 - average32) < TOLERANCE_HZ
+    assert abs(std64 - std32) < TOLERANCE_HZ
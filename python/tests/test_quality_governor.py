@@ -0,0 +1,72 @@
+from quality_governor import QualityGovernor
+
+
+def make_governor() -> QualityGovernor:
+    return QualityGovernor(levels=QualityGovernor.make_levels(f0_method="Harvest", hop_length=128))
+
+
+def feed(governor: QualityGovernor, rtf: float, blocks: int, queue_depth: int = 0) -> None:
+    for _ in range(blocks):
+        governor.update(processing_sec=rtf * 5.0, block_sec=5.0, queue_depth=queue_depth)
+
+
+def test_levels_decrease_cost_monotonically():
+    levels = QualityGovernor.make_levels(f0_method="Harvest", hop_length=128)
+    assert [(level.f0_method, level.hop_length) for level in levels] == [
+        ("Harvest", 128), ("Harvest", 256), ("pYIN", 256), ("DIO", 256), (None, 512)]
+    assert [level.hop_length for level in levels] == sorted(level.hop_length for level in levels)
+    assert levels[-1].features == frozenset({"rms"})
+    assert all(level.features == frozenset({"rms", "f0"}) for level in levels[:-1])
+
+
+def test_levels_start_from_configured_method():
+    levels = QualityGovernor.make_levels(f0_method="DIO", hop_length=128)
+    assert [(level.f0_method, level.hop_length) for level in levels] == [("DIO", 128), ("DIO", 256), (None, 512)]
+    assert QualityGovernor(levels=levels).get_f0_methods() == ["DIO"]
+
+
+def test_every_estimator_is_warmed_up():
+    assert make_governor().get_f0_methods() == ["Harvest", "pYIN", "DIO"]
+
+
+def test_degrades_after_two_slow_blocks():
+    governor = make_governor()
+    feed(governor=governor, rtf=2.0, blocks=1)
+    assert governor.level_index == 0
+    feed(governor=governor, rtf=2.0, blocks=1)
+    assert governor.level_index == 1
+
+
+def test_degrades_after_two_blocks_behind_in_queue():
+    governor = make_governor()
+    feed(governor=governor, rtf=0.1, blocks=1, queue_depth=1)
+    assert governor.level_index == 0
+    feed(governor=governor, rtf=0.1, blocks=1, queue_depth=1)
+    assert governor.level_index == 1
+
+
+def test_recovers_after_ten_fast_blocks():
+    governor = make_governor()
+    feed(governor=governor, rtf=2.0, blocks=2)
+    assert governor.level_index == 1
+    feed(governor=governor, rtf=0.0, blocks=9)
+    assert governor.level_index == 1
+    feed(governor=governor, rtf=0.0, blocks=1)
+    assert governor.level_index == 0
+
+
+def test_does_not_flap_between_thresholds():
+    governor = make_governor()
+    feed(governor=governor, rtf=2.0, blocks=2)
+    # alternating slow and moderate blocks never reach 2 consecutive pressured nor 10 fast ones
+    for _ in range(20):
+        feed(governor=governor, rtf=0.5, blocks=1)
+        feed(governor=governor, rtf=0.0, blocks=1)
+    assert governor.level_index == 1
+
+
+def test_stays_at_the_lowest_level():
+    governor = make_governor()
+    feed(governor=governor, rtf=5.0, blocks=50)
+    assert governor.level_index == len(governor.levels) - 1
+    assert governor.current.f0_method is None
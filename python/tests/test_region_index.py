@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from region_index import RegionIndex, RegionIndexWriter
+
+SAMPLE_RATE = 16000
+
+
+@pytest.fixture()
+def regions():
+    """
+    Sorted, non-overlapping regions with gaps, whose ids skip some numbers (e.g., regions of other recordings).
+    """
+    rng = np.random.default_rng(0)
+    lengths = rng.integers(low=1600, high=32000, size=50)
+    gaps = rng.integers(low=800, high=16000, size=50)
+    starts = np.cumsum(gaps + np.concatenate([[0], lengths[:-1]]))
+    return {"region_id": np.arange(50) * 2 + 10, "start_sample": starts, "end_sample": starts + lengths,
+            "file_offset": np.concatenate([[0], np.cumsum(lengths[:-1])])}
+
+
+def write_index(path: str, regions: dict) -> None:
+    writer = RegionIndexWriter(file_path=path, sample_rate=SAMPLE_RATE)
+    for i in range(len(regions["region_id"])):
+        record = RegionIndexWriter.new_record()
+        for name, values in regions.items():
+            record[name] = values[i]
+        record["average_f0"] = 100.0 + i
+        writer.write(record)
+    writer.close()
+
+
+def test_find_time_range_matches_overlap(tmp_path, regions):
+    path = str(tmp_path / "session.idx")
+    write_index(path=path, regions=regions)
+    index = RegionIndex(file_path=path)
+    assert len(index) == 50
+    end_sec = regions["end_sample"][-1] / SAMPLE_RATE
+    rng = np.random.default_rng(1)
+    ranges = [(0.0, end_sec + 1.0), (0.0, 0.0), (end_sec, end_sec + 10.0)]
+    ranges += [tuple(sorted(rng.uniform(0.0, end_sec, 2))) for _ in range(200)]
+    # boundaries of regions: ranges touching a region only at its end don't overlap it
+    ranges += [(regions["end_sample"][5] / SAMPLE_RATE, regions["start_sample"][6] / SAMPLE_RATE),
+               (regions["start_sample"][7] / SAMPLE_RATE, regions["start_sample"][7] / SAMPLE_RATE + 0.001)]
+    for start_sec, end_sec in ranges:
+        start_sample, end_sample = int(start_sec * SAMPLE_RATE), int(end_sec * SAMPLE_RATE)
+        expected = regions["region_id"][(regions["end_sample"] > start_sample) &
+                                        (regions["start_sample"] < end_sample)]
+        found = index.find_time_range(start_sec=start_sec, end_sec=end_sec)
+        np.testing.assert_array_equal(found["region_id"], expected, err_msg=str((start_sec, end_sec)))
+
+
+def test_find_region(tmp_path, regions):
+    path = str(tmp_path / "session.idx")
+    write_index(path=path, regions=regions)
+    index = RegionIndex(file_path=path)
+    record = index.find_region(region_id=20)
+    assert record["start_sample"] == regions["start_sample"][5]
+    assert record["average_f0"] == pytest.approx(105.0)
+    for region_id in (9, 11, 200):
+        assert index.find_region(region_id=region_id) is None
+
+
+def test_partial_record_is_ignored(tmp_path, regions):
+    path = str(tmp_path / "session.idx")
+    write_index(path=path, regions=regions)
+    with open(path, "ab") as f:
+        f.write(b"\x00" * (RegionIndexWriter.DTYPE.itemsize - 1))  # e.g., crash while writing
+    assert len(RegionIndex(file_path=path)) == 50
+    empty_path = str(tmp_path / "empty.idx")
+    RegionIndexWriter(file_path=empty_path, sample_rate=SAMPLE_RATE).close()
+    assert len(RegionIndex(file_path=empty_path).find_time_range(start_sec=0.0, end_sec=100.0)) == 0
+
+
+def test_invalid_index_raises(tmp_path):
+    path = tmp_path / "invalid.idx"
+    path.write_bytes(b"RIFF" + b"\x00" * 12)
+    with pytest.raises(ValueError):
+        RegionIndex(file_path=str(path))
+
+
+def test_read_samples(tmp_path, regions):
+    path = str(tmp_path / "session.idx")
+    write_index(path=path, regions=regions)
+    samples = (np.arange(int(np.sum(regions["end_sample"] - regions["start_sample"]))) % 30000).astype("<i2")
+    (tmp_path / "session.wav").write_bytes(b"\x00" * 44 + samples.tobytes())
+    index = RegionIndex(file_path=path)
+    for record in index.find_time_range(start_sec=10.0, end_sec=20.0):
+        offset, length = int(record["file_offset"]), int(record["end_sample"] - record["start_sample"])
+        np.testing.assert_array_equal(index.read_samples(record), samples[offset:offset + length])
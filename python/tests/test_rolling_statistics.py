@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from rolling_statistics import RollingStatistics, RunningMoments
+
+
+def expected_window(values: np.ndarray, times: np.ndarray, now: float, window_sec: float, capacity: int) -> dict:
+    kept = values[-capacity:][times[-capacity:] >= now - window_sec]
+    if kept.size == 0:
+        return {"average": 0.0, "std": 0.0, "min": 0.0, "max": 0.0}
+    return {"average": np.mean(kept), "std": np.std(kept), "min": np.min(kept), "max": np.max(kept)}
+
+
+@pytest.mark.parametrize("capacity", [65536, 50])
+def test_rolling_statistics_match_numpy(capacity):
+    # 10 values per second in uneven batches, and the small capacity wraps the ring buffer many times
+    rng = np.random.default_rng(0)
+    values = rng.normal(loc=60.0, scale=10.0, size=2000)
+    times = np.arange(values.size) / 10.0
+    statistics = RollingStatistics(windows_sec=(1.0, 4.0, 30.0), capacity=capacity)
+    bounds = np.cumsum(rng.integers(low=1, high=40, size=values.size))
+    pushed = 0
+    for end in bounds[bounds < values.size].tolist() + [values.size]:
+        statistics.push(values=values[pushed:end], times=times[pushed:end])
+        pushed = end
+        for w, window_sec in enumerate(statistics.windows_sec):
+            expected = expected_window(values=values[:end], times=times[:end], now=times[end - 1],
+                                       window_sec=window_sec, capacity=capacity)
+            actual = statistics.get(w)
+            for key in ("average", "std", "min", "max"):
+                assert actual[key] == pytest.approx(expected[key], rel=1e-9, abs=1e-6), (end, window_sec, key)
+
+
+def test_rolling_statistics_evict_without_values():
+    statistics = RollingStatistics(windows_sec=(1.0, 10.0))
+    statistics.push(values=np.array([1.0, 2.0, 3.0]), times=np.array([0.0, 0.5, 1.0]))
+    statistics.evict(now=2.5)  # e.g., silence
+    assert statistics.get(0) == {"average": 0.0, "std": 0.0, "min": 0.0, "max": 0.0}
+    assert statistics.get(1)["average"] == pytest.approx(2.0)
+    assert statistics.get(1)["max"] == 3.0
+
+
+def test_window_suffix():
+    assert [RollingStatistics.window_suffix(sec) for sec in (10.0, 60.0, 300.0, 90.0, 0.5)] == [
+        "10s", "1min", "5min", "90s", "0.5s"]
+
+
+def test_running_moments_match_numpy():
+    rng = np.random.default_rng(1)
+    values = rng.normal(loc=1000.0, scale=3.0, size=5000)
+    moments = RunningMoments()
+    pushed = 0
+    for size in [1, 0, 7, 500, 1, 2000, 2491]:
+        moments.push(values=values[pushed:pushed + size])
+        pushed += size
+        if pushed > 0:
+            assert moments.count == pushed
+            assert moments.mean == pytest.approx(np.mean(values[:pushed]), rel=1e-12)
+            assert moments.std == pytest.approx(np.std(values[:pushed]), rel=1e-9, abs=1e-12)
+
+
+def test_running_moments_state_round_trip():
+    moments = RunningMoments()
+    assert moments.std == 0.0
+    moments.push(values=np.array([1.0, 2.0, 4.0]))
+    resumed = RunningMoments()
+    resumed.set_state(moments.get_state())
+    moments.push(values=np.array([8.0]))
+    resumed.push(values=np.array([8.0]))
+    assert resumed.get_state() == moments.get_state()
+    assert resumed.std == pytest.approx(np.std([1.0, 2.0, 4.0, 8.0]))
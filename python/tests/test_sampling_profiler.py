@@ -0,0 +1,114 @@
+import threading
+
+from sampling_profiler import SamplingProfiler
+
+
+class Base:
+    def handle(self):
+        pass
+
+
+class Calculator(Base):
+    def calc(self):
+        pass
+
+    @staticmethod
+    def kernel():
+        pass
+
+
+def root():
+    pass
+
+
+def leaf():
+    pass
+
+
+def audio_callback_numpy():
+    pass
+
+
+ROOT, LEAF = root.__code__, leaf.__code__
+HANDLE, CALC, KERNEL = Base.handle.__code__, Calculator.calc.__code__, Calculator.kernel.__code__
+
+
+def make_profiler() -> SamplingProfiler:
+    profiler = SamplingProfiler(summary_classes=[Calculator])
+    profiler.stacks[("analysis", (ROOT, HANDLE, CALC, LEAF))] += 3
+    profiler.stacks[("analysis", (ROOT, HANDLE))] += 2
+    profiler.stacks[("analysis", (ROOT, CALC, LEAF, CALC))] += 1  # recursive
+    profiler.stacks[("capture", (ROOT, KERNEL))] += 4
+    profiler.stacks[("publish", (ROOT, LEAF))] += 5
+    return profiler
+
+
+def test_method_names_include_inherited_ones():
+    profiler = SamplingProfiler(summary_classes=[Calculator])
+    assert profiler.method_names == {HANDLE: "Base.handle", CALC: "Calculator.calc", KERNEL: "Calculator.kernel"}
+
+
+def test_collapsed_lines():
+    assert make_profiler().get_collapsed() == [
+        "analysis;test_sampling_profiler.root;Base.handle 2",
+        "analysis;test_sampling_profiler.root;Base.handle;Calculator.calc;test_sampling_profiler.leaf 3",
+        "analysis;test_sampling_profiler.root;Calculator.calc;test_sampling_profiler.leaf;Calculator.calc 1",
+        "capture;test_sampling_profiler.root;Calculator.kernel 4",
+        "publish;test_sampling_profiler.root;test_sampling_profiler.leaf 5",
+    ]
+
+
+def test_collapsed_lines_merge_same_names():
+    profiler = SamplingProfiler()
+    # e.g., functions of the same name in the same module
+    other = LEAF.replace(co_firstlineno=LEAF.co_firstlineno + 1)
+    profiler.stacks[("analysis", (ROOT, LEAF))] += 1
+    profiler.stacks[("analysis", (ROOT, other))] += 2
+    assert profiler.get_collapsed() == ["analysis;test_sampling_profiler.root;test_sampling_profiler.leaf 3"]
+
+
+def test_summary_rows():
+    # total: the method is on the stack (once for recursive calls), own: the innermost summarized method
+    assert make_profiler().get_summary() == [
+        ("analysis", "Base.handle", 5, 2),
+        ("analysis", "Calculator.calc", 4, 4),
+        ("capture", "Calculator.kernel", 4, 4),
+    ]
+    assert make_profiler().get_role_counts() == {"analysis": 6, "capture": 4, "publish": 5}
+
+
+def test_roles_of_threads():
+    profiler = SamplingProfiler()
+    assert profiler.get_role(name="analysis_0", stack=(ROOT,)) == "analysis"
+    assert profiler.get_role(name="capture", stack=(ROOT,)) == "capture"
+    # the callback thread of PortAudio has no name of its own
+    assert profiler.get_role(name="Dummy-1", stack=(audio_callback_numpy.__code__, LEAF)) == "capture"
+    assert profiler.get_role(name="MainThread", stack=(ROOT,)) == "publish"
+    assert profiler.get_role(name="heartbeat", stack=(ROOT,)) is None
+    assert profiler.get_role(name="", stack=()) is None
+
+
+def test_sample_groups_threads_by_role():
+    is_started, is_stopped = threading.Event(), threading.Event()
+
+    def run():
+        is_started.set()
+        is_stopped.wait()
+
+    threads = [threading.Thread(target=run, name=name) for name in ("analysis_0", "heartbeat")]
+    for thread in threads:
+        is_started.clear()
+        thread.start()
+        is_started.wait()
+    profiler = SamplingProfiler()
+    try:
+        profiler.sample(own_ident=threading.get_ident())
+    finally:
+        is_stopped.set()
+        for thread in threads:
+            thread.join()
+    assert profiler.sample_count == 1
+    # the calling thread is skipped as the thread of the profiler
+    assert profiler.get_role_counts() == {"analysis": 1}
+    (role, stack), = profiler.stacks
+    assert run.__code__ in stack
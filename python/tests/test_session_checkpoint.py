@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pytest
+
+from f0_range_tracker import F0RangeTracker
+from rolling_statistics import RunningMoments
+from session_checkpoint import SessionCheckpoint
+from speech_timeline import SpeechTimeline
+from util.exception import CheckpointException
+
+
+def make_components() -> dict:
+    rng = np.random.default_rng(0)
+    moments = RunningMoments()
+    moments.push(values=rng.normal(-30.0, 5.0, 1000))
+    timeline = SpeechTimeline()
+    timeline.push_regions(starts_sec=np.array([0.1, 0.9, 2.0]), ends_sec=np.array([0.5, 1.5, 2.8]),
+                          block_start_sec=0.0, block_end_sec=3.0)
+    times = np.arange(300) * 0.008
+    timeline.push_envelope(rms_db=-30.0 + 10.0 * np.sin(2 * np.pi * 4 * times), times=times, frame_period_sec=0.008)
+    tracker = F0RangeTracker()
+    tracker.update(f0=rng.normal(150.0, 20.0, 500))
+    return {"rms_db_moments": moments, "speech_timeline": timeline, "f0_range_tracker": tracker}
+
+
+def get_state(components: dict) -> dict:
+    # the same layout as `AudioStream.get_checkpoint_state()`
+    state = {"total_voiced_region_num": 3, "total_voiced_time_ms": 1800.5}
+    for prefix, component in components.items():
+        state.update({"{}.{}".format(prefix, key): value for key, value in component.get_state().items()})
+    return state
+
+
+def assert_state_equal(actual: dict, expected: dict) -> None:
+    assert sorted(actual) == sorted(expected)
+    for key, value in expected.items():
+        np.testing.assert_array_equal(actual[key], value, err_msg=key)
+
+
+def test_encode_decode():
+    state = {"count": 3, "mean": 1.5, "histogram": np.arange(10, dtype=np.float64), "matrix": np.ones((2, 3), "<f4")}
+    decoded = SessionCheckpoint.decode(SessionCheckpoint.encode(state))
+    assert_state_equal(actual=decoded, expected=state)
+    assert decoded["matrix"].dtype == np.float32
+
+
+def test_write_load_round_trip(tmp_path):
+    components = make_components()
+    state = get_state(components=components)
+    path = str(tmp_path / "nested" / "session.ckpt")
+    checkpoint = SessionCheckpoint(file_path=path, interval_sec=10.0)
+    checkpoint.close(state=state)
+    assert checkpoint.saved_count == 1
+    assert not os.path.exists(path + ".tmp")
+    loaded = SessionCheckpoint.load(file_path=path)
+    assert_state_equal(actual=loaded, expected=state)
+    # components resume from the loaded state
+    resumed = {"rms_db_moments": RunningMoments(), "speech_timeline": SpeechTimeline(),
+               "f0_range_tracker": F0RangeTracker()}
+    for prefix, component in resumed.items():
+        component.set_state({key[len(prefix) + 1:]: value for key, value in loaded.items()
+                             if key.startswith(prefix + ".")})
+    assert_state_equal(actual=get_state(components=resumed), expected=state)
+    assert resumed["speech_timeline"].get()["total_syllable_num"] == components["speech_timeline"].syllable_num
+    assert resumed["f0_range_tracker"].is_wide_next
+
+
+def test_latest_state_replaces_checkpoint(tmp_path):
+    path = str(tmp_path / "session.ckpt")
+    checkpoint = SessionCheckpoint(file_path=path, interval_sec=0.0)
+    assert checkpoint.is_due()
+    checkpoint.save(state={"total_voiced_region_num": 1})
+    checkpoint.close(state={"total_voiced_region_num": 2})
+    checkpoint.close()  # does nothing
+    assert SessionCheckpoint.load(file_path=path)["total_voiced_region_num"] == 2
+
+
+def test_invalid_checkpoint_is_rejected(tmp_path):
+    data = SessionCheckpoint.encode(get_state(components=make_components()))
+    corrupted = bytearray(data)
+    corrupted[-1] ^= 0xFF
+    with pytest.raises(CheckpointException):
+        SessionCheckpoint.decode(bytes(corrupted))
+    with pytest.raises(CheckpointException):
+        SessionCheckpoint.decode(data[:SessionCheckpoint.HEADER_BYTES - 1])
+    with pytest.raises(CheckpointException):
+        SessionCheckpoint.decode(b"XXXX" + data[4:])
+    path = tmp_path / "session.ckpt"
+    path.write_bytes(bytes(corrupted))
+    assert SessionCheckpoint.load(file_path=str(path)) is None
+    assert SessionCheckpoint.load(file_path=str(tmp_path / "missing.ckpt")) is None
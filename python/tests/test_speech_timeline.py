@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from audio_kernels import _envelope_peaks_loop, calc_envelope_peaks_kernel
+from speech_timeline import SpeechTimeline
+
+FRAME_PERIOD_SEC = 0.008
+
+
+def make_envelope(duration_sec: float, rate_hz: float = 4.0, start_sec: float = 0.0):
+    times = start_sec + np.arange(int(round(duration_sec / FRAME_PERIOD_SEC))) * FRAME_PERIOD_SEC
+    return -30.0 + 6.0 * np.sin(2 * np.pi * rate_hz * (times - start_sec)), times
+
+
+def push_in_blocks(timeline: SpeechTimeline, rms_db: np.ndarray, times: np.ndarray, sizes) -> None:
+    offset = 0
+    for size in list(sizes) + [len(rms_db)]:
+        timeline.push_envelope(rms_db=rms_db[offset:offset + size], times=times[offset:offset + size],
+                               frame_period_sec=FRAME_PERIOD_SEC)
+        offset = min(offset + size, len(rms_db))
+
+
+def count_syllables(rms_db: np.ndarray, times: np.ndarray, sizes=(), **kwargs) -> int:
+    timeline = SpeechTimeline(**kwargs)
+    push_in_blocks(timeline=timeline, rms_db=rms_db, times=times, sizes=sizes)
+    return timeline.syllable_num
+
+
+def test_syllables_of_modulated_envelope():
+    # 12 peaks of 4 Hz in 3 sec, whose last one falls before the end
+    rms_db, times = make_envelope(duration_sec=3.0)
+    timeline = SpeechTimeline()
+    timeline.push_envelope(rms_db=rms_db, times=times, frame_period_sec=FRAME_PERIOD_SEC)
+    assert timeline.syllable_num == 12
+    assert timeline.get()["articulation_rate_total"] == pytest.approx(4.0)
+
+
+@pytest.mark.parametrize("sizes", [[1] * 50, [7, 100, 3, 31], [125, 125]])
+def test_syllables_continue_over_blocks(sizes):
+    rms_db, times = make_envelope(duration_sec=3.0)
+    assert count_syllables(rms_db=rms_db, times=times, sizes=sizes) == count_syllables(rms_db=rms_db, times=times)
+
+
+def test_detector_restarts_after_gap():
+    # two utterances apart by a pause, where the last peak before the pause is counted without falling
+    first_db, first_times = make_envelope(duration_sec=1.0 + 1 / 16)  # ends at a peak
+    second_db, second_times = make_envelope(duration_sec=1.0, start_sec=2.0)
+    rms_db, times = np.concatenate([first_db, second_db]), np.concatenate([first_times, second_times])
+    assert count_syllables(rms_db=first_db, times=first_times) == 4
+    assert count_syllables(rms_db=rms_db, times=times) == 9
+    assert count_syllables(rms_db=rms_db, times=times, sizes=[len(first_db)]) == 9
+
+
+def test_min_interval_between_syllables():
+    # peaks of 20 Hz are too close to be syllables
+    rms_db, times = make_envelope(duration_sec=2.0, rate_hz=20.0)
+    count = count_syllables(rms_db=rms_db, times=times, smoothing_sec=0.001, min_syllable_sec=0.1)
+    assert 0 < count <= 2.0 / 0.1 + 1
+    assert count_syllables(rms_db=rms_db, times=times, smoothing_sec=0.001, min_syllable_sec=0.0) == 40
+
+
+def test_digital_silence_is_skipped():
+    rms_db, times = make_envelope(duration_sec=3.0)
+    is_silent = np.zeros(len(rms_db), dtype=bool)
+    is_silent[100] = is_silent[200] = is_silent[300] = True  # single frames, which don't make a gap
+    silent_db = np.where(is_silent, -np.inf, rms_db)
+    timeline = SpeechTimeline()
+    push_in_blocks(timeline=timeline, rms_db=silent_db, times=times, sizes=[100, 1, 99])
+    assert timeline.syllable_num == count_syllables(rms_db=rms_db[~is_silent], times=times[~is_silent]) == 12
+    assert np.all(np.isfinite(timeline.peak_state))
+    # a block of digital silence only counts nothing
+    assert count_syllables(rms_db=np.full(100, -np.inf), times=np.arange(100) * FRAME_PERIOD_SEC) == 0
+
+
+def test_kernel_matches_python_loop():
+    rng = np.random.default_rng(0)
+    rms_db = -30.0 + 6.0 * rng.normal(size=2000)
+    rms_db[rng.random(2000) < 0.05] = -np.inf
+    times = np.cumsum(np.where(rng.random(2000) < 0.02, 0.5, FRAME_PERIOD_SEC))
+    results = []
+    for peaks in (calc_envelope_peaks_kernel, _envelope_peaks_loop):
+        state = np.array([0.0, 0.0, 0.0, 0.0, 0.0, -np.inf, np.nan])
+        count = sum(peaks(rms_db[i:i + 100], times[i:i + 100], state, 0.3, 2.0, 0.1, 1.5 * FRAME_PERIOD_SEC)
+                    for i in range(0, 2000, 100))
+        results.append((count, state))
+    assert results[0][0] == results[1][0] > 0
+    np.testing.assert_array_equal(results[0][1], results[1][1])
+
+
+def test_pause_spans_block_boundary():
+    timeline = SpeechTimeline(min_pause_sec=0.2)
+    timeline.push_regions(starts_sec=np.array([0.1]), ends_sec=np.array([0.9]), block_start_sec=0.0,
+                          block_end_sec=1.0)
+    res = timeline.get()
+    assert res["total_pause_num"] == 0
+    assert res["current_pause_ms"] == pytest.approx(100.0)
+    # the region of the next block starts 0.6 sec after the last one
+    timeline.push_regions(starts_sec=np.array([1.5, 1.8]), ends_sec=np.array([1.7, 1.95]), block_start_sec=1.0,
+                          block_end_sec=2.0)
+    res = timeline.get()
+    assert res["total_pause_num"] == 1  # the gap of 0.1 sec is within speech
+    assert res["last_pause_ms"] == pytest.approx(600.0)
+    assert res["current_pause_ms"] == pytest.approx(50.0)
+    timeline.push_regions(starts_sec=np.array([]), ends_sec=np.array([]), block_start_sec=2.0, block_end_sec=3.0)
+    timeline.push_regions(starts_sec=np.array([3.25]), ends_sec=np.array([3.5]), block_start_sec=3.0,
+                          block_end_sec=4.0)
+    res = timeline.get()
+    assert res["total_pause_num"] == 2
+    assert res["last_pause_ms"] == pytest.approx(1300.0)
+    assert res["average_pause_ms_total"] == pytest.approx(950.0)
+    assert res["std_pause_ms_total"] == pytest.approx(350.0)
+    assert res["max_pause_ms_total"] == pytest.approx(1300.0)
+    assert res["current_pause_ms"] == pytest.approx(500.0)
+
+
+def test_voiced_unvoiced_ratio_and_rates():
+    timeline = SpeechTimeline()
+    assert timeline.get()["current_pause_ms"] == 0.0
+    assert timeline.get()["voiced_unvoiced_ratio_total"] == 0.0
+    timeline.push_regions(starts_sec=np.array([0.0, 1.5]), ends_sec=np.array([1.0, 2.0]), block_start_sec=0.0,
+                          block_end_sec=2.0)
+    rms_db, times = make_envelope(duration_sec=1.0)  # envelope of the first region
+    timeline.push_envelope(rms_db=rms_db, times=times, frame_period_sec=FRAME_PERIOD_SEC)
+    res = timeline.get()
+    assert res["voiced_unvoiced_ratio_total"] == pytest.approx(1.5 / 0.5)
+    assert res["total_syllable_num"] == 4
+    assert res["articulation_rate_total"] == pytest.approx(4.0)
+    # the pause of 0.5 sec is counted in speaking time
+    assert res["speech_rate_total"] == pytest.approx(4.0 * 1.5 / 2.0)
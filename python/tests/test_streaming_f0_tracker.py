@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from streaming_f0_tracker import StreamingF0Tracker
+
+SAMPLE_RATE = 16000
+
+
+def make_voice(seconds: float) -> np.ndarray:
+    """
+    Synthetic voice, i.e., harmonic tone whose f0 varies slowly.
+    """
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    phase = 2 * np.pi * np.cumsum(150.0 + 30.0 * np.sin(2 * np.pi * 0.5 * t)) / SAMPLE_RATE
+    tone = sum(np.sin(k * phase) / k for k in range(1, 6))
+    return 0.3 * tone / np.max(np.abs(tone))
+
+
+def stream(tracker: StreamingF0Tracker, estimate, samples: np.ndarray, chunk_sec: float) -> np.ndarray:
+    tracker.reset(estimate=estimate, frame_period_sec=0.005)
+    chunk = int(chunk_sec * SAMPLE_RATE)
+    contours = [tracker.push(samples=samples[i:i + chunk]) for i in range(0, len(samples), chunk)]
+    return np.concatenate(contours + [tracker.flush()])
+
+
+@pytest.mark.parametrize("chunk_sec", [0.05, 0.25, 1.0, 1.7])
+def test_frames_are_on_the_grid_of_the_utterance(chunk_sec):
+    # samples are their times, and the estimator returns times of frames (inclusive like Harvest),
+    # so frames tell where they were taken from
+    time = np.arange(3 * SAMPLE_RATE, dtype=np.float64) / SAMPLE_RATE
+
+    def estimate(segment):
+        return segment[0] + np.arange(len(segment) // int(0.005 * SAMPLE_RATE) + 1) * 0.005
+
+    whole = estimate(time)
+    streamed = stream(tracker=StreamingF0Tracker(sample_rate=SAMPLE_RATE), estimate=estimate, samples=time,
+                      chunk_sec=chunk_sec)
+    np.testing.assert_allclose(streamed, whole, atol=1e-9)
+
+
+def test_frames_are_emitted_while_audio_arrives():
+    tracker = StreamingF0Tracker(sample_rate=SAMPLE_RATE, window_sec=0.5, lookahead_sec=0.1)
+    tracker.reset(estimate=lambda segment: np.ones(len(segment) // 80 + 1), frame_period_sec=0.005)
+    emitted = [len(tracker.push(samples=np.zeros(SAMPLE_RATE // 4))) for _ in range(8)]
+    assert sum(emitted[:3]) == 100  # the first window (0.5 sec) after its lookahead (0.6 sec)
+    assert sum(emitted) == 300  # every window but the last, which waits for its lookahead
+    assert len(tracker.flush()) == 101
+
+
+def test_streaming_matches_whole_region_harvest():
+    pytest.importorskip("librosa")
+    pytest.importorskip("pyworld")
+    from audio_calculator import AudioCalculator
+    audio_calculator = AudioCalculator()
+    voice = make_voice(seconds=3.0)
+
+    def estimate(samples):
+        return audio_calculator.calc_f0_harvest(voiced_audio_data=samples, sample_rate=SAMPLE_RATE)
+
+    whole = estimate(voice)
+    streamed = stream(tracker=StreamingF0Tracker(sample_rate=SAMPLE_RATE), estimate=estimate, samples=voice,
+                      chunk_sec=0.25)
+    assert len(streamed) == len(whole)
+    is_voiced = (whole > 0.0) & (streamed > 0.0)
+    assert np.mean(is_voiced == (whole > 0.0)) > 0.99
+    assert np.max(np.abs(whole[is_voiced] - streamed[is_voiced])) < 1.0
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+
+from scipy import signal  # noqa: E402
+
+from streaming_resampler import StreamingResampler  # noqa: E402
+
+OUTPUT_RATE = 16000
+
+
+def make_tone(sample_rate: int, duration_sec: float = 1.0) -> np.ndarray:
+    t = np.arange(int(sample_rate * duration_sec)) / sample_rate
+    rng = np.random.default_rng(0)
+    return 0.5 * np.sin(2 * np.pi * 220.0 * t) + 0.2 * np.sin(2 * np.pi * 1500.0 * t) + 0.01 * rng.normal(size=t.size)
+
+
+def resample_in_blocks(resampler: StreamingResampler, samples: np.ndarray, sizes) -> np.ndarray:
+    outputs, offset = [], 0
+    for size in sizes:
+        outputs.append(resampler.process(samples[offset:offset + size]))
+        offset += size
+    outputs.append(resampler.process(samples[offset:]))
+    return np.concatenate(outputs)
+
+
+@pytest.mark.parametrize("input_rate", [44100, 48000, 8000])
+@pytest.mark.parametrize("sizes", [[1, 2, 3, 441, 1000], [512] * 40, [4096, 0, 7, 4095]])
+def test_blocks_equal_whole_stream(input_rate, sizes):
+    samples = make_tone(sample_rate=input_rate)
+    whole = StreamingResampler(input_rate=input_rate, output_rate=OUTPUT_RATE).process(samples)
+    resampler = StreamingResampler(input_rate=input_rate, output_rate=OUTPUT_RATE, chunk_size=100)
+    blocks = resample_in_blocks(resampler=resampler, samples=samples, sizes=sizes)
+    assert blocks.size == whole.size == resampler.output_count
+    np.testing.assert_allclose(blocks, whole, rtol=0, atol=1e-12)
+    # the whole stream is resampled at the output rate
+    assert abs(whole.size - samples.size * OUTPUT_RATE / input_rate) <= 1
+
+
+@pytest.mark.parametrize("input_rate", [44100, 48000, 8000])
+def test_whole_stream_equals_polyphase_filter(input_rate):
+    samples = make_tone(sample_rate=input_rate)
+    resampler = StreamingResampler(input_rate=input_rate, output_rate=OUTPUT_RATE)
+    res = resampler.process(samples)
+    # `H[p, j] = h[p + j * up]`, and the history before the stream is silence
+    h = resampler.polyphase.T.reshape(-1)
+    expected = signal.upfirdn(h, samples, up=resampler.up, down=resampler.down)[:res.size]
+    np.testing.assert_allclose(res, expected, rtol=0, atol=1e-12)
+    # the tone passes through the filter after its delay
+    delay = int(round(resampler.delay_sec * OUTPUT_RATE))
+    t = (np.arange(res.size) - delay) / OUTPUT_RATE
+    reference = 0.5 * np.sin(2 * np.pi * 220.0 * t) + 0.2 * np.sin(2 * np.pi * 1500.0 * t)
+    steady = slice(2 * delay + 10, res.size - 10)
+    assert np.sqrt(np.mean((res[steady] - reference[steady]) ** 2)) < 0.05
+
+
+@pytest.mark.parametrize("input_rate", [44100, 48000, 8000])
+def test_int16_blocks_equal_whole_stream(input_rate):
+    samples = (make_tone(sample_rate=input_rate) * 2 ** 15).astype(np.int16)
+    whole = StreamingResampler(input_rate=input_rate, output_rate=OUTPUT_RATE).process(samples.reshape(-1, 1))
+    resampler = StreamingResampler(input_rate=input_rate, output_rate=OUTPUT_RATE)
+    blocks = resample_in_blocks(resampler=resampler, samples=samples, sizes=[input_rate // 10] * 9)
+    assert blocks.dtype == whole.dtype == np.int16
+    np.testing.assert_array_equal(blocks, whole)
+
+
+def test_same_rate_is_bypassed():
+    resampler = StreamingResampler(input_rate=OUTPUT_RATE, output_rate=OUTPUT_RATE)
+    samples = make_tone(sample_rate=OUTPUT_RATE)
+    assert resampler.is_bypass
+    np.testing.assert_array_equal(resampler.process(samples), samples)
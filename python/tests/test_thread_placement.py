@@ -0,0 +1,43 @@
+import os
+import threading
+
+import pytest
+
+from thread_placement import ThreadPlacement
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "sched_getaffinity"), reason="CPU affinity isn't available")
+
+
+def run_in_thread(target) -> None:
+    thread = threading.Thread(target=target)
+    thread.start()
+    thread.join()
+
+
+def test_unplaced_roles_keep_cpus_of_process():
+    cpus = sorted(os.sched_getaffinity(0))
+    if len(cpus) < 2:
+        pytest.skip("needs 2 CPUs at least")
+    placements = {}
+
+    def publish():
+        # the analysis thread is created by the pinned publishing thread, like the executor of `AudioRuntime`
+        placement = ThreadPlacement(publish_cpus=[cpus[-1]])
+        placement.place_publish()
+        placements["publish"] = os.sched_getaffinity(0)
+        run_in_thread(lambda: (placement.place_analysis(), placements.update(analysis=os.sched_getaffinity(0))))
+
+    run_in_thread(publish)
+    assert placements["publish"] == {cpus[-1]}
+    assert placements["analysis"] == set(cpus)
+
+
+def test_f0_workers_without_cpus_get_cpus_of_process():
+    placement = ThreadPlacement()
+    assert placement.get_f0_worker_cpus(index=0) == sorted(os.sched_getaffinity(0))
+    placement = ThreadPlacement(f0_worker_cpus=[0, 2])
+    assert [placement.get_f0_worker_cpus(index=i) for i in range(3)] == [[0], [2], [0]]
+
+
+def test_format_cpus():
+    assert ThreadPlacement.format_cpus([3, 0, 1, 2, 6]) == "0-3,6"
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import socket
+
+import pytest
+
+zmq = pytest.importorskip("zmq")
+
+import zmq.asyncio  # noqa: E402
+
+from feature_record import FeatureRecord  # noqa: E402
+from util.zeromq_sender import ZeroMQSender  # noqa: E402
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def subscribe(context, port: int, features, rcvhwm: int = 1000):
+    client = context.socket(zmq.DEALER)
+    client.setsockopt(zmq.RCVHWM, rcvhwm)
+    client.connect("tcp://127.0.0.1:{}".format(port))
+    await client.send(json.dumps({"command": "subscribe", "features": features}).encode("ascii"))
+    reply = json.loads(await asyncio.wait_for(client.recv(), timeout=5.0))
+    assert reply["ok"]
+    return client
+
+
+def test_stalled_client_doesnt_block_others():
+    async def run():
+        control_port = get_free_port()
+        sender = ZeroMQSender()
+        sender.initialize_connection(port_number=str(get_free_port()))
+        record = FeatureRecord()
+        # small queues, so that the stalled client fills its queue soon
+        sender.initialize_control(schema=record.get_schema(), port_number=str(control_port), is_broadcast=False,
+                                  max_queued_messages=10)
+        control = asyncio.create_task(sender.serve_control())
+        context = zmq.asyncio.Context.instance()
+        stalled = await subscribe(context=context, port=control_port, features=["averageF0"], rcvhwm=10)
+        reader = await subscribe(context=context, port=control_port, features=["averageF0"])
+        received = []
+
+        async def read():
+            while True:
+                received.append(json.loads(await reader.recv()))
+
+        reading = asyncio.create_task(read())
+        try:
+            record["average_f0"] = 100.0
+            for _ in range(20000):
+                # a blocking send would wait here forever
+                await asyncio.wait_for(sender.send_subscriptions(record=record), timeout=1.0)
+                await asyncio.sleep(0)
+                if any(subscription.dropped_count > 0 for subscription in sender.subscriptions.values()):
+                    break
+            # the stalled client loses messages, but stays subscribed
+            assert len(sender.subscriptions) == 2
+            assert any(subscription.dropped_count > 0 for subscription in sender.subscriptions.values())
+            # the reading client still receives the latest record
+            await asyncio.sleep(0.2)
+            record["average_f0"] = 200.0
+            await sender.send_subscriptions(record=record)
+            for _ in range(100):
+                if received and received[-1]["averageF0"] == 200.0:
+                    break
+                await asyncio.sleep(0.05)
+            assert received[-1]["averageF0"] == 200.0
+        finally:
+            reading.cancel()
+            control.cancel()
+            await asyncio.gather(reading, control, return_exceptions=True)
+            stalled.close(linger=0)
+            reader.close(linger=0)
+            sender.close()
+
+    asyncio.run(run())
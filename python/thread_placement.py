@@ -0,0 +1,173 @@
+import os
+import threading
+from typing import Dict, List, Sequence, Union
+
+from util.logger import Logger
+
+
+class ThreadPlacement:
+    """
+    Place threads of the pipeline on CPUs, so that noisy neighbours on shared hosts don't make callbacks miss deadlines.
+        capture: The callback thread of the device (or the replay thread), which can also get `SCHED_FIFO` or niceness.
+        analysis: The thread of `AudioRuntime` which runs `AudioStream.handle_block()`.
+        publish: The event loop of `AudioRuntime` (the main thread), which publishes with ZeroMQ.
+        f0 workers: Processes of `F0WorkerPool`, which are assigned CPUs in turn.
+    Each thread places itself (Linux applies affinity and scheduling of pid 0 to the calling thread),
+    and the effective placement is read back and reported, since requests may be refused without privileges.
+    Threads inherit the affinity of the thread which creates them (e.g., the analysis thread is created by the
+    publishing one), so roles without CPUs are placed on the CPUs of the process when this is created.
+    Args:
+        capture_cpus: CPUs of the capture thread (CPUs of the process if empty).
+        analysis_cpus: CPUs of the analysis thread.
+        publish_cpus: CPUs of the publishing thread.
+        f0_worker_cpus: CPUs for f0 workers, one for each worker in turn.
+        capture_priority: Priority of `SCHED_FIFO` for the capture thread (1-99, or 0 for the default policy).
+        capture_nice: Niceness of the capture thread (e.g., -10), which is used if `SCHED_FIFO` isn't requested.
+    Notes:
+        Placement is available only on Linux, and requests are just reported elsewhere.
+        `SCHED_FIFO` and negative niceness need `CAP_SYS_NICE` or `rtprio`/`nice` limits (`/etc/security/limits.conf`).
+    """
+    POLICIES: Dict[int, str] = {getattr(os, name): name for name in ("SCHED_OTHER", "SCHED_FIFO", "SCHED_RR",
+                                                                     "SCHED_BATCH", "SCHED_IDLE")
+                                if hasattr(os, name)}
+
+    def __init__(self, capture_cpus: Sequence[int] = None, analysis_cpus: Sequence[int] = None,
+                 publish_cpus: Sequence[int] = None, f0_worker_cpus: Sequence[int] = None, capture_priority: int = 0,
+                 capture_nice: Union[int, None] = None):
+        self.logger = Logger(name=__name__)
+        self.capture_cpus: List[int] = list(capture_cpus or [])
+        self.analysis_cpus: List[int] = list(analysis_cpus or [])
+        self.publish_cpus: List[int] = list(publish_cpus or [])
+        self.f0_worker_cpus: List[int] = list(f0_worker_cpus or [])
+        self.capture_priority = capture_priority
+        self.capture_nice = capture_nice
+        # CPUs of the process before placement, for roles without CPUs
+        self.original_cpus: List[int] = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else []
+        self.placements: Dict[str, str] = {}  # role -> effective placement
+        self.pool_limits = None  # keeps limits of `threadpoolctl`
+        self.is_capture_placed: bool = False
+
+    @staticmethod
+    def format_cpus(cpus: Sequence[int]) -> str:
+        """
+        Compact list of CPUs, e.g., `0-3,6`.
+        """
+        cpus = sorted(set(cpus))
+        ranges = []
+        for cpu in cpus:
+            if ranges and cpu == ranges[-1][1] + 1:
+                ranges[-1][1] = cpu
+            else:
+                ranges.append([cpu, cpu])
+        return ",".join(str(low) if low == high else "{}-{}".format(low, high) for low, high in ranges)
+
+    def place(self, role: str, cpus: Sequence[int] = (), priority: int = 0, nice: Union[int, None] = None) -> None:
+        """
+        Place the calling thread, and record its effective placement.
+        """
+        if cpus:
+            try:
+                os.sched_setaffinity(0, cpus)
+            except AttributeError:
+                self.logger.logger.warning("CPU affinity isn't supported on this platform.")
+            except OSError:
+                self.logger.logger.exception("Failed to pin {} thread to CPUs {}.".format(role, list(cpus)))
+        if priority > 0:
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            except AttributeError:
+                self.logger.logger.warning("SCHED_FIFO isn't supported on this platform.")
+            except OSError:  # e.g., PermissionError without CAP_SYS_NICE
+                self.logger.logger.warning("SCHED_FIFO ({}) for {} thread is refused, which needs CAP_SYS_NICE "
+                                           "or rtprio limit.".format(priority, role))
+        if nice is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+            except AttributeError:
+                self.logger.logger.warning("Niceness of threads isn't supported on this platform.")
+            except OSError:
+                self.logger.logger.warning("Niceness {} for {} thread is refused.".format(nice, role))
+        self.placements[role] = self.get_current()
+        self.logger.logger.info("{} thread is placed: {}".format(role, self.placements[role]))
+
+    def get_current(self) -> str:
+        """
+        Effective placement of the calling thread.
+        """
+        if not hasattr(os, "sched_getaffinity"):
+            return "tid {} (placement isn't available)".format(threading.get_native_id())
+        tid = threading.get_native_id()
+        policy = os.sched_getscheduler(0)
+        return "tid {}, cpus {}, {} (priority {}), nice {}".format(
+            tid, self.format_cpus(os.sched_getaffinity(0)), self.POLICIES.get(policy, policy),
+            os.sched_getparam(0).sched_priority, os.getpriority(os.PRIO_PROCESS, tid))
+
+    def place_capture(self) -> None:
+        """
+        Place the capture thread, which should be called once from the first callback.
+        """
+        self.is_capture_placed = True
+        self.place(role="capture", cpus=self.capture_cpus or self.original_cpus, priority=self.capture_priority,
+                   nice=self.capture_nice if self.capture_priority <= 0 else None)
+
+    def place_analysis(self) -> None:
+        self.place(role="analysis", cpus=self.analysis_cpus or self.original_cpus)
+
+    def place_publish(self) -> None:
+        self.place(role="publish", cpus=self.publish_cpus or self.original_cpus)
+
+    def get_f0_worker_cpus(self, index: int) -> List[int]:
+        """
+        CPUs of the `index`-th f0 worker (CPUs of the process if `f0_worker_cpus` is empty).
+        """
+        if not self.f0_worker_cpus:
+            return list(self.original_cpus)
+        return [self.f0_worker_cpus[index % len(self.f0_worker_cpus)]]
+
+    def limit_thread_pools(self, num_threads: int) -> None:
+        """
+        Limit thread pools of BLAS/OpenMP (`threadpoolctl`) and numba, so that they don't oversubscribe CPUs
+        with the pipeline threads. Worker processes started after this inherit the limits by the environment.
+        """
+        for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMBA_NUM_THREADS"):
+            os.environ[name] = str(num_threads)
+        try:
+            from threadpoolctl import threadpool_limits
+            self.pool_limits = threadpool_limits(limits=num_threads)
+        except ImportError:
+            self.logger.logger.warning("threadpoolctl isn't available, so BLAS threads aren't limited.")
+        try:
+            import numba
+            numba.set_num_threads(min(num_threads, numba.config.NUMBA_NUM_THREADS))
+        except ImportError:
+            pass
+
+    def get_thread_pools(self) -> List[str]:
+        """
+        Thread pools of loaded libraries, e.g., `openblas (blas): 1 threads`.
+        """
+        pools = []
+        try:
+            from threadpoolctl import threadpool_info
+            pools += ["{} ({}): {} threads".format(info.get("internal_api"), info.get("user_api"),
+                                                   info.get("num_threads")) for info in threadpool_info()]
+        except ImportError:
+            pass
+        try:
+            import numba
+            pools.append("numba: {} threads".format(numba.get_num_threads()))
+        except ImportError:
+            pass
+        return pools
+
+    def report(self) -> None:
+        """
+        Log the effective placement of threads placed so far, the f0 workers and thread pools.
+        """
+        lines = ["{:<10} {}".format(role, placement) for role, placement in self.placements.items()]
+        if "capture" not in self.placements:
+            lines.append("{:<10} (placed on the first callback)".format("capture"))
+        if self.f0_worker_cpus:
+            lines.append("{:<10} cpus {} in turn".format("f0 worker", self.format_cpus(self.f0_worker_cpus)))
+        lines += ["{:<10} {}".format("pool", pool) for pool in self.get_thread_pools()]
+        self.logger.logger.info("Placement of threads:\n" + "\n".join(lines))
@@ -1,3 +1,10 @@
-# library of dependencies
-import sounddevice as sd
+import os
+
+# persist numba-compiled functions (e.g. librosa's jit kernels) across runs.
+# this must be set before `numba` is imported anywhere, i.e., before `librosa`.
+# the path is relative to this package, so that it doesn't depend on the working directory.
+os.environ.setdefault("NUMBA_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))), "etc", "numba_cache"))
 
+# library of dependencies
+import sounddevice as sd  # noqa: E402
@@ -36,3 +36,18 @@ class GotNanException(Exception):
 class IncorrectChannelNumberException(Exception):
     def __init__(self, message):
         super(IncorrectChannelNumberException, self).__init__(message)
+
+
+class FeatureGraphException(Exception):
+    def __init__(self, message):
+        super(FeatureGraphException, self).__init__(message)
+
+
+class CheckpointException(Exception):
+    def __init__(self, message):
+        super(CheckpointException, self).__init__(message)
+
+
+class SharedMemoryInUseException(Exception):
+    def __init__(self, message):
+        super(SharedMemoryInUseException, self).__init__(message)
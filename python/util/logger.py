@@ -1,21 +1,125 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Dict, List, Tuple, Union
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limit repeated records from the same line within `interval_sec`, e.g., warnings for every block.
+    Warnings are limited to `warning_budget` records per window, and errors (including exceptions) have
+    the looser `error_budget`, so that failures aren't hidden. Records under WARNING are never limited.
+    The number of suppressed records is appended to the first record after the window, or logged by `flush()`.
+    Args:
+        interval_sec: Duration of the window of each line.
+        warning_budget: Warnings which pass in each window.
+        error_budget: Errors which pass in each window.
+    """
+
+    def __init__(self, interval_sec: float = 10.0, warning_budget: int = 1, error_budget: int = 10):
+        super().__init__()
+        self.interval_sec = interval_sec
+        self.warning_budget = warning_budget
+        self.error_budget = error_budget
+        self._lock = threading.Lock()
+        # key -> [start of the window, passed count, suppressed count, the last suppressed record]
+        self._windows: Dict[Tuple[str, str, int], List] = {}
+
+    def get_budget(self, levelno: int) -> Union[int, None]:
+        if levelno < logging.WARNING:
+            return None
+        return self.warning_budget if levelno < logging.ERROR else self.error_budget
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        budget = self.get_budget(record.levelno)
+        if budget is None:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        suppressed = 0
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval_sec:
+                suppressed = window[2] if window is not None else 0
+                self._windows[key] = [now, 1, 0, None]
+            elif window[1] < budget:
+                window[1] += 1
+            else:
+                window[2] += 1
+                window[3] = record
+                return False
+        if suppressed > 0:
+            record.msg = "{} ({} similar records were suppressed)".format(record.msg, suppressed)
+        return True
+
+    def flush(self) -> List[logging.LogRecord]:
+        """
+        Summaries of records suppressed in the current windows, e.g., to be logged when exiting.
+        """
+        summaries = []
+        with self._lock:
+            for window in self._windows.values():
+                if window[2] > 0:
+                    last = window[3]
+                    summaries.append(logging.makeLogRecord(dict(
+                        last.__dict__, msg="{} similar records were suppressed, the last one: {}".format(
+                            window[2], last.getMessage()), args=None, exc_info=None, exc_text=None)))
+                    window[2] = 0
+        return summaries
 
 
 class Logger:
     """
     This class defines the format of logger.
+    Records are put into a queue by the caller (e.g., audio callback), and written by a background listener,
+    so that I/O of the console never blocks the real-time path.
+    Handlers are set up only once for each name, however many times this class is instantiated.
     """
+    FORMAT: str = '%(levelname)-8s: %(asctime)s | %(filename)-12s - %(funcName)-12s : %(lineno)-4s -- %(message)s'
+    DATE_FORMAT: str = '%Y-%m-%d %H:%M:%S'
+
+    _lock = threading.Lock()
+    _queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _listener: Union[logging.handlers.QueueListener, None] = None
+    _queue_handler: Union[logging.handlers.QueueHandler, None] = None
+    _rate_limit_filter: RateLimitFilter = RateLimitFilter()
 
     def __init__(self, name: str):
         # logger setting
         self.logger = logging.getLogger(name)
-        self.logger.setLevel(logging.DEBUG)
+        with Logger._lock:
+            if Logger._listener is None:
+                Logger._start_listener()
+            if Logger._queue_handler not in self.logger.handlers:
+                self.logger.setLevel(logging.DEBUG)
+                self.logger.addHandler(Logger._queue_handler)
+
+    @classmethod
+    def _start_listener(cls) -> None:
         stream_handler = logging.StreamHandler()
         stream_handler.setLevel(logging.DEBUG)
         # adding formatter
-        formatter = logging.Formatter(
-            '%(levelname)-8s: %(asctime)s | %(filename)-12s - %(funcName)-12s : %(lineno)-4s -- %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S')
-        stream_handler.setFormatter(formatter)
-        # adding handler
-        self.logger.addHandler(stream_handler)
+        stream_handler.setFormatter(logging.Formatter(cls.FORMAT, datefmt=cls.DATE_FORMAT))
+        if cls._queue_handler is None:
+            cls._queue_handler = logging.handlers.QueueHandler(cls._queue)
+            cls._queue_handler.addFilter(cls._rate_limit_filter)
+        cls._listener = logging.handlers.QueueListener(cls._queue, stream_handler, respect_handler_level=True)
+        cls._listener.start()
+        # write the remaining records when exiting
+        atexit.register(cls.stop)
+
+    @classmethod
+    def stop(cls) -> None:
+        """
+        Flush queued records and stop the listener thread.
+        """
+        with cls._lock:
+            if cls._listener is not None:
+                # counts of suppressed records bypass the filter
+                for record in cls._rate_limit_filter.flush():
+                    cls._queue_handler.emit(record)
+                cls._listener.stop()
+                cls._listener = None
@@ -7,10 +7,10 @@ class Profile:
     """
     args = None
     is_input_device_set = False
-    is_init = True  # this is for `self.region_concat` to initialize
-    is_writable = False  # for saving streaming audio
     f0_estimation_methods: str = "Harvest"  # the way to estimate f0
+    analysis_dtype: str = "float64"  # precision of front-end, stft and rms ("float32" or "float64")
 
     @classmethod
     def set_args(cls, args):
         Profile.args = args
+        Profile.analysis_dtype = args.precision
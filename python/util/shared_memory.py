@@ -0,0 +1,18 @@
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to existing shared memory without registering it to `resource_tracker`.
+    Notes:
+        `SharedMemory` registers even the attached memory, so that the tracker would unlink it
+        when the attaching (consumer) process exits, while the creator is still using it.
+        Only the creator should be responsible for `unlink()`.
+    """
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name, create=False)
+    finally:
+        resource_tracker.register = register
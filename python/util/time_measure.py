@@ -9,3 +9,10 @@ class TimeMeasure:
     @classmethod
     def get_process_time(cls) -> float:
         return time.process_time()
+
+    @classmethod
+    def get_perf_counter(cls) -> float:
+        """
+        Wall-clock time with the highest available resolution, which is for measuring durations.
+        """
+        return time.perf_counter()
@@ -1,32 +1,64 @@
 import json
-from typing import Dict, Any
-import pprint
+from typing import Dict, Any, FrozenSet, List, Sequence, Tuple
 
 import zmq
 from zmq.asyncio import Context
-from tornado.ioloop import IOLoop
 
 from .logger import Logger
 from .time_measure import TimeMeasure
 
 
+class Subscription:
+    """
+    Feature subset, update rate and encoding requested by a client on the control socket.
+    Args:
+        identity: Routing id of the client (DEALER socket).
+        keys: Field names (snake case) of `FeatureRecord` to be sent.
+        interval_sec: Minimum interval of messages, i.e., 1 / rate.
+        encoding: `json` (camel case keys) or `binary` (packed record, see the reply of `subscribe`).
+    """
+
+    def __init__(self, identity: bytes, keys: Sequence[str], interval_sec: float = 0.0, encoding: str = "json"):
+        self.identity = identity
+        self.keys: List[str] = list(keys)
+        self.interval_sec = interval_sec
+        self.encoding = encoding
+        self.last_sent: float = -float("inf")
+        self.dropped_count: int = 0  # messages dropped since the client stopped reading
+
+
 class ZeroMQSender:
     """
     This class defines the way to response data to C# Program running on Unity.
     In short, this class works as sever.
     Note:
         ref: https://github.com/zeromq/pyzmq/blob/main/examples/asyncio/coroutines.py
+        The socket is driven by the asyncio loop of `AudioRuntime`, which awaits `send_message()` for each block.
+        In addition to broadcasting the whole record with PUB socket, clients can subscribe a subset of features
+        with ROUTER socket (`initialize_control()`), whose protocol is JSON like:
+        request `{"command": "subscribe", "features": ["averageF0", ...], "rateHz": 1.0, "encoding": "json"}`,
+        reply `{"ok": true, "fields": [["t", "<f8"], ["averageF0", "<f8"], ...]}`, then messages of the subset.
+        `{"command": "unsubscribe"}` stops them.
+        Messages to each client are sent without waiting, so that a client which stops reading (i.e., whose queue
+        reaches the high-water mark) loses its messages instead of blocking the analysis for everyone.
     """
+    ENCODINGS: List[str] = ["json", "binary"]
 
     def __init__(self) -> None:
         self.logger = Logger(name=__name__)
 
         self.context = None
         self.socket = None
-        self.loop = None
         self.message_dict: Dict[str, Any] = {}
         self.is_initialized = False
         self.is_sendable = False
+        # control socket and subscriptions of clients
+        self.control_socket = None
+        self.is_broadcast: bool = True  # send the whole record with PUB socket
+        self.available_keys: List[str] = []  # field names which can be subscribed
+        self.field_dtypes: Dict[str, str] = {}
+        self.subscriptions: Dict[bytes, Subscription] = {}
+        self.demanded_keys: FrozenSet[str] = frozenset()
 
     def initialize_connection(self, port_number: str = "5555") -> None:
         """
@@ -38,21 +70,143 @@ class ZeroMQSender:
         self.context = Context.instance()
         self.socket = self.context.socket(zmq.PUB)
         self.socket.bind("tcp://*:" + port_number)
-        # for tornado setting
-        self.loop = IOLoop.current()
         self.is_initialized = True
 
-    async def send_message(self) -> None:
+    def initialize_control(self, schema: Sequence[Tuple[str, str]], port_number: str = "5556",
+                           is_broadcast: bool = True, max_queued_messages: int = 1000) -> None:
         """
-        Process on sending message.
+        Initialize control socket for subscriptions.
+        Args:
+            schema: Field names (snake case) and dtypes of `FeatureRecord` (see `FeatureRecord.get_schema()`).
+            port_number: Port of ROUTER socket.
+            is_broadcast: Keep broadcasting the whole record with PUB socket.
+            max_queued_messages: Messages queued for each client (high-water mark), beyond which they are dropped.
+        """
+        self.field_dtypes = dict(schema)
+        self.available_keys = list(self.field_dtypes)
+        self.is_broadcast = is_broadcast
+        self.control_socket = self.context.socket(zmq.ROUTER)
+        # raise error when sending to a client who has gone, to remove its subscription
+        self.control_socket.setsockopt(zmq.ROUTER_MANDATORY, 1)
+        # this should be set before binding, to be applied to clients
+        self.control_socket.setsockopt(zmq.SNDHWM, max_queued_messages)
+        self.control_socket.bind("tcp://*:" + port_number)
+        self.update_demand()
+
+    def update_demand(self) -> None:
+        """
+        Union of fields which are sent to anyone, which decides features to compute.
+        """
+        keys = set(self.available_keys) if self.is_broadcast else set()
+        for subscription in self.subscriptions.values():
+            keys.update(subscription.keys)
+        self.demanded_keys = frozenset(keys)
+
+    async def serve_control(self) -> None:
+        """
+        Process requests on the control socket until cancelled.
         """
-        self.logger.logger.info("Try to Send...")
         while True:
-            if self.is_sendable:
-                # `self.message_dict` will be updated
-                pprint.pprint(self.message_dict)
-                await self.socket.send_multipart([json.dumps(self.message_dict).encode("ascii")])
-                self.is_sendable = False
+            frames = await self.control_socket.recv_multipart()
+            identity, payload = frames[0], frames[-1]
+            reply = self.handle_control(identity=identity, payload=payload)
+            await self.send_to(identity=identity, payload=json.dumps(reply).encode("ascii"))
+
+    def handle_control(self, identity: bytes, payload: bytes) -> Dict[str, Any]:
+        try:
+            request = json.loads(payload)
+            if not isinstance(request, dict):
+                raise ValueError("request should be an object")
+            command = request.get("command")
+            if command == "unsubscribe":
+                self.remove_subscription(identity=identity)
+                return {"ok": True}
+            if command != "subscribe":
+                raise ValueError("unknown command: {}".format(command))
+            camel_to_snake = dict(zip(self.snake_to_camel(dict.fromkeys(self.available_keys)), self.available_keys))
+            keys = []
+            for feature in request.get("features", list(camel_to_snake)):
+                key = camel_to_snake.get(feature, feature)  # camel or snake case
+                if key not in self.available_keys:
+                    raise ValueError("unknown feature: {}".format(feature))
+                if key not in keys:
+                    keys.append(key)
+            # time annotation is always sent first
+            keys = ["t"] + [key for key in keys if key != "t"]
+            rate_hz = float(request.get("rateHz", 0.0))
+            encoding = request.get("encoding", "json")
+            if rate_hz < 0.0 or encoding not in self.ENCODINGS:
+                raise ValueError("invalid rate or encoding: {}, {}".format(rate_hz, encoding))
+        except (ValueError, TypeError) as error:  # including JSONDecodeError
+            self.logger.logger.warning("Invalid control request: {}".format(error))
+            return {"ok": False, "error": str(error)}
+        self.subscriptions[identity] = Subscription(identity=identity, keys=keys,
+                                                    interval_sec=1 / rate_hz if rate_hz > 0 else 0.0,
+                                                    encoding=encoding)
+        self.update_demand()
+        self.logger.logger.info("Client subscribed {} features at {} Hz in {}.".format(
+            len(keys) - 1, rate_hz or "every block", encoding))
+        return {"ok": True, "fields": [[camel, self.field_dtypes[key]]
+                                       for key, camel in zip(keys, self.snake_to_camel(dict.fromkeys(keys)))]}
+
+    def remove_subscription(self, identity: bytes) -> None:
+        if self.subscriptions.pop(identity, None) is not None:
+            self.update_demand()
+
+    async def send_to(self, identity: bytes, payload: bytes) -> bool:
+        """
+        Send a message to a client without blocking.
+        Returns:
+            res (bool): Whether the message is queued. It is dropped if the queue of the client is full,
+                and the subscription is removed if the client has gone.
+        """
+        try:
+            await self.control_socket.send_multipart([identity, payload], flags=zmq.NOBLOCK)
+        except zmq.Again:  # the client doesn't read
+            subscription = self.subscriptions.get(identity)
+            if subscription is not None:
+                subscription.dropped_count += 1
+            self.logger.logger.warning("Client doesn't read messages, so they are dropped.")
+            return False
+        except zmq.ZMQError:  # the client has gone
+            self.remove_subscription(identity=identity)
+            return False
+        subscription = self.subscriptions.get(identity)
+        if subscription is not None and subscription.dropped_count > 0:
+            self.logger.logger.info("Client reads messages again, after {} were dropped.".format(
+                subscription.dropped_count))
+            subscription.dropped_count = 0
+        return True
+
+    async def send_subscriptions(self, record) -> None:
+        """
+        Send the subset of `record` (`FeatureRecord`) to each client whose interval has passed.
+        """
+        if not self.subscriptions:
+            return
+        now = TimeMeasure.get_perf_counter()
+        record["t"] = TimeMeasure.get_process_time()
+        for subscription in list(self.subscriptions.values()):
+            if now - subscription.last_sent < subscription.interval_sec:
+                continue
+            if subscription.encoding == "binary":
+                payload = record.to_bytes(keys=subscription.keys)
+            else:
+                message = dict(zip(self.snake_to_camel(dict.fromkeys(subscription.keys)),
+                                   record.to_tuple(keys=subscription.keys)))
+                payload = json.dumps(message).encode("ascii")
+            if await self.send_to(identity=subscription.identity, payload=payload):
+                subscription.last_sent = now
+
+    async def send_message(self) -> None:
+        """
+        Send the message set by `set_message()` once, if it hasn't been sent yet.
+        """
+        if not self.is_sendable:
+            return
+        # `self.message_dict` will be updated by the next block
+        await self.socket.send_multipart([json.dumps(self.message_dict).encode("ascii")])
+        self.is_sendable = False
 
     def snake_to_camel(self, data_dict: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -91,9 +245,14 @@ class ZeroMQSender:
         # time annotation
         self.message_dict["t"]: float = TimeMeasure.get_process_time()
 
-    def handle_message(self) -> None:
+    def close(self) -> None:
         """
-        Handle loop of sending and receiving message.
+        Close the socket without waiting for undelivered messages.
         """
-        self.loop.spawn_callback(self.send_message)
-        self.loop.start()
+        if self.socket is not None:
+            self.socket.close(linger=0)
+            self.socket = None
+        if self.control_socket is not None:
+            self.control_socket.close(linger=0)
+            self.control_socket = None
+        self.is_initialized = False